@@ -3,6 +3,11 @@ ASGI config for askme project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Event stream of the signed in user is served at EVENTS_PATH outside of
+Django's request cycle, and upload chunks which Django would read into a
+file before any view checks their size are refused. Everything else is
+handled by Django.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 """
@@ -13,4 +18,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'askme.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# apps are loaded by now
+from mainapp import uploads  # noqa: E402
+from mainapp.push import events_app  # noqa: E402
+
+EVENTS_PATH = '/api/events/'
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        await events_app(scope, receive, send)
+    elif uploads.is_large_chunk(scope):
+        await uploads.refuse_large_chunk(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
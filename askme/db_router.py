@@ -0,0 +1,220 @@
+"""
+Routing of reads to replica databases.
+
+Every database alias except `default` is a replica. ReplicaMiddleware lets
+reads of a request go to a replica unless the client wrote something in the
+last REPLICA_PIN_SECONDS, so users always see their own writes; a request
+that writes is pinned to the primary from its first write on, and code that
+writes what it has read calls `use_primary` before reading. Pins are kept
+in the `shared` cache, which every worker sees, and last at least as long
+as replicas may lag. Replicas are health checked at most every
+REPLICA_HEALTH_INTERVAL seconds and ejected for REPLICA_EJECT_SECONDS when
+they fail or lag behind more than REPLICA_MAX_LAG seconds.
+
+Locally replicas can be SQLite files (SQLITE_REPLICAS), copies of the
+primary database file; in tests they mirror `default`.
+"""
+import asyncio
+import hashlib
+import itertools
+import logging
+import threading
+import time
+
+from asgiref.local import Local
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'db_pin'
+
+_state = Local()
+
+
+def pin_cache():
+    return caches['shared'] if 'shared' in settings.CACHES else caches['default']
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+class ReplicaPool:
+    """
+    Chooses healthy replicas round robin
+    """
+
+    def __init__(self, aliases):
+        self.aliases = list(aliases)
+        self._lock = threading.Lock()
+        self._cycle = itertools.cycle(self.aliases) if self.aliases else None
+        self._ejected_until = {}
+        self._checked_at = {}
+
+    def _lag(self, alias):
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)')
+                return float(cursor.fetchone()[0])
+            cursor.execute('SELECT 1')
+            return 0.0
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            if self._ejected_until.get(alias, 0) > now:
+                return False
+            if now - self._checked_at.get(alias, float('-inf')) < getattr(settings, 'REPLICA_HEALTH_INTERVAL', 5):
+                return True
+            self._checked_at[alias] = now
+        try:
+            lag = self._lag(alias)
+        except DatabaseError:
+            logger.warning('replica %s is unavailable', alias, exc_info=True)
+            self.eject(alias)
+            return False
+        if lag > getattr(settings, 'REPLICA_MAX_LAG', 10):
+            logger.warning('replica %s lags %.1f seconds behind', alias, lag)
+            self.eject(alias)
+            return False
+        return True
+
+    def eject(self, alias):
+        with self._lock:
+            self._ejected_until[alias] = time.monotonic() + getattr(settings, 'REPLICA_EJECT_SECONDS', 30)
+
+    def choose(self):
+        """
+        Provides alias of a healthy replica, None if there is none
+        """
+        if self._cycle is None:
+            return None
+        for _attempt in range(len(self.aliases)):
+            with self._lock:
+                alias = next(self._cycle)
+            if self.is_healthy(alias):
+                return alias
+        return None
+
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ReplicaPool(replica_aliases())
+    return _pool
+
+
+def get_state():
+    return getattr(_state, 'value', None)
+
+
+def set_state(value):
+    _state.value = value
+
+
+def use_primary():
+    """
+    Sends the remaining reads of current request to the primary, for code that writes what it has read
+    """
+    state = get_state()
+    if state is not None:
+        state['replica'] = False
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = get_state()
+        # entries of the database cache, such as pins, must not lag behind
+        if state is None or not state['replica'] or state['wrote'] or model._meta.app_label == 'django_cache':
+            return DEFAULT_DB_ALIAS
+        if state['alias'] is None:
+            # one replica per request, so its reads are consistent
+            state['alias'] = get_pool().choose() or DEFAULT_DB_ALIAS
+        return state['alias']
+
+    def db_for_write(self, model, **hints):
+        state = get_state()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _client_key(request):
+    credentials = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    return 'db-pin:' + hashlib.sha1(credentials.encode()).hexdigest()
+
+
+def _is_pinned(request, key):
+    return PIN_COOKIE in request.COOKIES or (key is not None and pin_cache().get(key) is not None)
+
+
+def _request_state(request, pinned):
+    return {
+        'replica': request.method in ('GET', 'HEAD', 'OPTIONS') and not pinned,
+        'wrote': False,
+        'alias': None,
+    }
+
+
+def _pin(response, key):
+    pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+    if key is not None:
+        pin_cache().set(key, True, pin_seconds)
+    # pins clients without credentials too
+    response.set_cookie(PIN_COOKIE, '1', max_age=pin_seconds, httponly=True, samesite='Lax')
+
+
+class ReplicaMiddleware:
+    """
+    Sends reads of safe requests to a replica, unless the client has written recently
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # lets Django call the async branch without a thread in between
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        key = _client_key(request)
+        set_state(_request_state(request, _is_pinned(request, key)))
+        try:
+            response = self.get_response(request)
+            wrote = get_state()['wrote']
+        finally:
+            set_state(None)
+        if wrote:
+            _pin(response, key)
+        return response
+
+    async def __acall__(self, request):
+        key = _client_key(request)
+        set_state(_request_state(request, await sync_to_async(_is_pinned)(request, key)))
+        try:
+            response = await self.get_response(request)
+            wrote = get_state()['wrote']
+        finally:
+            set_state(None)
+        if wrote:
+            await sync_to_async(_pin)(response, key)
+        return response
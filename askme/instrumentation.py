@@ -0,0 +1,388 @@
+"""
+Per-request timings and latency histograms.
+
+InstrumentationMiddleware counts queries of the request and their time with
+a database execute wrapper, and collects time spent in authentication, DRF
+serialization and storage urls from `timed` sections; time of queries made
+inside a section is not counted to it. Timings are sent back in the
+Server-Timing header and added to histograms by view name, which `metrics`
+serves in Prometheus text format when METRICS_TOKEN is set.
+
+Every worker process observes its own requests. With METRICS_DIR set,
+workers write their histograms there at most every METRICS_FLUSH_INTERVAL
+seconds, and whichever worker is scraped serves the sum of all of them;
+histograms of exited workers are folded into an archive, so totals don't go
+back when workers are replaced. Without it a scrape sees one worker only.
+"""
+import asyncio
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+PARTS = ('db', 'auth', 'serialize', 'storage')
+
+DURATION = 'askme_request_duration_seconds'
+PART = 'askme_request_part_seconds'
+QUERIES = 'askme_request_queries'
+METRICS = {
+    DURATION: ('Time of request from first to last middleware.', SECONDS_BUCKETS),
+    PART: ('Time of request spent in database, auth, serialization, storage.', SECONDS_BUCKETS),
+    QUERIES: ('Database queries made by request.', QUERIES_BUCKETS),
+}
+ARCHIVE = 'archive.json'
+
+_state = Local()
+
+
+def enabled():
+    return getattr(settings, 'INSTRUMENTATION', True)
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', '')
+
+
+class Timings:
+    """
+    Accumulates timings of a single request
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.parts = defaultdict(float)
+        self.active = set()
+        # idents of threads working on the request, and (sql, seconds) of its queries when somebody asks for them
+        self.threads = set()
+        self.statements = None
+        self.statements_limit = 0
+
+    def header(self, total):
+        values = [f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"']
+        values += [f'{part};dur={self.parts[part] * 1000:.1f}' for part in PARTS[1:] if part in self.parts]
+        values.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(values)
+
+
+def get_timings():
+    return getattr(_state, 'timings', None)
+
+
+def set_timings(timings):
+    _state.timings = timings
+
+
+def _execute(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings = get_timings()
+        if timings is not None:
+            duration = time.perf_counter() - started
+            timings.queries += 1
+            timings.db += duration
+            if timings.statements is not None and len(timings.statements) < timings.statements_limit:
+                timings.statements.append((sql, duration))
+
+
+def _install_wrapper(sender, connection, **kwargs):
+    # stays on the connection for its life, queries are counted while a request is recorded
+    connection.execute_wrappers.append(_execute)
+
+
+@contextmanager
+def recording(timings):
+    """
+    Collects timings of code running in current thread
+    """
+    previous = get_timings()
+    set_timings(timings)
+    thread = threading.get_ident()
+    timings.threads.add(thread)
+    try:
+        yield timings
+    finally:
+        timings.threads.discard(thread)
+        set_timings(previous)
+
+
+@contextmanager
+def timed(part):
+    """
+    Adds time of the block to `part` of current request, without time of its queries
+    """
+    timings = get_timings()
+    # nested sections of the same part are already counted by the outer one
+    if timings is None or part in timings.active:
+        yield
+        return
+    timings.active.add(part)
+    started, db = time.perf_counter(), timings.db
+    try:
+        yield
+    finally:
+        timings.parts[part] += time.perf_counter() - started - (timings.db - db)
+        timings.active.discard(part)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def add(self, counts, total):
+        self.counts = [count + other for count, other in zip(self.counts, counts)]
+        self.sum += total
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class Registry:
+    """
+    Request histograms by metric name and labels
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {name: {} for name in METRICS}
+        self._flushed_at = float('-inf')
+
+    def _observe(self, name, labels, value):
+        histograms = self._histograms[name]
+        if labels not in histograms:
+            histograms[labels] = Histogram(METRICS[name][1])
+        histograms[labels].observe(value)
+
+    def observe(self, view, timings, total):
+        with self._lock:
+            self._observe(DURATION, f'view="{view}"', total)
+            self._observe(QUERIES, f'view="{view}"', timings.queries)
+            for part in PARTS:
+                value = timings.db if part == 'db' else timings.parts.get(part, 0.0)
+                self._observe(PART, f'view="{view}",part="{part}"', value)
+            now = time.monotonic()
+            due = metrics_dir() and now - self._flushed_at >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+            if due:
+                self._flushed_at = now
+        if due:
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return _snapshot(self._histograms)
+
+    def flush(self):
+        """
+        Writes snapshot of the process into METRICS_DIR
+        """
+        directory = metrics_dir()
+        if directory:
+            _write(directory, f'{os.getpid()}.json', self.snapshot())
+
+    def exposition(self, snapshots=()):
+        """
+        Serves histograms of the process together with snapshots of other processes
+        """
+        merged = merge([self.snapshot(), *snapshots])
+        lines = []
+        for name, (description, _buckets) in METRICS.items():
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+            for labels, histogram in sorted(merged[name].items()):
+                lines += histogram.lines(name, labels)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _snapshot(histograms):
+    # {name: {labels: [counts, sum]}}, the way histograms are stored in METRICS_DIR
+    return {name: {labels: [list(histogram.counts), histogram.sum] for labels, histogram in by_labels.items()}
+            for name, by_labels in histograms.items()}
+
+
+def merge(snapshots):
+    """
+    Sums snapshots into {name: {labels: histogram}}
+    """
+    merged = {name: {} for name in METRICS}
+    for snapshot in snapshots:
+        for name, histograms in snapshot.items():
+            for labels, (counts, total) in histograms.items():
+                if labels not in merged[name]:
+                    merged[name][labels] = Histogram(METRICS[name][1])
+                merged[name][labels].add(counts, total)
+    return merged
+
+
+def _write(directory, name, snapshot):
+    os.makedirs(directory, exist_ok=True)
+    temporary = os.path.join(directory, f'{name}.{os.getpid()}.tmp')
+    with open(temporary, 'w') as output:
+        json.dump(snapshot, output)
+    os.replace(temporary, os.path.join(directory, name))
+
+
+def _read(path):
+    try:
+        with open(path) as stored:
+            return json.load(stored)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _fold(directory, names):
+    """
+    Adds snapshots of exited workers to the archive, so totals don't drop when workers are replaced
+    """
+    with open(os.path.join(directory, 'archive.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # another scrape may have folded some of them already
+        snapshots = [_read(os.path.join(directory, name)) for name in [ARCHIVE] + list(names)]
+        _write(directory, ARCHIVE, _snapshot(merge(filter(None, snapshots))))
+        for name in names:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def worker_snapshots():
+    """
+    Provides snapshots of other workers and of the ones that exited, from METRICS_DIR
+    """
+    directory = metrics_dir()
+    if not directory or not os.path.isdir(directory):
+        return []
+    own = f'{os.getpid()}.json'
+    names = [name for name in os.listdir(directory) if name.endswith('.json') and name not in (own, ARCHIVE)]
+    exited = [name for name in names if not _is_alive(int(name[:-len('.json')]))]
+    if exited:
+        _fold(directory, exited)
+    snapshots = [_read(os.path.join(directory, name)) for name in [ARCHIVE] + sorted(set(names) - set(exited))]
+    return [snapshot for snapshot in snapshots if snapshot is not None]
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    # unmatched paths are not labels of their own, they would grow the registry without bound
+    return match.view_name if match is not None else 'unmatched'
+
+
+class InstrumentationMiddleware:
+    """
+    Times request and its parts, see module description
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not enabled():
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with recording(Timings()) as timings:
+            response = self.get_response(request)
+        return self.finish(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not enabled():
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        # threads of sync_to_async see timings of the calling coroutine, the event loop thread is not recorded
+        timings, previous = Timings(), get_timings()
+        set_timings(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            set_timings(previous)
+        total = time.perf_counter() - started
+        if metrics_dir():
+            # flushing writes a file now and then
+            return await sync_to_async(self.finish)(request, response, timings, total)
+        return self.finish(request, response, timings, total)
+
+    def finish(self, request, response, timings, total):
+        registry.observe(view_name(request), timings, total)
+        response['Server-Timing'] = timings.header(total)
+        return response
+
+
+def metrics(request):
+    """
+    Serves histograms to a scraper which sends METRICS_TOKEN as bearer token
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token or not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        raise Http404
+    return HttpResponse(registry.exposition(worker_snapshots()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def install():
+    """
+    Counts queries of every connection and times DRF serialization, which has no hook of its own
+    """
+    from rest_framework.serializers import BaseSerializer
+
+    connection_created.connect(_install_wrapper, dispatch_uid='askme.instrumentation')
+    if metrics_dir():
+        # last observations of a worker that exits cleanly
+        atexit.register(registry.flush)
+
+    data = BaseSerializer.data
+    if getattr(data.fget, 'instrumented', False):
+        return
+
+    def timed_data(serializer):
+        with timed('serialize'):
+            return data.fget(serializer)
+
+    timed_data.instrumented = True
+    BaseSerializer.data = property(timed_data)
@@ -9,14 +9,19 @@ https://docs.djangoproject.com/en/3.0/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.0/ref/settings/
 """
+import dj_database_url
 import django_heroku
 import os
+import sys
 
 
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# manage.py test, which needs database work to run in the thread of the test
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/3.0/howto/deployment/checklist/
@@ -69,12 +74,14 @@ REST_FRAMEWORK = {
         #'rest_framework.permissions.AllowAny',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'mainapp.utils.CachedTokenAuthentication',
     ),
 }
 
 
 MIDDLEWARE = [
+    'askme.instrumentation.InstrumentationMiddleware',
+    'mainapp.flight_recorder.FlightRecorderMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,6 +90,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'askme.db_router.ReplicaMiddleware',
 
 ]
 
@@ -116,8 +124,42 @@ DATABASES = {
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
         'USER': '',
         'PASSWORD': '',
+        # keep connections of request and pool threads open between requests
+        'CONN_MAX_AGE': 60,
+    }
+}
 
+# read replicas as comma separated database urls, or a number of SQLite files standing in for them locally
+for index, url in enumerate(url for url in os.getenv('REPLICA_DATABASE_URLS', '').split(',') if url):
+    DATABASES[f'replica_{index}'] = dict(dj_database_url.parse(url, conn_max_age=60), TEST={'MIRROR': 'default'})
+for index in range(int(os.getenv('SQLITE_REPLICAS', 0))):
+    DATABASES[f'replica_{index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db_replica_{index}.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['askme.db_router.ReplicaRouter']
+
+# replica lag that is tolerated, seconds client reads from primary after own write, which must cover the lag,
+# replica health checks interval, and seconds failed or lagging replica is not used for
+REPLICA_MAX_LAG = 10
+REPLICA_PIN_SECONDS = REPLICA_MAX_LAG
+REPLICA_HEALTH_INTERVAL = 5
+REPLICA_EJECT_SECONDS = 30
+
+# responses are cached in the process, state every worker has to see is kept in the database
+# (python manage.py createcachetable)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'askme_shared_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }
 
 
@@ -210,6 +252,11 @@ MEDIA_URL = f"https://{AWS_S3_CUSTOM_DOMAIN}/media/"
 STATICFILES_STORAGE = 'askme.storage_backends.StaticStorage'
 DEFAULT_FILE_STORAGE = 'askme.storage_backends.MediaStorage'
 
+# keep media on local filesystem instead of S3, e.g. in development and tests
+if os.getenv('USE_LOCAL_MEDIA'):
+    DEFAULT_FILE_STORAGE = 'askme.storage_backends.LocalMediaStorage'
+    MEDIA_URL = '/media/'
+
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR,'static'),
     os.path.join(BASE_DIR,'frontend/static'),
@@ -222,4 +269,90 @@ ACCOUNT_EMAIL_VERIFICATION ='none'
 ACCOUNT_AUTHENTICATION_METHOD = 'username'
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 ACCOUNT_EMAIL_REQUIRED= True
+
+# answers of users with more friends than this are pulled by readers instead of pushed to them
+FEED_FANOUT_LIMIT = 500
+# how many latest answers are copied to the feed on new friendship
+FEED_BACKFILL_SIZE = 200
+
+# collect like counter changes in memory and write them in batches
+REACTION_WRITE_BEHIND = False
+REACTION_WRITE_BEHIND_MAX_PENDING = 100
+REACTION_WRITE_BEHIND_MAX_DELAY = 2.0
+
+# seconds friend lists are cached in process memory, and how many users are cached
+FRIEND_GRAPH_TTL = 60
+FRIEND_GRAPH_MAX_USERS = 100000
+
+# seconds authenticated tokens are cached in process memory, how many of them,
+# and seconds between checks whether a cached token was revoked in another process
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_CHECK_INTERVAL = 5.0
+
+# seconds public profile responses are kept in cache
+PROFILE_CACHE_TIMEOUT = 300
+
+# text search configuration of content search on Postgres
+CONTENT_SEARCH_CONFIG = 'simple'
+
+# threads running background tasks such as image renditions, run them synchronously when eager
+BACKGROUND_WORKERS = 2
+BACKGROUND_TASKS_EAGER = False
+
+# format renditions of uploaded images are encoded to
+IMAGE_FORMAT = 'WEBP'
+
+# largest image that can be uploaded, seconds upload tickets are valid,
+# bytes read from request stream at once by the chunk endpoint,
+# and most bytes of one request to it, ASGI buffers the whole body
+UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+UPLOAD_TICKET_TTL = 900
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_MAX_REQUEST_SIZE = 1024 * 1024
+
+# questions to more users than this are created in background, and rows per bulk INSERT
+QUESTION_FANOUT_SYNC_LIMIT = 100
+QUESTION_FANOUT_BATCH_SIZE = 500
+
+# pub/sub of pushed events, InProcessBroker works only within one process, PostgresBroker shares events
+# between processes and is the default on PostgreSQL, and seconds between heartbeats of event stream
+PUBSUB_BROKER = os.getenv('PUBSUB_BROKER', '')
+PUSH_HEARTBEAT = 15
+# seconds ticket to open the event stream is valid for
+PUSH_TICKET_MAX_AGE = 60
+
+# days change log entries of sync are kept for, older cursors get reset
+CHANGELOG_RETENTION_DAYS = 30
+# seconds change log entries wait before sync hands them out, so entries of slower transactions are not skipped
+CHANGELOG_SYNC_LAG = 2
+
+# serve hot read views asynchronously, which pays off under ASGI only
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', '1') == '1'
+# threads running database work of async read views, 0 runs them in Django's shared thread as tests need
+ASYNC_DB_WORKERS = 0 if TESTING else int(os.getenv('ASYNC_DB_WORKERS', 8))
+
+# Server-Timing headers and request histograms, and bearer token of /metrics/ scraper, which is off without it
+INSTRUMENTATION = os.getenv('INSTRUMENTATION', '1') == '1'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# directory where workers share histograms so every scrape sees all of them, empty keeps them in the process,
+# and seconds between writes of a worker. Set it for the web workers only, every process would leave a file there
+METRICS_DIR = '' if TESTING else os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 1.0
+
+# API requests slower than this many seconds are captured with their SQL and stack samples into a ring buffer
+# of FLIGHT_RECORDER_CAPTURES files, stacks are sampled every FLIGHT_RECORDER_SAMPLE_INTERVAL seconds of
+# requests older than FLIGHT_RECORDER_SAMPLE_AFTER, targets of profiling are reloaded every TTL seconds
+FLIGHT_RECORDER = os.getenv('FLIGHT_RECORDER', '1') == '1'
+FLIGHT_RECORDER_THRESHOLD = float(os.getenv('FLIGHT_RECORDER_THRESHOLD', 1.0))
+FLIGHT_RECORDER_DIR = os.getenv('FLIGHT_RECORDER_DIR', os.path.join(BASE_DIR, 'flight_records'))
+FLIGHT_RECORDER_CAPTURES = 200
+FLIGHT_RECORDER_MAX_STATEMENTS = 2000
+FLIGHT_RECORDER_SAMPLE_INTERVAL = 0.005
+FLIGHT_RECORDER_SAMPLE_AFTER = 0.05
+FLIGHT_RECORDER_TARGETS_TTL = 30
+
+# serve feed, account answers, comments and friends lists with values() based serializers
+FAST_SERIALIZERS = os.getenv('FAST_SERIALIZERS', '1') == '1'
+
 django_heroku.settings(locals(), staticfiles=False)
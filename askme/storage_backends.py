@@ -1,9 +1,62 @@
+import os
+
+from django.core.files.storage import FileSystemStorage
 from storages.backends.s3boto3 import S3Boto3Storage
 
+from askme import instrumentation
+
 class MediaStorage(S3Boto3Storage):
     location = 'media'
     file_overwrite = True
 
+    def url(self, name, *args, **kwargs):
+        with instrumentation.timed('storage'):
+            return super().url(name, *args, **kwargs)
+
+    def upload_target(self, name, content_type, max_size, expires_in):
+        """
+        Provides presigned POST, so the client uploads file straight to the bucket
+        """
+        key = self._normalize_name(self._clean_name(name))
+        fields = {'Content-Type': content_type}
+        conditions = [{'Content-Type': content_type}, ['content-length-range', 1, max_size]]
+        if self.default_acl:
+            fields['acl'] = self.default_acl
+            conditions.append({'acl': self.default_acl})
+        post = self.bucket.meta.client.generate_presigned_post(
+            self.bucket_name, key, Fields=fields, Conditions=conditions, ExpiresIn=expires_in)
+        return {'method': 'POST', 'url': post['url'], 'fields': post['fields']}
+
+class LocalMediaStorage(FileSystemStorage):
+    """
+    Keeps media on local filesystem, uploads are streamed through the chunk endpoint
+    """
+
+    def url(self, name):
+        with instrumentation.timed('storage'):
+            return super().url(name)
+
+    def append_chunk(self, name, stream, offset, length, chunk_size):
+        """
+        Copies `length` bytes of stream to partial file at `offset`, returns number of bytes copied
+        """
+        path = self.path(f'{name}.part')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        written = 0
+        with open(path, 'ab') as partial:
+            # drop the rest of an interrupted chunk
+            partial.truncate(offset)
+            while written < length:
+                data = stream.read(min(chunk_size, length - written))
+                if not data:
+                    break
+                partial.write(data)
+                written += len(data)
+        return written
+
+    def finish_upload(self, name):
+        os.replace(self.path(f'{name}.part'), self.path(name))
+
 class StaticStorage(S3Boto3Storage):
     location = 'static'
     file_overwrite = True
@@ -54,42 +54,31 @@ class Answer extends Component {
   }
 
 
-  fetchLike = (val) => {
-    const postData = {
-        likes:this.state.likes + val
-    }
+  fetchReaction = (reaction, val) => {
     const config = {
       headers: {
         'Authorization' : `Token ${this.props.token}`,
         'Content-Type': 'application/json'
       }
     }
-    axios.patch(`api/answer/${this.props.answerId}/like/`,postData,config)
+    const url = `api/answer/${this.props.answerId}/${reaction}/`
+    const request = (val > 0) ? axios.post(url,{},config) : axios.delete(url,config)
+    request
       .then(res => {
         this.setState({
-          likes: this.state.likes + val
+          likes: res.data.likes,
+          dislikes: res.data.dislikes
         })
                     })
       .catch(err => console.log(err))
   }
 
+  fetchLike = (val) => {
+    this.fetchReaction('like', val)
+  }
+
   fetchDislike = (val) => {
-    const postData = {
-        dislikes:this.state.dislikes + val
-    }
-    const config = {
-      headers: {
-        'Authorization' : `Token ${this.props.token}`,
-        'Content-Type': 'application/json'
-      }
-    }
-    axios.patch(`api/answer/${this.props.answerId}/dislike/`,postData,config)
-      .then(res => {
-        this.setState({
-          dislikes: this.state.dislikes + val
-        })
-                    })
-      .catch(err => console.log(err))
+    this.fetchReaction('dislike', val)
   }
 
   handleLikeButton = () => {
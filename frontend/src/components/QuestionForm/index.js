@@ -128,6 +128,11 @@ class QuestionForm extends Component {
           'Content-Type': 'application/json'
         }
       }
+      if(postData.askedUsers.length === this.state.userList.length){
+        // server asks the whole friend list itself
+        delete postData.askedUsers
+        postData.askAllFriends = true
+      }
       axios.post('api/questions/multiple/create/',postData,config)
         .then(res => {this.setState({textValue:'',openFriends:false}) }  )
         .catch(err => console.log(err))
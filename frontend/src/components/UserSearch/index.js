@@ -22,8 +22,8 @@ class UserSearch extends React.Component {
         }
     }).then(res => {
       console.log(res.data);
-      if(res.data.length > 0 ){
-        this.props.changeView(res.data, '', false)
+      if(res.data.results.length > 0 ){
+        this.props.changeView(res.data.results, '', false)
       }else{
         this.props.changeView([], 'Nothing found!',false)
       }
@@ -94,11 +94,36 @@ const AccountDetails = props => {
           })
     }
 
+    const uploadAvatar = (image) => {
+      const config = {
+        headers: {
+          'Authorization' : `Token ${props.token}`
+        }
+      }
+      const ticket = {target: 'avatar', content_type: image.type, size: image.size}
+      return axios.post(`api/uploads/`, ticket, config)
+        .then(res => {
+          const upload = res.data.upload
+          let sent
+          if(upload.method === 'POST'){
+            // presigned post straight to the bucket
+            let form_data = new FormData();
+            Object.keys(upload.fields).forEach(key => form_data.append(key, upload.fields[key]))
+            form_data.append('file', image)
+            sent = axios.post(upload.url, form_data)
+          } else {
+            // one request carries at most chunk_size bytes
+            const putFrom = (offset) => axios.put(upload.url, image.slice(offset, offset + upload.chunk_size), {
+              headers: {...config.headers, 'Content-Type': image.type, 'Upload-Offset': offset}
+            }).then(put => put.data.received < image.size ? putFrom(put.data.received) : put)
+            sent = putFrom(0)
+          }
+          return sent.then(() => axios.post(`api/uploads/${res.data.id}/complete/`, {}, config))
+        })
+    }
+
     const putChanges = () => {
       let form_data = new FormData();
-      if(values.image){
-          form_data.append('avatar',values.image, values.image.name );
-      }
 
       if(values.selfDescription){
         form_data.append('selfDescription',values.selfDescription)
@@ -121,6 +146,7 @@ const AccountDetails = props => {
         }
       }
       axios.patch(`api/account/settings/update/`,form_data,config)
+        .then(res => values.image ? uploadAvatar(values.image) : res)
         .then(res => {
           openInfoBar('Settings updated','success')
           })
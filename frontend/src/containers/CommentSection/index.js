@@ -21,7 +21,7 @@ class CommentSection extends Component{
         }
     }).then(res => {
         this.setState({
-          comments: res.data
+          comments: res.data.results
         });
       })
   }
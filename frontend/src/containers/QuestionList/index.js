@@ -32,7 +32,7 @@ class QuestionList extends React.Component{
         }
     }).then(res => {
       this.setState({
-        questions: res.data.map((question, index) => {
+        questions: res.data.results.map((question, index) => {
           question.isVisible = true;
           return question;
         })
@@ -45,9 +45,48 @@ class QuestionList extends React.Component{
 
   }
 
+  listenEvents = (token) => {
+    // server pushes an event when somebody asks a question, so the inbox is reloaded only then
+    this.stopEvents()
+    // EventSource can't send the token, the stream is opened with a short-lived ticket instead
+    axios.post('api/events/ticket/', {}, {
+        headers: {
+          'Authorization' : `Token ${token}`
+        }
+    }).then(res => {
+      if (this.unmounted) {
+        return
+      }
+      this.stopEvents()
+      this.events = new EventSource(`api/events/?ticket=${encodeURIComponent(res.data.ticket)}`)
+      this.events.addEventListener('question', () => this.fetchQuestions(token))
+      this.events.addEventListener('reset', () => this.fetchQuestions(token))
+      this.events.onerror = () => {
+        // reconnects with the old ticket fail once it expires, the stream is reopened with a new one
+        if (this.events && this.events.readyState === EventSource.CLOSED) {
+          this.events = null
+          this.retry = setTimeout(() => this.listenEvents(token), 5000)
+        }
+      }
+    }).catch(err => {
+      this.setState({
+        error: err
+      })
+    })
+  }
+
+  stopEvents = () => {
+    clearTimeout(this.retry)
+    if (this.events){
+      this.events.close()
+      this.events = null
+    }
+  }
+
   componentWillReceiveProps(newProps){
     if (newProps.token){
       this.fetchQuestions(newProps.token)
+      this.listenEvents(newProps.token)
     }
 
   }
@@ -56,9 +95,15 @@ class QuestionList extends React.Component{
 
     if (this.props.token !== null){
       this.fetchQuestions(this.props.token)
+      this.listenEvents(this.props.token)
     }
   }
 
+  componentWillUnmount(){
+    this.unmounted = true
+    this.stopEvents()
+  }
+
   removeQuestion= (questionId) => {
     //1.fin INDEX of object with given //
     const questions = this.state.questions.filter(question => question.id !== questionId)
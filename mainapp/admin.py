@@ -1,5 +1,12 @@
 from django.contrib import admin
-from .models import MyUser, Answer, Question, Comment
+from .models import MyUser, Answer, Question, Comment, ProfilingTarget
 # Register your models here.
 
 admin.site.register([MyUser, Answer,Question,Comment])
+
+
+@admin.register(ProfilingTarget)
+class ProfilingTargetAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'is_active', 'expires', 'note')
+    list_filter = ('is_active',)
+    raw_id_fields = ('user',)
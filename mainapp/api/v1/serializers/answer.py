@@ -1,16 +1,47 @@
 from rest_framework import serializers
 
+from mainapp.api.v1.serializers.comment import CommentExplicitSerializer
+from mainapp.api.v1.serializers.fields import RenditionsField
 from mainapp.api.v1.serializers.user import UserSerializer
 from mainapp.models import Answer
 
+# relations read by AnswerSerializer, to be loaded with select_related
+ANSWER_RELATED = ('question__askedUser__myuser', 'question__asker__myuser')
+
 
 class AnswerSerializer(serializers.ModelSerializer):
     question_text = serializers.CharField(source='question.question_text')
     question_id = serializers.CharField(source='question.id')
     askedUser = UserSerializer(source='question.askedUser', many=False)
     asker = UserSerializer(source='question.asker', many=False)
+    photo_renditions = RenditionsField()
+    comments_preview = serializers.SerializerMethodField()
 
     class Meta:
         model = Answer
         fields = (
-        'id', 'answer_text', 'likes', 'dislikes', 'timestamp', 'question_text', 'question_id', 'askedUser', 'asker')
\ No newline at end of file
+        'id', 'answer_text', 'likes', 'dislikes', 'timestamp', 'question_text', 'question_id', 'askedUser', 'asker',
+        'photo_renditions', 'comment_count', 'comments_preview')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # latest comments are served only when view fetched them, see comments.preview
+        if 'comments_preview' not in self.context:
+            self.fields.pop('comments_preview')
+
+    def get_comments_preview(self, answer):
+        comments = self.context['comments_preview'].get(answer.id, [])
+        return CommentExplicitSerializer(comments, many=True, context=self.context).data
+
+
+class AnswerCreateSerializer(serializers.ModelSerializer):
+    question_id = serializers.CharField()
+
+    class Meta:
+        model = Answer
+        fields = ('answer_text', 'question_id')
+
+    def create(self, validated_data):
+        text = validated_data.pop('answer_text')
+        question_id = validated_data.pop('question_id')
+        return Answer.objects.create(answer_text=text, question_id=question_id)
@@ -3,6 +3,9 @@ from rest_framework import serializers
 from mainapp.api.v1.serializers.user import UserSerializer
 from mainapp.models import Comment
 
+# relations read by CommentExplicitSerializer, to be loaded with select_related
+COMMENT_RELATED = ('commented_user__myuser',)
+
 
 class CommentExplicitSerializer(serializers.ModelSerializer):
     commented_user = UserSerializer(many=False)
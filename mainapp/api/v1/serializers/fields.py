@@ -0,0 +1,22 @@
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+
+def rendition_urls(value, request=None):
+    """
+    Turns {rendition: stored name} into {rendition: url}
+    """
+    urls = {}
+    for name, stored_name in (value or {}).items():
+        url = default_storage.url(stored_name)
+        urls[name] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+class RenditionsField(serializers.ReadOnlyField):
+    """
+    Represents {rendition: stored name} as {rendition: url}
+    """
+
+    def to_representation(self, value):
+        return rendition_urls(value, self.context.get('request', None))
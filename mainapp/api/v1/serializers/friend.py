@@ -2,6 +2,13 @@ from friendship.models import FriendshipRequest, Friend
 from rest_framework import serializers
 
 from mainapp.api.v1.serializers.user import UserSerializer
+from mainapp.models import FriendSuggestion
+
+# relations read by FriendshipRequestSerializer, to be loaded with select_related
+FRIENDSHIP_REQUEST_RELATED = ('from_user__myuser',)
+
+# relations read by FriendSuggestionSerializer, to be loaded with select_related
+FRIEND_SUGGESTION_RELATED = ('suggested__myuser',)
 
 
 class FriendshipRequestSerializer(serializers.ModelSerializer):
@@ -15,4 +22,11 @@ class FriendshipRequestSerializer(serializers.ModelSerializer):
 class FriendSerializer(serializers.ModelSerializer):
     class Meta:
         model = Friend
-        fields = ('id', 'created', 'from_user_id', 'to_user_id')
\ No newline at end of file
+        fields = ('id', 'created', 'from_user_id', 'to_user_id')
+
+class FriendSuggestionSerializer(serializers.ModelSerializer):
+    suggested = UserSerializer(many=False)
+
+    class Meta:
+        model = FriendSuggestion
+        fields = ('suggested', 'score', 'mutual_count', 'interactions')
@@ -1,9 +1,29 @@
 from rest_framework import serializers
 
-from mainapp.models import Question
+from mainapp.models import MyUser, Question
 
 
 class QuestionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Question
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class MultipleQuestionsSerializer(serializers.Serializer):
+    question_text = serializers.CharField()
+    askedUsers = serializers.ListField(child=serializers.IntegerField(), required=False)
+    askAllFriends = serializers.BooleanField(default=False)
+    isAnon = serializers.BooleanField(default=False)
+
+    def validate_askedUsers(self, value):
+        # questions to users which don't accept anonymous ones are skipped, unknown users are an error
+        user_ids = set(value)
+        unknown = user_ids - set(MyUser.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        if unknown:
+            raise serializers.ValidationError(f'Unknown users: {", ".join(map(str, sorted(unknown)))}')
+        return value
+
+    def validate(self, data):
+        if not data['askAllFriends'] and not data.get('askedUsers'):
+            raise serializers.ValidationError('Choose users to ask')
+        return data
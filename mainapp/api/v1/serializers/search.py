@@ -0,0 +1,15 @@
+from rest_framework import serializers
+
+from mainapp.api.v1.serializers.user import UserSerializer
+from mainapp.models import SearchDocument
+
+# relations read by SearchDocumentSerializer, to be loaded with select_related
+SEARCH_DOCUMENT_RELATED = ('owner__myuser',)
+
+
+class SearchDocumentSerializer(serializers.ModelSerializer):
+    owner = UserSerializer(many=False)
+
+    class Meta:
+        model = SearchDocument
+        fields = ('kind', 'object_id', 'answer_id', 'text', 'timestamp', 'owner')
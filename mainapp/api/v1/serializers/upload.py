@@ -0,0 +1,35 @@
+from rest_framework import serializers
+
+from mainapp import uploads
+from mainapp.models import Answer, UploadTicket
+
+
+class UploadTicketSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadTicket
+        fields = ('id', 'target', 'object_id', 'status', 'received', 'max_size', 'expires')
+
+
+class UploadTicketCreateSerializer(serializers.Serializer):
+    target = serializers.ChoiceField(choices=[UploadTicket.AVATAR, UploadTicket.ANSWER_PHOTO])
+    answer_id = serializers.IntegerField(required=False)
+    content_type = serializers.ChoiceField(choices=list(uploads.CONTENT_TYPES))
+    size = serializers.IntegerField(min_value=1)
+
+    def validate_size(self, value):
+        if value > uploads.max_size():
+            raise serializers.ValidationError(f'Image must be at most {uploads.max_size()} bytes')
+        return value
+
+    def validate(self, data):
+        if data['target'] == UploadTicket.ANSWER_PHOTO:
+            user = self.context['request'].user
+            answer_id = data.get('answer_id')
+            if not Answer.objects.filter(id=answer_id, question__askedUser_id=user.id).exists():
+                raise serializers.ValidationError('Photo can be uploaded only to own answer')
+        return data
+
+    def create(self, validated_data):
+        return uploads.issue(self.context['request'].user, validated_data['target'],
+                             validated_data['content_type'], validated_data['size'],
+                             answer_id=validated_data.get('answer_id'))
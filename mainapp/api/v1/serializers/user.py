@@ -4,14 +4,19 @@ from django.contrib.auth.models import User
 from rest_auth.serializers import UserDetailsSerializer
 from rest_framework import serializers
 
+from mainapp.api.v1.serializers.fields import RenditionsField
 from mainapp.models import MyUser
 
+# relations read by UserSerializer, to be loaded with select_related
+USER_RELATED = ('myuser',)
+
 
 class UserSerializer(UserDetailsSerializer):
     avatar = serializers.ImageField(source="myuser.avatar")
+    avatarRenditions = RenditionsField(source="myuser.avatarRenditions")
 
     class Meta(UserDetailsSerializer.Meta):
-        fields = UserDetailsSerializer.Meta.fields + ('avatar',)
+        fields = UserDetailsSerializer.Meta.fields + ('avatar', 'avatarRenditions')
 
 
 class UserExplicitSerializer(UserSerializer):
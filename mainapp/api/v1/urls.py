@@ -5,28 +5,35 @@ from mainapp.api.v1.views.account import AccountSettingsView, AccountInfoView, A
 from mainapp.api.v1.views.answer import AnswerCreateView, AnswerLikeView, AnswersAccountListView, AnswersListView
 from mainapp.api.v1.views.comment import CommentListView, create_comment_view
 from mainapp.api.v1.views.friend import FriendListView, deleteFrienshipView, createFrienshipRequestView, rejectFriendshipView, \
-    AcceptFriendshipView, FriendRequestsListView, UserSearchListView
+    AcceptFriendshipView, FriendRequestsListView, UserSearchListView, FriendSuggestionListView
+from mainapp.api.v1.views.push import EventsTicketView
+from mainapp.api.v1.views.recorder import FlightRecordListView, FlightRecordView
+from mainapp.api.v1.views.search import ContentSearchView
+from mainapp.api.v1.views.sync import SyncView
 from mainapp.api.v1.views.question import MultipleQuestionsCreateView, QuestionCreateView, QuestionDeleteView, QuestionViewSet
+from mainapp.api.v1.views.upload import UploadCompleteView, UploadTicketCreateView, UploadTicketView
+from mainapp.async_db import read_view
+from mainapp.models import Reaction
 
 router = DefaultRouter()
 router.register(r'questions', QuestionViewSet, basename='questions')
 
 urlpatterns = [
-    path('users/<username>/info/stats/', AccountInfoStatsView, name="user_info_stats"),
-    path('users/<username>/info/', AccountInfoView.as_view(), name="user_account_info"),
+    path('users/<username>/info/stats/', read_view(AccountInfoStatsView), name="user_info_stats"),
+    path('users/<username>/info/', read_view(AccountInfoView.as_view()), name="user_account_info"),
     path('users/<username>/answers/', AnswersAccountListView.as_view(), name="user_account_answers"),
 
     path('account/settings/update/', AccountSettingsView.as_view(), name="account_settings_update"),
-    path('account/info/stats/', AccountInfoStatsView, name="account_info_stats"),
-    path('account/info/', AccountInfoView.as_view(), name="account_info"),
+    path('account/info/stats/', read_view(AccountInfoStatsView), name="account_info_stats"),
+    path('account/info/', read_view(AccountInfoView.as_view()), name="account_info"),
     path('account/answers/', AnswersAccountListView.as_view(), name='account_answers'),
 
-    path('answer/<pk>/dislike/', AnswerLikeView.as_view(), name='dislike_answer'),
-    path('answer/<pk>/like/', AnswerLikeView.as_view(), name='like_answer'),
-    path('answer/<answerId>/comments/', CommentListView.as_view(), name='comments_list'),
+    path('answer/<pk>/dislike/', AnswerLikeView.as_view(reaction=Reaction.DISLIKE), name='dislike_answer'),
+    path('answer/<pk>/like/', AnswerLikeView.as_view(reaction=Reaction.LIKE), name='like_answer'),
+    path('answer/<answerId>/comments/', read_view(CommentListView.as_view()), name='comments_list'),
     path('answer/<answerId>/comment/create/', create_comment_view, name='create_comment'),
     path('answers/create/', AnswerCreateView.as_view(), name='create_answer'),
-    path('answers/', AnswersListView.as_view(), name='wall_answers'),
+    path('answers/', read_view(AnswersListView.as_view()), name='wall_answers'),
 
     path('questions/multiple/create/', MultipleQuestionsCreateView.as_view(), name='create_multiple_questions'),
     path('questions/create/', QuestionCreateView.as_view(), name='create_question'),
@@ -38,7 +45,19 @@ urlpatterns = [
     path('friendship/create/<pk>/', AcceptFriendshipView.as_view(), name='accept_friend_request'),
     path('friends/requests/', FriendRequestsListView.as_view(), name='friend_requests_list'),
     path('friends/', FriendListView.as_view(), name='friends_list'),
-    path('users/search/', UserSearchListView.as_view(), name='user_search')
+    path('users/search/', UserSearchListView.as_view(), name='user_search'),
+    path('users/suggestions/', FriendSuggestionListView.as_view(), name='friend_suggestions'),
+
+    path('search/', ContentSearchView.as_view(), name='content_search'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('events/ticket/', EventsTicketView.as_view(), name='events_ticket'),
+
+    path('debug/flight-records/<pk>/', FlightRecordView.as_view(), name='flight_record'),
+    path('debug/flight-records/', FlightRecordListView.as_view(), name='flight_records'),
+
+    path('uploads/<uuid:pk>/complete/', UploadCompleteView.as_view(), name='upload_complete'),
+    path('uploads/<uuid:pk>/', UploadTicketView.as_view(), name='upload_ticket'),
+    path('uploads/', UploadTicketCreateView.as_view(), name='upload_tickets'),
 ]
 
 urlpatterns += router.urls
@@ -1,13 +1,13 @@
 from django.contrib.auth.models import User, AnonymousUser
-from django.db.models import Sum
-from django.http import HttpResponseNotFound
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from friendship.models import Friend
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.response import Response
 
-from mainapp.models import Question, Answer
+from mainapp import stats
+from mainapp.models import UserStats
+from mainapp.profile_cache import ProfileCacheMixin, cached_profile_response
 from mainapp.api.v1.serializers.user import UserExplicitSerializer
 from mainapp.utils import TokenAllowAnyAuthentication
 
@@ -28,24 +28,21 @@ class AccountSettingsView(generics.UpdateAPIView):
         return self.partial_update(request, *args, **kwargs)
 
 
-class AccountInfoView(generics.RetrieveAPIView):
+class AccountInfoView(ProfileCacheMixin, generics.RetrieveAPIView):
     """
     provides basic information about user
     """
     permission_classes = [permissions.AllowAny]
     authentication_classes = [TokenAllowAnyAuthentication]
     serializer_class = UserExplicitSerializer
-    queryset = User.objects.all()
+    queryset = User.objects.select_related('myuser')
 
     def get_object(self):
-        # if it's called with username in url then use that user and signed in user otherwise
-        try:
-            user = User.objects.get(
-                username=self.kwargs['username']) if 'username' in self.kwargs else self.request.user
-            obj = get_object_or_404(User, pk=user.id)
-        except User.DoesNotExist:
-            return HttpResponseNotFound('not found')
-        return obj
+        # if it's called with username in url then use that user and signed in user otherwise,
+        # user and profile come in a single query
+        if 'username' in self.kwargs:
+            return get_object_or_404(self.get_queryset(), username=self.kwargs['username'])
+        return get_object_or_404(self.get_queryset(), pk=self.request.user.id)
 
 
 @api_view(['GET'])
@@ -55,27 +52,33 @@ def AccountInfoStatsView(request, username=None):
     """
     Provides user statistics related to specific user
     """
+    return cached_profile_response(request, 'AccountInfoStatsView', username,
+                                   lambda: account_stats_response(request, username))
 
+
+def account_stats_response(request, username):
     # if username is passed through url, then send stat about its user
     # else send stat about signed in user
-    user = request.user
     if username is not None:
-        user = User.objects.get(username=username)
-
-    if isinstance(user, AnonymousUser):
+        # user and stats come in a single query, stats may not exist yet
+        user = User.objects.filter(username=username).select_related('stats').first()
+        if user is None:
+            raise Http404
+        try:
+            user_stats = user.stats
+        except UserStats.DoesNotExist:
+            user_stats = stats.get(user.id)
+    elif isinstance(request.user, AnonymousUser):
         return Response(data={}, status=status.HTTP_400_BAD_REQUEST)
-
-    # questions related to specific user
-    questions = Question.objects.filter(askedUser_id=user.id)
-
-    # answers related to specific user
-    answers = Answer.objects.filter(question__in=questions)
-    answers_count = answers.count()
-
-    friends_count = len(Friend.objects.friends(user))
-    likes_count = answers.aggregate(Sum('likes'))['likes__sum']
+    else:
+        user_stats = stats.get(request.user.id)
 
     return Response(
-        data={'answersCount': answers_count, 'friendsCount': friends_count, 'likesCount': likes_count},
+        data={
+            'answersCount': user_stats.answers_count,
+            'friendsCount': user_stats.friends_count,
+            'likesCount': user_stats.likes_count,
+            'unansweredCount': user_stats.unanswered_count,
+        },
         status=status.HTTP_200_OK
-    )
\ No newline at end of file
+    )
@@ -1,10 +1,16 @@
 from django.contrib.auth.models import User
-from friendship.models import Friend
-from rest_framework import generics, permissions, serializers
+from django.http import Http404
+from rest_framework import generics, permissions, status
 from rest_framework.pagination import CursorPagination
-
-from mainapp.models import Answer, Question
-from mainapp.api.v1.serializers.answer import AnswerSerializer
+from rest_framework.response import Response
+
+from askme import instrumentation
+from mainapp import comments, feed, reactions
+from mainapp.models import Answer, Reaction
+from mainapp.profile_cache import ProfileCacheMixin
+from mainapp.api.v1.serializers import fast
+from mainapp.api.v1.serializers.answer import ANSWER_RELATED, AnswerSerializer, AnswerCreateSerializer
+from mainapp.api.v1.serializers.comment import COMMENT_RELATED
 from mainapp.utils import TokenAllowAnyAuthentication
 
 
@@ -13,22 +19,36 @@ class AnswerCreateView(generics.CreateAPIView):
     Creates answers
     """
 
-    serializer_class = AnswerSerializer
+    serializer_class = AnswerCreateSerializer
     queryset = Answer.objects.all()
 
 
-class AnswerLikeView(generics.UpdateAPIView):
+class AnswerLikeView(generics.GenericAPIView):
     """
-    Updates like or dislike amount of specific answer
+    Likes or dislikes specific answer, once per user.
+    Responds with new like and dislike amounts
     """
-    serializer_class = AnswerSerializer
     queryset = Answer.objects.all()
+    reaction = Reaction.LIKE
 
-    def patch(self, request, *args, **kwargs):
-        return self.partial_update(request, *args, **kwargs)
+    def react(self, value, replaces=None):
+        answer_id = self.kwargs['pk']
+        if not Answer.objects.filter(pk=answer_id).exists():
+            raise Http404
+        counts = reactions.react(self.request.user, answer_id, value, replaces=replaces)
+        return Response(counts, status=status.HTTP_200_OK)
+
+    def post(self, request, *args, **kwargs):
+        return self.react(self.reaction)
 
     def put(self, request, *args, **kwargs):
-        return self.partial_update(request, *args, **kwargs)
+        return self.react(self.reaction)
+
+    def patch(self, request, *args, **kwargs):
+        return self.react(self.reaction)
+
+    def delete(self, request, *args, **kwargs):
+        return self.react(None, replaces=self.reaction)
 
 
 class AnswersPagination(CursorPagination):
@@ -37,7 +57,41 @@ class AnswersPagination(CursorPagination):
     ordering = '-timestamp'
 
 
-class AnswersAccountListView(generics.ListAPIView):
+class CommentsPreviewMixin:
+    """
+    Embeds latest comments of every answer of the page, when asked with `comments_preview=<amount>`
+    """
+    max_comments_preview = 5
+
+    def comments_preview_size(self):
+        try:
+            size = int(self.request.query_params.get('comments_preview', 0))
+        except ValueError:
+            return 0
+        return max(0, min(size, self.max_comments_preview))
+
+    def serialize_answers(self, answers):
+        context = self.get_serializer_context()
+        size = self.comments_preview_size()
+        if size:
+            context['comments_preview'] = comments.preview([answer.id for answer in answers], size,
+                                                           related=COMMENT_RELATED)
+        return self.get_serializer_class()(answers, many=True, context=context).data
+
+    def build_answers(self, rows, build):
+        """
+        Fast counterpart of serialize_answers for rows of `build.fields`
+        """
+        size = self.comments_preview_size()
+        preview = None
+        if size:
+            preview = comments.preview([row[build.id_key] for row in rows], size, fields=fast.build_comment.fields)
+        # builders don't go through BaseSerializer.data, which is timed
+        with instrumentation.timed('serialize'):
+            return [build(row, self.request, preview) for row in rows]
+
+
+class AnswersAccountListView(ProfileCacheMixin, CommentsPreviewMixin, generics.ListAPIView):
     """
         Provides queryset of all answers that answered specific user
     """
@@ -45,46 +99,46 @@ class AnswersAccountListView(generics.ListAPIView):
     authentication_classes = [TokenAllowAnyAuthentication]
     serializer_class = AnswerSerializer
     pagination_class = AnswersPagination
+    query_budget = 5
 
     def get_queryset(self):
         user = User.objects.get(username=self.kwargs['username']) if 'username' in self.kwargs else self.request.user
-        # questions related to specific user
-        questions = Question.objects.filter(askedUser_id=user.id)
 
         # answers related to specific user
-        answers = Answer.objects.filter(question__in=questions)
+        answers = Answer.objects.filter(question__askedUser_id=user.id).select_related(*ANSWER_RELATED)
         return answers
 
+    def list(self, request, *args, **kwargs):
+        if fast.enabled():
+            page = self.paginate_queryset(self.get_queryset().values(*fast.build_answer.fields))
+            return self.get_paginated_response(self.build_answers(page, fast.build_answer))
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(self.serialize_answers(page))
 
-class AnswersListView(generics.ListAPIView):
+
+class AnswersListView(CommentsPreviewMixin, generics.ListAPIView):
     """
         Provides queryset of all answers that user's friends posted
     """
 
     serializer_class = AnswerSerializer
     pagination_class = AnswersPagination
+    query_budget = 9
 
     def get_queryset(self):
         user = self.request.user
-        friends = Friend.objects.friends(user)
-
-        # questions related to friends
-        questions = Question.objects.filter(askedUser__in=friends)
-
-        # answers related to specific user
-        answers = Answer.objects.filter(question__in=questions)
-
-        return answers
 
+        # answers of friends in pull mode are collected when the first page is opened
+        if self.paginator.cursor_query_param not in self.request.query_params:
+            feed.pull(user)
 
-class AnswerCreateSerializer(serializers.ModelSerializer):
-    question_id = serializers.CharField()
+        return feed.entries(user, related=ANSWER_RELATED)
 
-    class Meta:
-        model = Answer
-        fields = ('answer_text', 'question_id')
+    def list(self, request, *args, **kwargs):
+        # feed is paginated by entries, but answers are what is served
+        if fast.enabled():
+            page = self.paginate_queryset(self.get_queryset().values('timestamp', *fast.build_entry_answer.fields))
+            return self.get_paginated_response(self.build_answers(page, fast.build_entry_answer))
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(self.serialize_answers([entry.answer for entry in page]))
 
-    def create(self, validated_data):
-        text = validated_data.pop('answer_text')
-        question_id = validated_data.pop('question_id')
-        return Answer.objects.create(answer_text=text, question_id=question_id)
\ No newline at end of file
@@ -1,20 +1,102 @@
+from django.db.models import Q
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
 from rest_framework import generics, status
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
 from rest_framework.response import Response
 
+from askme import instrumentation
 from mainapp.models import Comment, Answer
-from mainapp.api.v1.serializers.comment import CommentExplicitSerializer, CommentShortSerializer
+from mainapp.api.v1.serializers import fast
+from mainapp.api.v1.serializers.comment import COMMENT_RELATED, CommentExplicitSerializer, CommentShortSerializer
+
+
+class CommentsPagination(CursorPagination):
+    """
+    Pages comments newest first by (timestamp, id). CursorPagination positions
+    the cursor on timestamp only and skips comments of the same timestamp by
+    offset, here the cursor keeps both and a page is a single range condition
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-timestamp', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        if self.cursor is not None and self.cursor.position is not None:
+            timestamp, pk = self.decode_position(self.cursor.position)
+            if reverse:
+                queryset = queryset.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+        queryset = queryset.order_by(*(('timestamp', 'id') if reverse else self.ordering))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+        # a cursor comes from a neighbouring page, which is there in the other direction
+        self.has_next = has_more if not reverse else self.cursor is not None
+        self.has_previous = self.cursor is not None if not reverse else has_more
+        return self.page
+
+    def encode_position(self, row):
+        # pages of the fast path are values() rows
+        timestamp, pk = (row['timestamp'], row['id']) if isinstance(row, dict) else (row.timestamp, row.id)
+        return f'{timestamp.isoformat()}|{pk}'
+
+    def decode_position(self, position):
+        timestamp, _, pk = position.partition('|')
+        try:
+            parsed = parse_datetime(timestamp)
+            pk = int(pk)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise NotFound(self.invalid_cursor_message)
+        return parsed, pk
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self.encode_position(self.page[-1]) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self.encode_position(self.page[0]) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
 
 
 class CommentListView(generics.ListAPIView):
     serializer_class = CommentExplicitSerializer
+    pagination_class = CommentsPagination
+    query_budget = 2
 
     def get_queryset(self):
         answer_id = self.kwargs['answerId']
-        queryset = Comment.objects.filter(answer_id=answer_id).order_by('-timestamp')
+        queryset = Comment.objects.filter(answer_id=answer_id).select_related(*COMMENT_RELATED)
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        if not fast.enabled():
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(self.get_queryset().values(*fast.build_comment.fields))
+        with instrumentation.timed('serialize'):
+            data = [fast.build_comment(row, request) for row in page]
+        return self.get_paginated_response(data)
+
 
 @api_view(['POST'])
 def create_comment_view(request, answerId):
@@ -2,12 +2,17 @@ from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from friendship.exceptions import AlreadyFriendsError, AlreadyExistsError
 from friendship.models import Friend, FriendshipRequest
-from rest_framework import generics, status, filters
+from rest_framework import generics, status
 from rest_framework.decorators import api_view
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
-from mainapp.api.v1.serializers.friend import FriendshipRequestSerializer
-from mainapp.api.v1.serializers.user import UserSerializer
+from askme import instrumentation
+from mainapp import friend_graph, suggestions, user_search
+from mainapp.api.v1.serializers import fast
+from mainapp.api.v1.serializers.friend import FRIEND_SUGGESTION_RELATED, FRIENDSHIP_REQUEST_RELATED, \
+    FriendshipRequestSerializer, FriendSuggestionSerializer
+from mainapp.api.v1.serializers.user import USER_RELATED, UserSerializer
 
 
 class FriendListView(generics.ListAPIView):
@@ -15,14 +20,23 @@ class FriendListView(generics.ListAPIView):
     Provides list of user's friends
     """
     serializer_class = UserSerializer
+    query_budget = 2
 
     def get_queryset(self):
-        token_str = self.request.headers['Authorization']
-        token_val = token_str.split()[1]
-        user = User.objects.get(auth_token=token_val)
+        user = self.request.user
+        friend_ids = list(friend_graph.friend_ids(user.id))
+        if len(friend_ids) > friend_graph.IN_BATCH_SIZE:
+            # too many ids for one IN list, the database joins friendships itself
+            friend_ids = Friend.objects.filter(to_user_id=user.id).values('from_user_id')
+        return User.objects.filter(id__in=friend_ids).select_related(*USER_RELATED).order_by('id')
 
-        queryset = Friend.objects.friends(user)
-        return self.serializer_class(queryset, many=True)
+    def list(self, request, *args, **kwargs):
+        if not fast.enabled():
+            return super().list(request, *args, **kwargs)
+        rows = list(self.get_queryset().values(*fast.build_user.fields))
+        with instrumentation.timed('serialize'):
+            data = [fast.build_user(row, request) for row in rows]
+        return Response(data)
 
 
 @api_view(['GET', 'POST'])
@@ -81,18 +95,41 @@ class FriendRequestsListView(generics.ListAPIView):
     Provides list of friend requests to specific user
     """
     serializer_class = FriendshipRequestSerializer
+    query_budget = 2
 
     def get_queryset(self):
         user = self.request.user
-        return FriendshipRequest.objects.filter(to_user=user.id).filter(rejected=None)
+        requests = FriendshipRequest.objects.filter(to_user=user.id).filter(rejected=None)
+        return requests.select_related(*FRIENDSHIP_REQUEST_RELATED)
+
+
+class UserSearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
 
 
 class UserSearchListView(generics.ListAPIView):
     """
-    Search users
+    Search users, exact usernames and friends first
     """
 
-    queryset = User.objects.all()
     serializer_class = UserSerializer
-    search_fields = ['username', 'first_name', 'last_name']
-    filter_backends = (filters.SearchFilter,)
\ No newline at end of file
+    pagination_class = UserSearchPagination
+    query_budget = 3
+
+    def get_queryset(self):
+        query = self.request.query_params.get('search', '')
+        return user_search.search(query, self.request.user).select_related(*USER_RELATED)
+
+
+class FriendSuggestionListView(generics.ListAPIView):
+    """
+    Provides people user may know, most mutual friends and interactions first
+    """
+    serializer_class = FriendSuggestionSerializer
+    query_budget = 2
+    max_count = 50
+
+    def get_queryset(self):
+        return suggestions.for_user(self.request.user).select_related(*FRIEND_SUGGESTION_RELATED)[:self.max_count]
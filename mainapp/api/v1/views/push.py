@@ -0,0 +1,15 @@
+from rest_framework import generics, status
+from rest_framework.response import Response
+
+from mainapp import push
+
+
+class EventsTicketView(generics.GenericAPIView):
+    """
+    Issues short-lived ticket which opens the event stream of signed in user as /api/events/?ticket=
+    """
+    query_budget = 0
+
+    def post(self, request, *args, **kwargs):
+        return Response({'ticket': push.issue_ticket(request.user), 'expires_in': push.ticket_max_age()},
+                        status=status.HTTP_201_CREATED)
@@ -1,31 +1,35 @@
 from rest_framework import generics, status, permissions, viewsets
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 
-from mainapp.models import Question, Answer
-from mainapp.api.v1.serializers.question import QuestionSerializer
+from mainapp import inbox, question_fanout
+from mainapp.models import Question
+from mainapp.api.v1.serializers.question import MultipleQuestionsSerializer, QuestionSerializer
 
 
 class MultipleQuestionsCreateView(generics.CreateAPIView):
     """
-    Creates questions with same text to multiple users
+    Creates questions with same text to multiple users or to all friends
     """
     queryset = Question.objects.all()
-    serializer_class = QuestionSerializer
+    serializer_class = MultipleQuestionsSerializer
+    query_budget = 8
 
     def create(self, request, *args, **kwargs):
-        user = self.request.user
-        res = []
-        for askedUserId in request.data['askedUsers']:
-            dict = {'question_text': request.data['question_text'], 'askedUser': askedUserId}
-            if not request.data['isAnon']:
-                dict['asker'] = user.id
-            res.append(dict)
-
-        serializer = self.get_serializer(data=res, many=True)
+        serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
-        headers = self.get_success_headers(serializer.data)
-        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+        data = serializer.validated_data
+
+        if data['askAllFriends']:
+            questions = question_fanout.ask_friends(request.user.id, data['question_text'], data['isAnon'])
+        else:
+            questions = question_fanout.ask_many(request.user.id, data['question_text'], data['askedUsers'],
+                                                 data['isAnon'])
+
+        # large audiences are asked in background
+        if questions is None:
+            return Response({'message': 'questions are being sent'}, status=status.HTTP_202_ACCEPTED)
+        return Response(QuestionSerializer(questions, many=True).data, status=status.HTTP_201_CREATED)
 
 
 class QuestionCreateView(generics.CreateAPIView):
@@ -61,14 +65,19 @@ class QuestionDeleteView(generics.DestroyAPIView):
     permission_classes = (permissions.IsAuthenticated,)
 
 
+class InboxPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    ordering = '-timestamp'
+
+
 class QuestionViewSet(viewsets.ModelViewSet):
     """
     Provides unaswered questions to related user
     """
     serializer_class = QuestionSerializer
+    pagination_class = InboxPagination
+    query_budget = 2
 
     def get_queryset(self):
-        user = self.request.user
-        answers = Answer.objects.all()
-        questions = Question.objects.filter(askedUser=user).exclude(answer__in=answers).order_by('-timestamp')
-        return questions
\ No newline at end of file
+        return inbox.unanswered(self.request.user)
@@ -0,0 +1,33 @@
+from django.http import FileResponse
+from rest_framework import generics, permissions
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from mainapp import flight_recorder
+
+
+class FlightRecordListView(generics.GenericAPIView):
+    """
+    Lists captured slow and profiled requests of this process' ring buffer, newest first
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(flight_recorder.captures())
+
+
+class FlightRecordView(generics.GenericAPIView):
+    """
+    Downloads capture with SQL and stack samples of a request
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        path = flight_recorder.capture_path(kwargs['pk'])
+        if path is None:
+            raise NotFound('Invalid capture id')
+        try:
+            return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{kwargs["pk"]}.json',
+                                content_type='application/json')
+        except FileNotFoundError:
+            raise NotFound('Capture was dropped from the ring buffer')
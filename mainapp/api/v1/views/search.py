@@ -0,0 +1,48 @@
+from base64 import b64decode, b64encode
+from binascii import Error as DecodeError
+
+from rest_framework import generics
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from mainapp import content_search
+from mainapp.api.v1.serializers.search import SEARCH_DOCUMENT_RELATED, SearchDocumentSerializer
+
+
+def encode_cursor(score, document_id):
+    return b64encode(f'{score!r}:{document_id}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        score, document_id = b64decode(cursor.encode()).decode().split(':')
+        return float(score), int(document_id)
+    except (DecodeError, UnicodeDecodeError, ValueError):
+        raise NotFound('Invalid cursor')
+
+
+class ContentSearchView(generics.GenericAPIView):
+    """
+    Searches questions, answers and comments, best matches first
+    """
+    serializer_class = SearchDocumentSerializer
+    page_size = 20
+    query_budget = 3
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '')
+        cursor = request.query_params.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+
+        found = content_search.search(query, request.user, self.page_size + 1, after=after,
+                                      related=SEARCH_DOCUMENT_RELATED)
+        page = found[:self.page_size]
+
+        next_url = None
+        if len(found) > self.page_size:
+            document, score = page[-1]
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(score, document.id))
+
+        serializer = self.get_serializer([document for document, _ in page], many=True)
+        return Response({'next': next_url, 'results': serializer.data})
@@ -0,0 +1,68 @@
+from friendship.models import FriendshipRequest
+from rest_framework import generics
+from rest_framework.response import Response
+
+from mainapp import changelog, feed
+from mainapp.models import ChangeLogEntry, Question
+from mainapp.api.v1.serializers.answer import ANSWER_RELATED, AnswerSerializer
+from mainapp.api.v1.serializers.friend import FRIENDSHIP_REQUEST_RELATED, FriendshipRequestSerializer
+from mainapp.api.v1.serializers.question import QuestionSerializer
+
+
+class SyncView(generics.GenericAPIView):
+    """
+    Provides what changed in inbox, feed and friend requests since cursor.
+    Without a usable cursor responds with reset, then lists have to be loaded from scratch
+    """
+    page_size = 500
+    query_budget = 10
+
+    def get(self, request, *args, **kwargs):
+        user = request.user
+        cursor = request.query_params.get('cursor')
+        after = changelog.decode_cursor(cursor, user.id) if cursor else None
+
+        # answers of friends in pull mode get to the feed and the change log by pulling
+        feed.pull(user)
+
+        if after is None or after < changelog.horizon():
+            return Response({
+                'reset': True,
+                'cursor': changelog.encode_cursor(user.id, changelog.latest_id(user.id)),
+                'has_more': False,
+                'changes': {},
+            })
+
+        changed, last_id, has_more = changelog.changes(user.id, after, self.page_size)
+        return Response({
+            'reset': False,
+            'cursor': changelog.encode_cursor(user.id, last_id),
+            'has_more': has_more,
+            'changes': {
+                ChangeLogEntry.INBOX: self.collection(changed[ChangeLogEntry.INBOX], self.load_inbox),
+                ChangeLogEntry.FEED: self.collection(changed[ChangeLogEntry.FEED], self.load_feed),
+                ChangeLogEntry.FRIEND_REQUESTS: self.collection(changed[ChangeLogEntry.FRIEND_REQUESTS],
+                                                                self.load_friend_requests),
+            },
+        })
+
+    def collection(self, changed, load):
+        upserted_ids = [object_id for object_id, op in changed.items() if op == ChangeLogEntry.UPSERT]
+        upserted = load(upserted_ids) if upserted_ids else {}
+        # items which are gone by now are reported as deleted
+        deleted = [object_id for object_id in changed if object_id not in upserted]
+        return {'upserted': list(upserted.values()), 'deleted': deleted}
+
+    def load_inbox(self, question_ids):
+        questions = Question.objects.filter(id__in=question_ids, askedUser_id=self.request.user.id, answered=False)
+        return {question.id: QuestionSerializer(question).data for question in questions}
+
+    def load_feed(self, answer_ids):
+        entries = feed.entries(self.request.user, related=ANSWER_RELATED).filter(answer_id__in=answer_ids)
+        context = self.get_serializer_context()
+        return {entry.answer_id: AnswerSerializer(entry.answer, context=context).data for entry in entries}
+
+    def load_friend_requests(self, request_ids):
+        requests = FriendshipRequest.objects.filter(id__in=request_ids, to_user_id=self.request.user.id, rejected=None)
+        requests = requests.select_related(*FRIENDSHIP_REQUEST_RELATED)
+        return {friend_request.id: FriendshipRequestSerializer(friend_request).data for friend_request in requests}
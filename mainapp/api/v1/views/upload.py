@@ -0,0 +1,81 @@
+from django.urls import reverse
+from rest_framework import generics, status
+from rest_framework.response import Response
+
+from mainapp import uploads
+from mainapp.models import UploadTicket
+from mainapp.api.v1.serializers.upload import UploadTicketCreateSerializer, UploadTicketSerializer
+
+
+class UploadTicketCreateView(generics.GenericAPIView):
+    """
+    Issues ticket to upload an image directly to storage
+    """
+    serializer_class = UploadTicketCreateSerializer
+    query_budget = 2
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ticket = serializer.save()
+        chunk_url = request.build_absolute_uri(reverse('upload_ticket', kwargs={'pk': ticket.pk}))
+        data = UploadTicketSerializer(ticket).data
+        data['upload'] = uploads.upload_target(ticket, chunk_url)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class UploadTicketView(generics.RetrieveAPIView):
+    """
+    Provides state of upload, PUT streams a chunk of the image at Upload-Offset
+    """
+    serializer_class = UploadTicketSerializer
+    query_budget = 2
+
+    def get_queryset(self):
+        return UploadTicket.objects.filter(user_id=self.request.user.id)
+
+    def put(self, request, *args, **kwargs):
+        ticket = self.get_object()
+        if not uploads.accepts_chunks():
+            return Response({'message': 'Upload directly to storage'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        if ticket.status != UploadTicket.PENDING or ticket.is_expired():
+            return Response({'message': 'Upload is closed'}, status=status.HTTP_409_CONFLICT)
+
+        try:
+            offset = int(request.META.get('HTTP_UPLOAD_OFFSET', 0))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response({'message': 'Invalid Upload-Offset'}, status=status.HTTP_400_BAD_REQUEST)
+        if offset != ticket.received:
+            return Response({'message': 'Unexpected offset', 'received': ticket.received},
+                            status=status.HTTP_409_CONFLICT)
+        if offset + length > ticket.max_size:
+            return Response({'message': 'Image is larger than declared'},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        if length > uploads.max_request_size():
+            return Response({'message': 'Chunk is too large'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        # read the raw stream, request.data would buffer the whole body
+        try:
+            received = uploads.write_chunk(ticket, request.stream, offset, length)
+        except ValueError:
+            return Response({'message': 'Unexpected offset'}, status=status.HTTP_409_CONFLICT)
+        return Response({'received': received}, status=status.HTTP_200_OK)
+
+
+class UploadCompleteView(generics.GenericAPIView):
+    """
+    Finishes upload, the image is attached to profile or answer in background
+    """
+    serializer_class = UploadTicketSerializer
+    query_budget = 3
+
+    def get_queryset(self):
+        return UploadTicket.objects.filter(user_id=self.request.user.id)
+
+    def post(self, request, *args, **kwargs):
+        ticket = self.get_object()
+        if ticket.status != UploadTicket.PENDING or ticket.is_expired():
+            return Response({'message': 'Upload is closed'}, status=status.HTTP_409_CONFLICT)
+        uploads.complete(ticket)
+        return Response(self.get_serializer(ticket).data, status=status.HTTP_202_ACCEPTED)
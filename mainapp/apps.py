@@ -3,3 +3,13 @@ from django.apps import AppConfig
 
 class MainappConfig(AppConfig):
     name = 'mainapp'
+
+    def ready(self):
+        from askme import instrumentation
+        instrumentation.install()
+
+        # connect signal receivers of denormalized data
+        from mainapp import (  # noqa: F401
+            changelog, comments, content_search, deletion, feed, flight_recorder, friend_graph, images, inbox,
+            profile_cache, push, stats, suggestions, user_search, utils,
+        )
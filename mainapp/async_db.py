@@ -0,0 +1,126 @@
+"""
+Bounded thread pool for database work of async views.
+
+Under ASGI Django 3.1 runs every sync view in one shared thread, so a slow
+query of one request delays all the others. Views wrapped with `async_view`
+run in a pool of ASYNC_DB_WORKERS threads instead, each keeping its own
+database connection, so the number of requests served at once and the
+number of connections stay bounded. With ASYNC_DB_WORKERS = 0 views run in
+Django's shared thread, which tests need to see data of their transaction.
+
+`gather` runs independent queries of a view at once, in a second pool, so
+views waiting for their queries never take all threads their queries need.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from askme import db_router, instrumentation
+
+_executor = None
+_gather_executor = None
+
+
+def workers():
+    return getattr(settings, 'ASYNC_DB_WORKERS', 8)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=workers(), thread_name_prefix='askme-db')
+    return _executor
+
+
+def get_gather_executor():
+    global _gather_executor
+    if _gather_executor is None:
+        _gather_executor = ThreadPoolExecutor(max_workers=workers(), thread_name_prefix='askme-gather')
+    return _gather_executor
+
+
+def _call(func, args, kwargs, routing, timings):
+    # respects CONN_MAX_AGE, so threads of the pool reuse their connections
+    close_old_connections()
+    # database routing and timings of the request don't follow it to pool threads by themselves
+    db_router.set_state(routing)
+    try:
+        if timings is None:
+            return func(*args, **kwargs)
+        with instrumentation.recording(timings):
+            return func(*args, **kwargs)
+    finally:
+        db_router.set_state(None)
+        close_old_connections()
+
+
+async def run(func, *args, **kwargs):
+    """
+    Runs func(*args, **kwargs) in the pool
+    """
+    if not workers():
+        return await sync_to_async(func, thread_sensitive=True)(*args, **kwargs)
+    return await asyncio.get_event_loop().run_in_executor(get_executor(), _call, func, args, kwargs,
+                                                          db_router.get_state(), instrumentation.get_timings())
+
+
+def gather(*calls):
+    """
+    Runs independent database calls concurrently, each with its own connection, and provides their results in order.
+    Calls run one after another when ASYNC_DB_WORKERS is 0
+    """
+    if not workers() or len(calls) < 2:
+        return [call() for call in calls]
+    routing, timings = db_router.get_state(), instrumentation.get_timings()
+    futures = [get_gather_executor().submit(_call, call, (), {}, routing, timings) for call in calls[1:]]
+    # the first one runs in the calling thread meanwhile
+    return [calls[0]()] + [future.result() for future in futures]
+
+
+def _render(view, request, args, kwargs):
+    response = view(request, *args, **kwargs)
+    # render in the pool as well, otherwise Django renders in its shared thread
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    return response
+
+
+def async_view(view):
+    """
+    Turns sync view into async one that runs in the pool
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run(_render, view, request, args, kwargs)
+
+    return wrapper
+
+
+class ReadView:
+    """
+    Hot read view, served asynchronously when ASYNC_READ_VIEWS is on and synchronously when it is off,
+    as sync workers of WSGI need. Django tells async views by `_is_coroutine`, which follows the setting
+    on every request
+    """
+
+    def __init__(self, view):
+        self.view = view
+        self.async_view = async_view(view)
+        functools.update_wrapper(self, view)
+
+    @property
+    def _is_coroutine(self):
+        return asyncio.coroutines._is_coroutine if getattr(settings, 'ASYNC_READ_VIEWS', True) else None
+
+    def __call__(self, request, *args, **kwargs):
+        if self._is_coroutine is None:
+            return self.view(request, *args, **kwargs)
+        return self.async_view(request, *args, **kwargs)
+
+
+def read_view(view):
+    return ReadView(view)
@@ -0,0 +1,194 @@
+"""
+Per-user change log of synced collections.
+
+Creation, change and removal of inbox questions, feed answers and incoming
+friend requests append ChangeLogEntry rows of the affected user. A client
+keeps the id of the last entry it has seen as an opaque cursor and asks for
+what changed since then. `compact` drops entries older than
+CHANGELOG_RETENTION_DAYS, remembering the newest dropped id as horizon, and
+collapses repeated changes of the same item into the latest one. Cursors
+older than the horizon can't be synced and clients load lists from scratch.
+
+Ids are taken when rows are inserted, but transactions commit in any order,
+so an entry may become visible after a newer one was already read. Entries
+younger than CHANGELOG_SYNC_LAG seconds are not handed out, the transaction
+writing them is expected to commit by then. Changes of users being deleted
+are not recorded, their entries go away with them.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.utils import timezone
+from friendship.models import FriendshipRequest
+
+from mainapp import deletion
+from mainapp.models import Answer, ChangeLogEntry, ChangeLogHorizon, FeedEntry, Question
+from mainapp.signals import questions_bulk_created
+
+COLLECTIONS = (ChangeLogEntry.INBOX, ChangeLogEntry.FEED, ChangeLogEntry.FRIEND_REQUESTS)
+
+
+def retention_days():
+    return getattr(settings, 'CHANGELOG_RETENTION_DAYS', 30)
+
+
+def sync_lag():
+    return getattr(settings, 'CHANGELOG_SYNC_LAG', 2)
+
+
+def _settled():
+    return timezone.now() - timedelta(seconds=sync_lag())
+
+
+def record(user_id, collection, object_id, op):
+    if deletion.is_deleting(User, user_id):
+        return
+    ChangeLogEntry.objects.create(user_id=user_id, collection=collection, object_id=object_id, op=op)
+
+
+def record_many(changes):
+    """
+    Appends (user_id, collection, object_id, op) changes
+    """
+    ChangeLogEntry.objects.bulk_create([
+        ChangeLogEntry(user_id=user_id, collection=collection, object_id=object_id, op=op)
+        for user_id, collection, object_id, op in changes
+        if not deletion.is_deleting(User, user_id)
+    ], batch_size=500)
+
+
+def horizon():
+    return ChangeLogHorizon.objects.values_list('entry_id', flat=True).first() or 0
+
+
+def latest_id(user_id):
+    # younger entries are synced after reset, some of them may already be in the lists loaded from scratch
+    latest = ChangeLogEntry.objects.filter(user_id=user_id, timestamp__lt=_settled()).order_by('-id')
+    latest = latest.values_list('id', flat=True).first()
+    return max(latest or 0, horizon())
+
+
+def encode_cursor(user_id, entry_id):
+    return urlsafe_b64encode(f'{user_id}:{entry_id}'.encode()).decode()
+
+
+def decode_cursor(cursor, user_id):
+    """
+    Provides id of the last seen entry, None if cursor can't be used by user
+    """
+    try:
+        owner_id, entry_id = urlsafe_b64decode(cursor.encode()).decode().split(':')
+        owner_id, entry_id = int(owner_id), int(entry_id)
+    except (DecodeError, UnicodeDecodeError, ValueError):
+        return None
+    return entry_id if owner_id == user_id else None
+
+
+def changes(user_id, after, limit):
+    """
+    Provides the latest operation on every item changed after entry `after`,
+    as {collection: {object_id: op}}, with id of the last read entry and whether more entries are left
+    """
+    settled = _settled()
+    entries = ChangeLogEntry.objects.filter(user_id=user_id, id__gt=after).order_by('id')
+    entries = list(entries.values_list('id', 'collection', 'object_id', 'op', 'timestamp')[:limit + 1])
+    # reading stops at the first unsettled entry, lower ids may still be committed before it
+    count = next((index for index, entry in enumerate(entries) if entry[4] >= settled), len(entries))
+    has_more = count > limit
+    entries = entries[:min(count, limit)]
+
+    changed = {collection: {} for collection in COLLECTIONS}
+    for entry_id, collection, object_id, op, _timestamp in entries:
+        changed[collection][object_id] = op
+    return changed, entries[-1][0] if entries else after, has_more
+
+
+def compact(days=None):
+    """
+    Drops expired entries and repeated changes of the same item.
+    Returns amounts of dropped and collapsed entries
+    """
+    cutoff = timezone.now() - timedelta(days=retention_days() if days is None else days)
+    dropped = 0
+    with transaction.atomic():
+        newest = ChangeLogEntry.objects.filter(timestamp__lt=cutoff).order_by('-id').values_list('id', flat=True)
+        newest = newest.first()
+        if newest is not None:
+            dropped = ChangeLogEntry.objects.filter(id__lte=newest).delete()[0]
+            ChangeLogHorizon.objects.update_or_create(id=1, defaults={'entry_id': newest})
+
+    newer = ChangeLogEntry.objects.filter(user_id=OuterRef('user_id'), collection=OuterRef('collection'),
+                                          object_id=OuterRef('object_id'), id__gt=OuterRef('id'))
+    collapsed = ChangeLogEntry.objects.filter(Exists(newer)).delete()[0]
+    return dropped, collapsed
+
+
+def _question_owner(question_id):
+    return Question.objects.filter(id=question_id).values_list('askedUser_id', flat=True).first()
+
+
+def on_question_saved(sender, instance, **kwargs):
+    if not instance.answered:
+        record(instance.askedUser_id, ChangeLogEntry.INBOX, instance.id, ChangeLogEntry.UPSERT)
+
+
+def on_questions_bulk_created(sender, questions, **kwargs):
+    record_many([(question.askedUser_id, ChangeLogEntry.INBOX, question.id, ChangeLogEntry.UPSERT)
+                 for question in questions])
+
+
+def on_question_deleted(sender, instance, **kwargs):
+    record(instance.askedUser_id, ChangeLogEntry.INBOX, instance.id, ChangeLogEntry.DELETE)
+
+
+def on_answer_saved(sender, instance, created, **kwargs):
+    if created:
+        # answered question leaves the inbox
+        owner_id = _question_owner(instance.question_id)
+        if owner_id is not None:
+            record(owner_id, ChangeLogEntry.INBOX, instance.question_id, ChangeLogEntry.DELETE)
+        return
+    owner_ids = FeedEntry.objects.filter(answer_id=instance.id).values_list('owner_id', flat=True)
+    record_many([(owner_id, ChangeLogEntry.FEED, instance.id, ChangeLogEntry.UPSERT) for owner_id in owner_ids])
+
+
+def on_answer_deleting(sender, instance, **kwargs):
+    # feed entries are deleted by cascade without signals
+    owner_ids = FeedEntry.objects.filter(answer_id=instance.id).values_list('owner_id', flat=True)
+    record_many([(owner_id, ChangeLogEntry.FEED, instance.id, ChangeLogEntry.DELETE) for owner_id in owner_ids])
+
+
+def on_answer_deleted(sender, instance, **kwargs):
+    if deletion.is_deleting(Question, instance.question_id):
+        # deletion of the question is recorded by itself
+        return
+    if not Answer.objects.filter(question_id=instance.question_id).exists():
+        owner_id = _question_owner(instance.question_id)
+        if owner_id is not None:
+            record(owner_id, ChangeLogEntry.INBOX, instance.question_id, ChangeLogEntry.UPSERT)
+
+
+def on_friendship_request_saved(sender, instance, created, **kwargs):
+    op = ChangeLogEntry.DELETE if instance.rejected else ChangeLogEntry.UPSERT
+    record(instance.to_user_id, ChangeLogEntry.FRIEND_REQUESTS, instance.id, op)
+
+
+def on_friendship_request_deleted(sender, instance, **kwargs):
+    # accepted and cancelled requests are deleted
+    record(instance.to_user_id, ChangeLogEntry.FRIEND_REQUESTS, instance.id, ChangeLogEntry.DELETE)
+
+
+post_save.connect(on_question_saved, sender=Question)
+questions_bulk_created.connect(on_questions_bulk_created)
+post_delete.connect(on_question_deleted, sender=Question)
+post_save.connect(on_answer_saved, sender=Answer)
+pre_delete.connect(on_answer_deleting, sender=Answer)
+post_delete.connect(on_answer_deleted, sender=Answer)
+post_save.connect(on_friendship_request_saved, sender=FriendshipRequest)
+post_delete.connect(on_friendship_request_deleted, sender=FriendshipRequest)
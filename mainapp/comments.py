@@ -0,0 +1,53 @@
+"""
+Comments of answers.
+
+Answer.comment_count is changed with in-database increments when comments
+are created or deleted, so answers carry their comment count without a
+query. `preview` fetches the latest comments of a page of answers with one
+windowed query.
+"""
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+
+from mainapp.models import Answer, Comment
+
+LATEST_COMMENTS_SQL = (
+    'SELECT id FROM ('
+    'SELECT id, ROW_NUMBER() OVER (PARTITION BY answer_id ORDER BY timestamp DESC, id DESC) AS position '
+    'FROM mainapp_comment WHERE answer_id IN ({answers})'
+    ') latest WHERE position <= %s'
+)
+
+
+def preview(answer_ids, size, related=(), fields=None):
+    """
+    Provides up to `size` latest comments of every answer, {answer_id: [comment]}.
+    Comments are dicts of `fields` when they are given, `answer_id` among them
+    """
+    result = {answer_id: [] for answer_id in answer_ids}
+    if not answer_ids or size <= 0:
+        return result
+
+    sql = LATEST_COMMENTS_SQL.format(answers=', '.join(['%s'] * len(answer_ids)))
+    latest = Comment.objects.filter(id__in=RawSQL(sql, [*answer_ids, size])).order_by('-timestamp', '-id')
+    if fields is not None:
+        for row in latest.values(*fields):
+            result[row['answer_id']].append(row)
+        return result
+    for comment in latest.select_related(*related):
+        result[comment.answer_id].append(comment)
+    return result
+
+
+def on_comment_saved(sender, instance, created, **kwargs):
+    if created:
+        Answer.objects.filter(id=instance.answer_id).update(comment_count=F('comment_count') + 1)
+
+
+def on_comment_deleted(sender, instance, **kwargs):
+    Answer.objects.filter(id=instance.answer_id).update(comment_count=F('comment_count') - 1)
+
+
+post_save.connect(on_comment_saved, sender=Comment)
+post_delete.connect(on_comment_deleted, sender=Comment)
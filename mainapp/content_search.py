@@ -0,0 +1,223 @@
+"""
+Full-text search over questions, answers and comments.
+
+Texts are copied into SearchDocument rows when they are saved and removed
+when they are deleted. The inverted index itself belongs to the database:
+an external content FTS5 table kept in sync by triggers on SQLite and a GIN
+index over to_tsvector(text) on Postgres (see migration 0021).
+
+Answers and comments are public unless their owner hides answers from feed,
+questions are visible to the asked user only.
+"""
+import re
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+
+from mainapp.models import Answer, Comment, MyUser, Question, SearchDocument
+from mainapp.signals import answers_visibility_changed, questions_bulk_created
+
+FTS_TABLE = 'mainapp_searchdocument_fts'
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def ts_config():
+    return getattr(settings, 'CONTENT_SEARCH_CONFIG', 'simple')
+
+
+def create_index_sql(vendor):
+    """
+    Provides statements which create inverted index of search documents
+    """
+    if vendor == 'sqlite':
+        return [
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(text, content='mainapp_searchdocument', content_rowid='id')",
+            f"CREATE TRIGGER mainapp_searchdocument_ai AFTER INSERT ON mainapp_searchdocument BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END",
+            f"CREATE TRIGGER mainapp_searchdocument_ad AFTER DELETE ON mainapp_searchdocument BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); END",
+            f"CREATE TRIGGER mainapp_searchdocument_au AFTER UPDATE OF text ON mainapp_searchdocument BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); "
+            f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END",
+        ]
+    if vendor == 'postgresql':
+        return [
+            f"CREATE INDEX mainapp_searchdocument_text_gin ON mainapp_searchdocument "
+            f"USING GIN (to_tsvector('{ts_config()}', text))",
+        ]
+    return []
+
+
+def drop_index_sql(vendor):
+    if vendor == 'sqlite':
+        return [
+            'DROP TRIGGER IF EXISTS mainapp_searchdocument_ai',
+            'DROP TRIGGER IF EXISTS mainapp_searchdocument_ad',
+            'DROP TRIGGER IF EXISTS mainapp_searchdocument_au',
+            f'DROP TABLE IF EXISTS {FTS_TABLE}',
+        ]
+    if vendor == 'postgresql':
+        return ['DROP INDEX IF EXISTS mainapp_searchdocument_text_gin']
+    return []
+
+
+class SqliteBackend:
+
+    def match_query(self, query):
+        # quote every word, so user input can't use FTS5 query syntax, last word may be unfinished
+        words = WORD.findall(query)
+        if not words:
+            return None
+        return ' '.join(f'"{word}"' for word in words[:-1]) + f' "{words[-1]}"*'
+
+    def ranked_sql(self):
+        return (
+            f'SELECT d.id AS id, -bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} '
+            f'JOIN mainapp_searchdocument d ON d.id = {FTS_TABLE}.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND (d.public OR d.owner_id = %s)'
+        )
+
+
+class PostgresBackend:
+
+    def match_query(self, query):
+        return query if WORD.search(query) else None
+
+    def ranked_sql(self):
+        vector = f"to_tsvector('{ts_config()}', d.text)"
+        return (
+            f"SELECT d.id AS id, ts_rank({vector}, q)::float8 AS score "
+            f"FROM mainapp_searchdocument d, plainto_tsquery('{ts_config()}', %s) q "
+            f"WHERE {vector} @@ q AND (d.public OR d.owner_id = %s)"
+        )
+
+
+def get_backend():
+    if connection.vendor == 'sqlite':
+        return SqliteBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresBackend()
+    raise NotImplementedError(f'content search is not supported on {connection.vendor}')
+
+
+def search(query, viewer, limit, after=None, related=()):
+    """
+    Provides documents visible to viewer that match query, best first.
+    `after` is (score, id) of the last document of previous page.
+    Returns list of (document, score)
+    """
+    backend = get_backend()
+    match = backend.match_query(query)
+    if match is None:
+        return []
+
+    sql = f'SELECT id, score FROM ({backend.ranked_sql()}) ranked'
+    params = [match, viewer.id]
+    if after is not None:
+        sql += ' WHERE score < %s OR (score = %s AND id < %s)'
+        params += [after[0], after[0], after[1]]
+    sql += ' ORDER BY score DESC, id DESC LIMIT %s'
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        ranked = cursor.fetchall()
+
+    documents = SearchDocument.objects.filter(id__in=[doc_id for doc_id, _ in ranked])
+    documents = documents.select_related(*related).in_bulk()
+    return [(documents[doc_id], score) for doc_id, score in ranked if doc_id in documents]
+
+
+def _is_public(user_id):
+    return MyUser.objects.filter(user_id=user_id, isUserAnswersVisibleInFeed=True).exists()
+
+
+def index(kind, object_id, owner_id, text, timestamp, answer_id=None, public=False):
+    SearchDocument.objects.update_or_create(kind=kind, object_id=object_id, defaults={
+        'owner_id': owner_id,
+        'answer_id': answer_id,
+        'public': public,
+        'text': text,
+        'timestamp': timestamp,
+    })
+
+
+def rebuild(owner_ids, batch_size=500):
+    """
+    Recreates documents of questions asked to owners and of answers and comments to them
+    """
+    public = set(MyUser.objects.filter(user_id__in=owner_ids, isUserAnswersVisibleInFeed=True)
+                 .values_list('user_id', flat=True))
+    questions = (Question.objects.filter(askedUser_id__in=owner_ids)
+                 .values_list('id', 'askedUser_id', 'question_text', 'timestamp'))
+    answers = (Answer.objects.filter(question__askedUser_id__in=owner_ids)
+               .values_list('id', 'question__askedUser_id', 'question__question_text', 'answer_text', 'timestamp'))
+    comments = (Comment.objects.filter(answer__question__askedUser_id__in=owner_ids)
+                .values_list('id', 'answer__question__askedUser_id', 'answer_id', 'comment_text', 'timestamp'))
+    documents = chain(
+        (SearchDocument(kind=SearchDocument.QUESTION, object_id=question_id, owner_id=owner_id, public=False,
+                        text=text, timestamp=timestamp)
+         for question_id, owner_id, text, timestamp in questions.iterator(chunk_size=batch_size)),
+        (SearchDocument(kind=SearchDocument.ANSWER, object_id=answer_id, owner_id=owner_id, answer_id=answer_id,
+                        public=owner_id in public, text=f'{question_text}\n{text}', timestamp=timestamp)
+         for answer_id, owner_id, question_text, text, timestamp in answers.iterator(chunk_size=batch_size)),
+        (SearchDocument(kind=SearchDocument.COMMENT, object_id=comment_id, owner_id=owner_id, answer_id=answer_id,
+                        public=owner_id in public, text=text, timestamp=timestamp)
+         for comment_id, owner_id, answer_id, text, timestamp in comments.iterator(chunk_size=batch_size)),
+    )
+
+    with transaction.atomic():
+        SearchDocument.objects.filter(owner_id__in=owner_ids).delete()
+        while True:
+            batch = list(islice(documents, batch_size))
+            if not batch:
+                break
+            SearchDocument.objects.bulk_create(batch)
+
+
+def on_question_saved(sender, instance, **kwargs):
+    index(SearchDocument.QUESTION, instance.id, instance.askedUser_id, instance.question_text, instance.timestamp)
+
+
+def on_questions_bulk_created(sender, questions, **kwargs):
+    SearchDocument.objects.bulk_create([
+        SearchDocument(kind=SearchDocument.QUESTION, object_id=question.id, owner_id=question.askedUser_id,
+                       public=False, text=question.question_text, timestamp=question.timestamp)
+        for question in questions
+    ], batch_size=500, ignore_conflicts=True)
+
+
+def on_answer_saved(sender, instance, **kwargs):
+    question = instance.question
+    index(SearchDocument.ANSWER, instance.id, question.askedUser_id,
+          f'{question.question_text}\n{instance.answer_text}', instance.timestamp,
+          answer_id=instance.id, public=_is_public(question.askedUser_id))
+
+
+def on_comment_saved(sender, instance, **kwargs):
+    owner_id = Answer.objects.filter(id=instance.answer_id).values_list('question__askedUser_id', flat=True).get()
+    index(SearchDocument.COMMENT, instance.id, owner_id, instance.comment_text, instance.timestamp,
+          answer_id=instance.answer_id, public=_is_public(owner_id))
+
+
+def on_deleted(sender, instance, **kwargs):
+    kind = {Question: SearchDocument.QUESTION, Answer: SearchDocument.ANSWER, Comment: SearchDocument.COMMENT}[sender]
+    SearchDocument.objects.filter(kind=kind, object_id=instance.id).delete()
+
+
+def on_answers_visibility_changed(sender, user_id, visible, **kwargs):
+    documents = SearchDocument.objects.filter(owner_id=user_id).exclude(kind=SearchDocument.QUESTION)
+    documents.update(public=visible)
+
+
+post_save.connect(on_question_saved, sender=Question)
+questions_bulk_created.connect(on_questions_bulk_created)
+post_save.connect(on_answer_saved, sender=Answer)
+post_save.connect(on_comment_saved, sender=Comment)
+post_delete.connect(on_deleted, sender=Question)
+post_delete.connect(on_deleted, sender=Answer)
+post_delete.connect(on_deleted, sender=Comment)
+answers_visibility_changed.connect(on_answers_visibility_changed)
@@ -0,0 +1,46 @@
+"""
+Users and questions in the middle of a cascade deletion.
+
+Django sends pre_delete of every collected object before deleting any of
+them, and post_delete of an object once its row is gone, after the rows
+depending on it. Receivers of denormalized data ask `is_deleting` to skip
+rows of a user or question that is removed in the same cascade: they would
+be deleted right away, or break foreign keys of the deleted user.
+"""
+from asgiref.local import Local
+from django.contrib.auth.models import User
+from django.core.signals import request_finished
+from django.db.models.signals import post_delete, pre_delete
+
+from mainapp.models import Question
+
+_state = Local()
+
+
+def _deleting():
+    if not hasattr(_state, 'ids'):
+        _state.ids = set()
+    return _state.ids
+
+
+def is_deleting(model, pk):
+    return (model, pk) in _deleting()
+
+
+def on_deleting(sender, instance, **kwargs):
+    _deleting().add((sender, instance.pk))
+
+
+def on_deleted(sender, instance, **kwargs):
+    _deleting().discard((sender, instance.pk))
+
+
+def on_request_finished(sender, **kwargs):
+    # a failed deletion sends no post_delete, its marks must not outlive the request
+    _deleting().clear()
+
+
+for model in (User, Question):
+    pre_delete.connect(on_deleting, sender=model)
+    post_delete.connect(on_deleted, sender=model)
+request_finished.connect(on_request_finished)
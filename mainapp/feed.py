@@ -0,0 +1,184 @@
+"""
+Materialized friends feed.
+
+Answers are pushed into FeedEntry rows of every friend of the answering user
+when they are created, so reading a feed page is a single range scan over
+(owner, timestamp). Users with more friends than FEED_FANOUT_LIMIT are switched
+to pull mode: their answers are not pushed, instead each reader pulls them
+into own feed when opening its first page. Readers pull answers in order of
+id after their watermark, so none is skipped however many appeared since.
+"""
+from django.conf import settings
+from django.db.models.signals import post_save
+from friendship.models import Friend
+from friendship.signals import friendship_request_accepted, friendship_removed
+
+from askme import db_router
+from mainapp import changelog
+from mainapp.models import Answer, ChangeLogEntry, FeedEntry, MyUser
+from mainapp.signals import answers_visibility_changed
+
+
+def fanout_limit():
+    return getattr(settings, 'FEED_FANOUT_LIMIT', 500)
+
+
+def backfill_size():
+    return getattr(settings, 'FEED_BACKFILL_SIZE', 200)
+
+
+def friend_ids(user_id):
+    # feeds are written from friendships in the database, the process-level graph may miss changes of other processes
+    return list(Friend.objects.filter(to_user_id=user_id).values_list('from_user_id', flat=True))
+
+
+def _entries_for(owner_ids, answers, author_id):
+    return [
+        FeedEntry(owner_id=owner_id, author_id=author_id, answer_id=answer_id, timestamp=timestamp)
+        for owner_id in owner_ids
+        for answer_id, timestamp in answers
+    ]
+
+
+def _save_entries(entries):
+    FeedEntry.objects.bulk_create(entries, batch_size=500, ignore_conflicts=True)
+    changelog.record_many([(entry.owner_id, ChangeLogEntry.FEED, entry.answer_id, ChangeLogEntry.UPSERT)
+                           for entry in entries])
+
+
+def _delete_entries(entries):
+    removed = list(entries.values_list('owner_id', 'answer_id'))
+    entries.delete()
+    changelog.record_many([(owner_id, ChangeLogEntry.FEED, answer_id, ChangeLogEntry.DELETE)
+                           for owner_id, answer_id in removed])
+
+
+def _latest_answers(author_id, limit, after_id=0):
+    answers = Answer.objects.filter(question__askedUser_id=author_id, id__gt=after_id).order_by('-id')
+    return list(answers.values_list('id', 'timestamp')[:limit])
+
+
+def fan_out_answer(answer):
+    """
+    Pushes new answer to feeds of author's friends
+    """
+    author_id = answer.question.askedUser_id
+    profile = MyUser.objects.filter(user_id=author_id).values('isUserAnswersVisibleInFeed', 'isFeedPulled').first()
+    if profile is None or not profile['isUserAnswersVisibleInFeed'] or profile['isFeedPulled']:
+        return
+
+    owner_ids = friend_ids(author_id)
+    if len(owner_ids) > fanout_limit():
+        # too many readers to write to, they will pull author's answers themselves
+        MyUser.objects.filter(user_id=author_id).update(isFeedPulled=True)
+        return
+
+    _save_entries(_entries_for(owner_ids, [(answer.id, answer.timestamp)], author_id))
+
+
+def backfill(owner_id, author_id):
+    """
+    Copies latest answers of author into owner's feed
+    """
+    profile = MyUser.objects.filter(user_id=author_id).values('isUserAnswersVisibleInFeed', 'isFeedPulled').first()
+    if profile is None or not profile['isUserAnswersVisibleInFeed']:
+        return
+    _save_entries(_entries_for([owner_id], _latest_answers(author_id, backfill_size()), author_id))
+
+
+def pull(user):
+    """
+    Pulls answers of friends in pull mode that appeared since previous pull
+    """
+    # watermark read from a lagging replica would be written back over a newer one
+    db_router.use_primary()
+    profile = MyUser.objects.filter(user_id=user.id).values('id', 'feedPullWatermark').first()
+    if profile is None:
+        return
+
+    authors = Friend.objects.filter(
+        to_user_id=user.id,
+        from_user__myuser__isFeedPulled=True,
+        from_user__myuser__isUserAnswersVisibleInFeed=True,
+    ).values('from_user_id')
+    answers = Answer.objects.filter(question__askedUser_id__in=authors)
+
+    watermark = pulled = profile['feedPullWatermark']
+    if not watermark:
+        # the first pull copies latest answers only, the way backfill does
+        latest = list(answers.order_by('-id').values_list('id', flat=True)[:backfill_size()])
+        if not latest:
+            return
+        pulled = latest[-1] - 1
+
+    while True:
+        batch = list(answers.filter(id__gt=pulled).order_by('id')
+                     .values_list('id', 'timestamp', 'question__askedUser_id')[:backfill_size()])
+        if batch:
+            _save_entries([
+                FeedEntry(owner_id=user.id, author_id=author_id, answer_id=answer_id, timestamp=timestamp)
+                for answer_id, timestamp, author_id in batch
+            ])
+            pulled = batch[-1][0]
+        if len(batch) < backfill_size():
+            break
+
+    if pulled != watermark:
+        # watermark lowered meanwhile, see on_answers_visibility_changed, is pulled from again next time
+        MyUser.objects.filter(id=profile['id'], feedPullWatermark=watermark).update(feedPullWatermark=pulled)
+
+
+def entries(user, related=()):
+    """
+    Provides feed entries of user, newest first
+    """
+    related = ['answer__' + field for field in related] or ['answer']
+    return FeedEntry.objects.filter(owner_id=user.id).select_related(*related)
+
+
+def rebuild(user_id):
+    """
+    Recreates feed of user from scratch
+    """
+    _delete_entries(FeedEntry.objects.filter(owner_id=user_id))
+    for author_id in friend_ids(user_id):
+        backfill(user_id, author_id)
+
+
+def on_answer_saved(sender, instance, created, **kwargs):
+    if created:
+        fan_out_answer(instance)
+
+
+def on_friendship_accepted(sender, from_user, to_user, **kwargs):
+    backfill(from_user.id, to_user.id)
+    backfill(to_user.id, from_user.id)
+
+
+def on_friendship_removed(sender, from_user, to_user, **kwargs):
+    _delete_entries(FeedEntry.objects.filter(owner_id=from_user.id, author_id=to_user.id))
+    _delete_entries(FeedEntry.objects.filter(owner_id=to_user.id, author_id=from_user.id))
+
+
+def on_answers_visibility_changed(sender, user_id, visible, **kwargs):
+    if not visible:
+        _delete_entries(FeedEntry.objects.filter(author_id=user_id))
+        return
+
+    profile = MyUser.objects.filter(user_id=user_id).values('isFeedPulled').first()
+    if profile is None:
+        return
+    latest = _latest_answers(user_id, backfill_size())
+    if not profile['isFeedPulled']:
+        _save_entries(_entries_for(friend_ids(user_id), latest, user_id))
+    elif latest:
+        # readers passed the hidden answers already, they pull them again from before the oldest one
+        floor = latest[-1][0] - 1
+        readers = Friend.objects.filter(to_user_id=user_id).values('from_user_id')
+        MyUser.objects.filter(user_id__in=readers, feedPullWatermark__gt=floor).update(feedPullWatermark=floor)
+
+
+post_save.connect(on_answer_saved, sender=Answer)
+friendship_request_accepted.connect(on_friendship_accepted)
+friendship_removed.connect(on_friendship_removed)
+answers_visibility_changed.connect(on_answers_visibility_changed)
@@ -0,0 +1,351 @@
+"""
+Flight recorder of slow API requests.
+
+FlightRecorderMiddleware keeps SQL of every API request with its timings,
+and a shared sampler thread takes stacks of threads working on requests
+every FLIGHT_RECORDER_SAMPLE_INTERVAL seconds, once a request runs longer
+than FLIGHT_RECORDER_SAMPLE_AFTER. Requests slower than
+FLIGHT_RECORDER_THRESHOLD are written as JSON captures into a ring buffer
+of FLIGHT_RECORDER_CAPTURES files in FLIGHT_RECORDER_DIR, which admins
+browse and download through the API.
+
+Requests matching an active ProfilingTarget are sampled from their start
+when the view is targeted, and captured whatever their duration. Targets
+are edited in admin and picked up by other processes within
+FLIGHT_RECORDER_TARGETS_TTL seconds.
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from askme import instrumentation
+from mainapp.models import ProfilingTarget
+
+MAX_STACK_DEPTH = 64
+PROFILE_STACKS = 50
+
+
+def enabled():
+    return getattr(settings, 'FLIGHT_RECORDER', True)
+
+
+def threshold():
+    return getattr(settings, 'FLIGHT_RECORDER_THRESHOLD', 1.0)
+
+
+def directory():
+    return getattr(settings, 'FLIGHT_RECORDER_DIR', os.path.join(settings.BASE_DIR, 'flight_records'))
+
+
+def capacity():
+    return getattr(settings, 'FLIGHT_RECORDER_CAPTURES', 200)
+
+
+class Recording:
+    """
+    Represents API request in flight
+    """
+
+    def __init__(self, timings, sample_after):
+        self.timings = timings
+        self.started = time.monotonic()
+        self.sample_from = self.started + sample_after
+        self.samples = Counter()
+
+
+def _stack(frame):
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        stack.append(f'{code.co_filename}:{frame.f_lineno} {code.co_name}')
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+class Sampler:
+    """
+    Samples stacks of threads working on recorded requests from one daemon thread,
+    which waits without waking up while no request is recorded
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._recordings = set()
+        self._active = threading.Event()
+        self._thread = None
+
+    def add(self, recording):
+        with self._lock:
+            self._recordings.add(recording)
+            self._active.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='askme-sampler', daemon=True)
+                self._thread.start()
+
+    def discard(self, recording):
+        with self._lock:
+            self._recordings.discard(recording)
+            if not self._recordings:
+                self._active.clear()
+
+    def sample(self):
+        now = time.monotonic()
+        with self._lock:
+            due = [recording for recording in self._recordings if recording.sample_from <= now]
+        if not due:
+            return
+        frames = sys._current_frames()
+        for recording in due:
+            for thread in list(recording.timings.threads):
+                frame = frames.get(thread)
+                if frame is not None:
+                    recording.samples[_stack(frame)] += 1
+
+    def _run(self):
+        while True:
+            self._active.wait()
+            time.sleep(self.interval)
+            self.sample()
+
+
+sampler = Sampler(interval=getattr(settings, 'FLIGHT_RECORDER_SAMPLE_INTERVAL', 0.005))
+
+
+class Targets:
+    """
+    Process-level cache of active profiling targets as (user id, view name) pairs
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._pairs = []
+
+    def _load(self):
+        targets = ProfilingTarget.objects.filter(is_active=True)
+        targets = targets.filter(Q(expires__isnull=True) | Q(expires__gt=timezone.now()))
+        return list(targets.values_list('user_id', 'view_name'))
+
+    def pairs(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._loaded_at is not None and now - self._loaded_at < self.ttl:
+                return self._pairs
+        pairs = self._load()
+        with self._lock:
+            self._loaded_at, self._pairs = now, pairs
+        return pairs
+
+    def targets_view(self, view):
+        # user of request is not known before the view authenticates it
+        return any(view_name == view or (not view_name and target_user_id is None)
+                   for target_user_id, view_name in self.pairs())
+
+    def matches(self, view, user_id):
+        return any((target_user_id is None or target_user_id == user_id) and (not view_name or view_name == view)
+                   for target_user_id, view_name in self.pairs())
+
+    def clear(self):
+        with self._lock:
+            self._loaded_at = None
+
+
+targets = Targets(ttl=getattr(settings, 'FLIGHT_RECORDER_TARGETS_TTL', 30))
+
+
+def _capture_id():
+    # ids sort by time, so the oldest captures are dropped first
+    return f'{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}'
+
+
+def _is_capture(name):
+    return name.endswith('.json')
+
+
+def store(capture):
+    """
+    Writes capture into the ring buffer, dropping the oldest ones over capacity
+    """
+    path = directory()
+    os.makedirs(path, exist_ok=True)
+    temporary = os.path.join(path, f'{capture["id"]}.tmp')
+    with open(temporary, 'w') as output:
+        json.dump(capture, output)
+    os.replace(temporary, os.path.join(path, f'{capture["id"]}.json'))
+
+    names = sorted(name for name in os.listdir(path) if _is_capture(name))
+    for name in names[:max(0, len(names) - capacity())]:
+        try:
+            os.remove(os.path.join(path, name))
+        except FileNotFoundError:
+            # another worker dropped it first
+            pass
+
+
+def captures():
+    """
+    Provides summaries of stored captures, newest first
+    """
+    path = directory()
+    if not os.path.isdir(path):
+        return []
+    summaries = []
+    for name in sorted((name for name in os.listdir(path) if _is_capture(name)), reverse=True):
+        capture = load(name[:-len('.json')])
+        if capture is not None:
+            summaries.append({key: capture[key] for key in (
+                'id', 'timestamp', 'reason', 'method', 'path', 'view', 'serializer', 'user_id', 'status',
+                'duration_ms', 'db_ms', 'queries')})
+    return summaries
+
+
+def capture_path(capture_id):
+    # ids come from urls, nothing but plain names may reach the filesystem
+    if os.path.basename(capture_id) != capture_id or capture_id.startswith('.'):
+        return None
+    return os.path.join(directory(), f'{capture_id}.json')
+
+
+def load(capture_id):
+    path = capture_path(capture_id)
+    if path is None:
+        return None
+    try:
+        with open(path) as stored:
+            return json.load(stored)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _serializer_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    # class of class based or @api_view view
+    view = getattr(match.func, 'view_class', None) or getattr(match.func, 'cls', None)
+    serializer = getattr(view, 'serializer_class', None)
+    return serializer.__name__ if serializer is not None else None
+
+
+def _capture(request, response, recording, duration, reason):
+    timings = recording.timings
+    user = getattr(request, 'user', None)
+    profile = [{'samples': count, 'stack': list(stack)}
+               for stack, count in recording.samples.most_common(PROFILE_STACKS)]
+    return {
+        'id': _capture_id(),
+        'timestamp': timezone.now().isoformat(),
+        'reason': reason,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': instrumentation.view_name(request),
+        'serializer': _serializer_name(request),
+        'user_id': user.id if user is not None and user.is_authenticated else None,
+        'status': response.status_code,
+        'duration_ms': duration * 1000,
+        'db_ms': timings.db * 1000,
+        'queries': timings.queries,
+        'parts_ms': {part: value * 1000 for part, value in timings.parts.items()},
+        'statements': [{'sql': sql, 'duration_ms': seconds * 1000} for sql, seconds in timings.statements],
+        'sample_interval_ms': sampler.interval * 1000,
+        'samples': sum(recording.samples.values()),
+        'profile': profile,
+    }
+
+
+class FlightRecorderMiddleware:
+    """
+    Records API requests, see module description
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not enabled() or not request.path.startswith('/api/'):
+            return self.get_response(request)
+
+        with ExitStack() as stack:
+            recording = self.start(request, stack)
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.discard(recording)
+        self.finish(request, response, recording)
+        return response
+
+    async def __acall__(self, request):
+        if not enabled() or not request.path.startswith('/api/'):
+            return await self.get_response(request)
+
+        with ExitStack() as stack:
+            recording = self.start(request, stack)
+            # the event loop thread serves other requests too, threads running the view are added by process_view
+            recording.timings.threads.discard(threading.get_ident())
+            try:
+                response = await self.get_response(request)
+            finally:
+                sampler.discard(recording)
+        # targets are loaded from the database, captures are written to files
+        await sync_to_async(self.finish)(request, response, recording)
+        return response
+
+    def start(self, request, stack):
+        timings = instrumentation.get_timings()
+        if timings is None:
+            timings = stack.enter_context(instrumentation.recording(instrumentation.Timings()))
+        timings.statements = []
+        timings.statements_limit = getattr(settings, 'FLIGHT_RECORDER_MAX_STATEMENTS', 2000)
+        recording = Recording(timings, getattr(settings, 'FLIGHT_RECORDER_SAMPLE_AFTER', 0.05))
+        request.flight_recording = recording
+        sampler.add(recording)
+        return recording
+
+    def finish(self, request, response, recording):
+        duration = time.monotonic() - recording.started
+        user = getattr(request, 'user', None)
+        user_id = user.id if user is not None and user.is_authenticated else None
+        reason = None
+        if duration >= threshold():
+            reason = 'slow'
+        elif targets.matches(instrumentation.view_name(request), user_id):
+            reason = 'target'
+        if reason is not None:
+            store(_capture(request, response, recording, duration, reason))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        recording = getattr(request, 'flight_recording', None)
+        if recording is None:
+            return
+        # under ASGI this runs in the thread of sync views
+        recording.timings.threads.add(threading.get_ident())
+        if targets.targets_view(request.resolver_match.view_name):
+            recording.sample_from = recording.started
+
+
+def on_target_changed(sender, **kwargs):
+    targets.clear()
+
+
+post_save.connect(on_target_changed, sender=ProfilingTarget)
+post_delete.connect(on_target_changed, sender=ProfilingTarget)
@@ -0,0 +1,114 @@
+"""
+Process-level cache of the friendship graph.
+
+Friends of a user are kept as a sorted array of integer ids, loaded on first
+use and patched once Friend rows of this process are created or deleted and
+committed. Entries expire after FRIEND_GRAPH_TTL seconds to pick up changes
+made by other processes, and at most FRIEND_GRAPH_MAX_USERS users are kept,
+so writes which must not act on a stale friendship check the database.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from friendship.models import Friend
+
+
+class FriendGraph:
+
+    def __init__(self, ttl, max_users):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._adjacency = OrderedDict()
+
+    def _load(self, user_id):
+        ids = Friend.objects.filter(to_user_id=user_id).order_by('from_user_id').values_list('from_user_id', flat=True)
+        return array('q', ids)
+
+    def friend_ids(self, user_id):
+        """
+        Provides sorted array of ids of user's friends
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._adjacency.get(user_id)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._adjacency.move_to_end(user_id)
+                return entry[1]
+
+        ids = self._load(user_id)
+        with self._lock:
+            self._adjacency[user_id] = (now, ids)
+            self._adjacency.move_to_end(user_id)
+            while len(self._adjacency) > self.max_users:
+                self._adjacency.popitem(last=False)
+        return ids
+
+    def add(self, user_id, friend_id):
+        with self._lock:
+            entry = self._adjacency.get(user_id)
+            if entry is None:
+                return
+            # arrays are shared with readers, so patch a copy
+            ids = array('q', entry[1])
+            index = bisect_left(ids, friend_id)
+            if index == len(ids) or ids[index] != friend_id:
+                insort(ids, friend_id)
+            self._adjacency[user_id] = (entry[0], ids)
+
+    def remove(self, user_id, friend_id):
+        with self._lock:
+            entry = self._adjacency.get(user_id)
+            if entry is None:
+                return
+            ids = array('q', entry[1])
+            index = bisect_left(ids, friend_id)
+            if index < len(ids) and ids[index] == friend_id:
+                del ids[index]
+            self._adjacency[user_id] = (entry[0], ids)
+
+    def clear(self):
+        with self._lock:
+            self._adjacency.clear()
+
+
+graph = FriendGraph(
+    ttl=getattr(settings, 'FRIEND_GRAPH_TTL', 60),
+    max_users=getattr(settings, 'FRIEND_GRAPH_MAX_USERS', 100000),
+)
+
+
+# longest list of ids sent in one IN condition, SQLite limits query parameters
+IN_BATCH_SIZE = 500
+
+
+def friend_ids(user_id):
+    return graph.friend_ids(user_id)
+
+
+def chunks(ids, size=IN_BATCH_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def on_friend_saved(sender, instance, created, **kwargs):
+    # a rolled back friendship must not stay in the graph
+    if created:
+        user_id, friend_id = instance.to_user_id, instance.from_user_id
+        transaction.on_commit(lambda: graph.add(user_id, friend_id))
+
+
+def on_friend_deleted(sender, instance, **kwargs):
+    user_id, friend_id = instance.to_user_id, instance.from_user_id
+    transaction.on_commit(lambda: graph.remove(user_id, friend_id))
+
+
+post_save.connect(on_friend_saved, sender=Friend)
+post_delete.connect(on_friend_deleted, sender=Friend)
@@ -0,0 +1,98 @@
+"""
+Resized renditions of uploaded images.
+
+When MyUser.avatar or Answer.photo changes, renditions of every size in
+RENDITIONS are rendered in background, re-encoded to IMAGE_FORMAT, which
+drops EXIF and other metadata, and saved next to the original through the
+same storage. Names of stored renditions are kept in avatarRenditions and
+photo_renditions.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps
+
+from mainapp import tasks
+from mainapp.models import Answer, MyUser
+
+# rendition name and the longest side in pixels
+RENDITIONS = (
+    ('thumbnail', 160),
+    ('feed', 720),
+    ('full', 1600),
+)
+
+
+def image_format():
+    return getattr(settings, 'IMAGE_FORMAT', 'WEBP')
+
+
+def render(field_file):
+    """
+    Saves renditions of image, returns {rendition: stored name}
+    """
+    with field_file.storage.open(field_file.name, 'rb') as source:
+        original = Image.open(source)
+        original = ImageOps.exif_transpose(original)
+        original = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+
+    base, _ = os.path.splitext(field_file.name)
+    extension = image_format().lower()
+    renditions = {}
+    for name, size in RENDITIONS:
+        image = original.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        content = BytesIO()
+        image.save(content, format=image_format(), quality=80)
+        stored_name = field_file.storage.save(f'{base}__{name}.{extension}', ContentFile(content.getvalue()))
+        renditions[name] = stored_name
+    return renditions
+
+
+def delete_renditions(storage, renditions):
+    for stored_name in renditions.values():
+        storage.delete(stored_name)
+
+
+def _outdated(previous, current):
+    return {name: stored_name for name, stored_name in previous.items() if stored_name not in current.values()}
+
+
+def process_avatar(profile_id):
+    profile = MyUser.objects.filter(pk=profile_id).first()
+    if profile is None:
+        return
+    renditions = render(profile.avatar) if profile.avatar else {}
+    # avatar could be replaced meanwhile, then its own task stores renditions
+    if MyUser.objects.filter(pk=profile_id, avatar=profile.avatar.name).update(avatarRenditions=renditions):
+        delete_renditions(profile.avatar.storage, _outdated(profile.avatarRenditions, renditions))
+    else:
+        delete_renditions(profile.avatar.storage, renditions)
+
+
+def process_photo(answer_id):
+    answer = Answer.objects.filter(pk=answer_id).first()
+    if answer is None:
+        return
+    renditions = render(answer.photo) if answer.photo else {}
+    if Answer.objects.filter(pk=answer_id, photo=answer.photo.name).update(photo_renditions=renditions):
+        delete_renditions(answer.photo.storage, _outdated(answer.photo_renditions, renditions))
+    else:
+        delete_renditions(answer.photo.storage, renditions)
+
+
+def on_profile_saved(sender, instance, created, **kwargs):
+    if instance.has_changed('avatar') or (created and instance.avatar):
+        tasks.submit(process_avatar, instance.pk)
+
+
+def on_answer_saved(sender, instance, created, **kwargs):
+    if instance.has_changed('photo') or (created and instance.photo):
+        tasks.submit(process_photo, instance.pk)
+
+
+post_save.connect(on_profile_saved, sender=MyUser)
+post_save.connect(on_answer_saved, sender=Answer)
@@ -0,0 +1,30 @@
+"""
+Inbox of unanswered questions.
+
+Question.answered is kept in sync with answers, so the inbox is a range scan
+over the partial (askedUser, timestamp) index of unanswered questions.
+"""
+from django.db.models.signals import post_delete, post_save
+
+from mainapp.models import Answer, Question
+
+
+def unanswered(user):
+    """
+    Provides questions which user was asked and did not answer yet
+    """
+    return Question.objects.filter(askedUser_id=user.id, answered=False)
+
+
+def on_answer_saved(sender, instance, created, **kwargs):
+    if created:
+        Question.objects.filter(id=instance.question_id, answered=False).update(answered=True)
+
+
+def on_answer_deleted(sender, instance, **kwargs):
+    if not Answer.objects.filter(question_id=instance.question_id).exists():
+        Question.objects.filter(id=instance.question_id, answered=True).update(answered=False)
+
+
+post_save.connect(on_answer_saved, sender=Answer)
+post_delete.connect(on_answer_deleted, sender=Answer)
@@ -0,0 +1,47 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from mainapp.perf import plans, seed
+from mainapp.perf.database import analyze, test_database
+from mainapp.perf.endpoints import get_endpoints, pick_subjects
+
+
+class Command(BaseCommand):
+    help = 'Replays read endpoints against a seeded test database and reports full scans and temporary sorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=300, help='amount of seeded users')
+        parser.add_argument('--json', dest='json_path', help='also write the report to this file')
+
+    def handle(self, *args, **options):
+        with test_database():
+            report = self.advise(options['users'])
+
+        for result in report:
+            style = self.style.WARNING if result['problems'] else self.style.SUCCESS
+            self.stdout.write(style(f'{result["name"]} {result["path"]}: {result["status"]}, '
+                                    f'{result["queries"]} queries, {len(result["problems"])} problems'))
+            for problem in result['problems']:
+                order_by = f' (ORDER BY {problem["order_by"]})' if problem['order_by'] else ''
+                self.stdout.write(f'    {problem["problem"]}: {problem["detail"]}{order_by}')
+        if options['json_path']:
+            with open(options['json_path'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+    def advise(self, users):
+        user_ids = seed.seed(users=users)
+        analyze()
+
+        user_id, answer = pick_subjects(user_ids)
+        user = User.objects.get(id=user_id)
+        other_username = answer['question__askedUser__username'] if answer else user.username
+        client = APIClient()
+        client.force_authenticate(user)
+
+        report = []
+        for name, path in get_endpoints(user.username, other_username, answer['id'] if answer else None):
+            report.append(dict(plans.check_endpoint(client, path), name=name))
+        return report
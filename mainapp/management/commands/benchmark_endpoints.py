@@ -0,0 +1,88 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from mainapp.perf import runner, seed
+from mainapp.perf.database import analyze, test_database
+from mainapp.perf.endpoints import get_endpoints, get_write_endpoints, pick_subjects
+
+
+class Command(BaseCommand):
+    help = 'Measures latency, throughput and queries of every v1 endpoint against a seeded test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', default='small', choices=list(seed.SCALES))
+        parser.add_argument('--users', type=int, help='overrides amount of users of the scale')
+        parser.add_argument('--iterations', type=int, default=50, help='requests per endpoint in every round')
+        parser.add_argument('--rounds', type=int, default=3, help='rounds of requests, p95 is compared per round')
+        parser.add_argument('--reads-only', action='store_true', help='skip endpoints which write data')
+        parser.add_argument('--output', help='write results to this file')
+        parser.add_argument('--baseline', help='compare results with ones saved to this file')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='allowed relative growth of p95 latency against baseline')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as saved:
+                baseline = json.load(saved)
+
+        scale = dict(seed.SCALES[options['scale']])
+        if options['users']:
+            scale['users'] = options['users']
+        with test_database():
+            results = self.benchmark(scale, options['iterations'], options['rounds'], options['reads_only'])
+            vendor = connection.vendor
+
+        for name, result in results.items():
+            style = self.style.WARNING if result['errors'] else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{name} {result["method"]} {result["path"]}: {result["throughput"]:.1f} req/s, '
+                f'p50 {result["p50_ms"]:.1f} ms, p95 {result["p95_ms"]:.1f} ms, p99 {result["p99_ms"]:.1f} ms, '
+                f'{result["queries"]} queries, {result["errors"]} errors'
+            ))
+
+        if options['output']:
+            report = {
+                'created': timezone.now().isoformat(),
+                'vendor': vendor,
+                'scale': scale,
+                'iterations': options['iterations'],
+                'rounds': options['rounds'],
+                'results': results,
+            }
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+        if baseline is None:
+            return
+        if baseline['scale'] != scale or baseline['vendor'] != vendor:
+            self.stdout.write(self.style.WARNING('Baseline was measured with other data or database'))
+        regressions = runner.compare(baseline['results'], results, threshold=options['threshold'])
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(
+                f'{regression["name"]}: {regression["metric"]} {regression["baseline"]:g} -> {regression["current"]:g}'
+            ))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
+        self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
+
+    def benchmark(self, scale, iterations, rounds, reads_only):
+        user_ids = seed.seed(**scale)
+        analyze()
+
+        user_id, answer = pick_subjects(user_ids)
+        user = User.objects.get(id=user_id)
+        other_username = answer['question__askedUser__username'] if answer else user.username
+        other = User.objects.get(username=other_username)
+        answer_id = answer['id'] if answer else None
+        client = APIClient()
+        client.force_authenticate(user)
+
+        writes = [] if reads_only else get_write_endpoints(other.id, answer_id)
+        return runner.run(client, get_endpoints(user.username, other_username, answer_id), writes,
+                          iterations=iterations, rounds=rounds)
@@ -0,0 +1,39 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from mainapp.models import Answer
+from mainapp.perf import serving
+
+
+class Command(BaseCommand):
+    help = 'Compares WSGI and ASGI serving modes on the hot read endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='requests are sent as this user')
+        parser.add_argument('--modes', nargs='+', default=list(serving.MODES), choices=list(serving.MODES))
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f'User {options["username"]} does not exist')
+        token, created = Token.objects.get_or_create(user=user)
+
+        paths = ['/api/answers/', '/api/account/info/', '/api/account/info/stats/',
+                 f'/api/users/{user.username}/info/']
+        answer_id = Answer.objects.filter(question__askedUser_id=user.id).values_list('id', flat=True).first()
+        if answer_id is not None:
+            paths.append(f'/api/answer/{answer_id}/comments/')
+
+        for mode in options['modes']:
+            result = serving.benchmark(mode, paths, token.key, concurrency=options['concurrency'],
+                                       total=options['requests'], workers=options['workers'], port=options['port'])
+            self.stdout.write(
+                f'{mode}: {result["throughput"]:.1f} req/s, p50 {result["p50_ms"]:.1f} ms, '
+                f'p95 {result["p95_ms"]:.1f} ms, p99 {result["p99_ms"]:.1f} ms, '
+                f'{result["errors"]} errors of {result["requests"]}'
+            )
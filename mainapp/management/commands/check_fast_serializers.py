@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mainapp.perf import fast_check
+from mainapp.perf.database import test_database
+
+
+class Command(BaseCommand):
+    help = 'Checks that fast serializers of list endpoints respond with the same bytes as model serializers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='amount of seeded users')
+
+    def handle(self, *args, **options):
+        with test_database():
+            differences = self.compare(options['users'])
+        if differences:
+            raise CommandError(f'{differences} responses differ')
+        self.stdout.write(self.style.SUCCESS('Fast serializers match model serializers'))
+
+    def compare(self, users):
+        client, paths = fast_check.prepare(users)
+        differences = 0
+        for path, expected, actual in fast_check.responses(client, paths):
+            for response in (expected, actual):
+                if response.status_code != 200:
+                    raise CommandError(f'{path} responded with {response.status_code}')
+            if expected.content == actual.content:
+                self.stdout.write(f'{path}: {len(actual.content)} bytes match')
+                continue
+            differences += 1
+            offset = fast_check.first_difference(expected.content, actual.content)
+            self.stdout.write(self.style.ERROR(
+                f'{path}: differs at byte {offset}\n'
+                f'    expected ...{expected.content[max(0, offset - 60):offset + 60]!r}\n'
+                f'    actual   ...{actual.content[max(0, offset - 60):offset + 60]!r}'
+            ))
+        return differences
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from mainapp import changelog
+
+
+class Command(BaseCommand):
+    help = 'Drops expired change log entries and collapses repeated changes of the same item'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='keep entries of this many last days')
+
+    def handle(self, *args, **options):
+        dropped, collapsed = changelog.compact(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Dropped {dropped} expired entries, collapsed {collapsed}'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from mainapp import suggestion_pipeline
+
+
+class Command(BaseCommand):
+    help = 'Computes "people you may know" suggestions for users whose friendships changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='recompute suggestions of all users')
+        parser.add_argument('--top', type=int, default=50, help='how many suggestions to keep per user')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = suggestion_pipeline.run(full=options['full'], top_n=options['top'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Computed suggestions for {count} users'))
@@ -0,0 +1,42 @@
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from mainapp import transfer
+
+
+def moment(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'{value} is not a date')
+        parsed = datetime(day.year, day.month, day.day)
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+class Command(BaseCommand):
+    help = 'Streams users, profiles, questions, answers, comments and friendships into a JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='export only data of these users')
+        parser.add_argument('--output', help='file to write, standard output by default')
+        parser.add_argument('--since', type=moment, help='export questions and friendships since this date')
+        parser.add_argument('--until', type=moment, help='export questions and friendships before this date')
+        parser.add_argument('--no-passwords', action='store_true', help='leave password hashes out')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='rows fetched from database at once')
+
+    def handle(self, *args, **options):
+        output = open(options['output'], 'w') if options['output'] else sys.stdout
+        try:
+            counts = transfer.export(output, usernames=options['usernames'] or None, since=options['since'],
+                                     until=options['until'], passwords=not options['no_passwords'],
+                                     chunk_size=options['chunk_size'])
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        summary = ', '.join(f'{count} {kind}' for kind, count in counts.items())
+        self.stderr.write(self.style.SUCCESS(f'Exported {summary or "nothing"}'))
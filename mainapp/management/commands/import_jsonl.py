@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mainapp import transfer
+
+
+class Command(BaseCommand):
+    help = 'Loads a JSONL file written by export_jsonl'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='file to read, - for standard input')
+        parser.add_argument('--batch-size', type=int, default=1000, help='rows inserted at once')
+        parser.add_argument('--skip-rebuild', action='store_true',
+                            help='do not rebuild stats, feeds and search of imported users')
+
+    def handle(self, *args, **options):
+        importer = transfer.Importer(batch_size=options['batch_size'])
+        source = sys.stdin if options['path'] == '-' else open(options['path'])
+        try:
+            counts = importer.load(source)
+        except ValueError as error:
+            raise CommandError(f'Import failed: {error}')
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        summary = ', '.join(f'{count} {kind}' for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Imported {summary or "nothing"}'))
+        skipped = ', '.join(f'{count} {kind}' for kind, count in importer.skipped.items())
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped {skipped} (existing users or missing references)'))
+        if not options['skip_rebuild']:
+            importer.rebuild()
+            self.stdout.write(self.style.SUCCESS('Rebuilt stats, feeds and search indexes'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from mainapp import images
+from mainapp.models import Answer, MyUser
+
+
+class Command(BaseCommand):
+    help = 'Renders missing renditions of avatars and answer photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='render renditions of every image again')
+
+    def handle(self, *args, **options):
+        profiles = MyUser.objects.exclude(avatar='').exclude(avatar__isnull=True)
+        answers = Answer.objects.exclude(photo='').exclude(photo__isnull=True)
+        if not options['all']:
+            profiles = profiles.filter(avatarRenditions={})
+            answers = answers.filter(photo_renditions={})
+
+        profile_ids = list(profiles.values_list('pk', flat=True))
+        for profile_id in profile_ids:
+            images.process_avatar(profile_id)
+        answer_ids = list(answers.values_list('pk', flat=True))
+        for answer_id in answer_ids:
+            images.process_photo(answer_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered images of {len(profile_ids)} profiles and {len(answer_ids)} answers'))
@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from mainapp import feed
+from mainapp.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Recreates materialized friends feeds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='rebuild only feeds of these users')
+        parser.add_argument('--empty', action='store_true',
+                            help='rebuild only feeds without entries, such as the ones existing before feeds, '
+                                 'the release step runs it on every deploy')
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        if options['empty']:
+            users = users.exclude(id__in=FeedEntry.objects.values('owner_id'))
+
+        count = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            feed.rebuild(user_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} feeds'))
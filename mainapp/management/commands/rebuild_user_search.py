@@ -0,0 +1,15 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from mainapp import user_search
+
+
+class Command(BaseCommand):
+    help = 'Reindexes names of users for people search'
+
+    def handle(self, *args, **options):
+        count = 0
+        for user in User.objects.iterator():
+            user_search.index_user(user)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} users'))
@@ -0,0 +1,24 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from mainapp import stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes profile counters and repairs the ones that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='recompute only counters of these users')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        user_ids = list(users.values_list('id', flat=True))
+        repaired = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(user_ids), batch_size):
+            repaired += stats.recompute(user_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f'Checked {len(user_ids)} users, repaired {repaired}'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from mainapp.perf import seed
+
+
+class Command(BaseCommand):
+    help = 'Fills the database with a synthetic social graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', default='small', choices=list(seed.SCALES))
+        parser.add_argument('--users', type=int, help='overrides amount of users of the scale')
+        parser.add_argument('--seed', type=int, default=0, help='seed of random generator')
+
+    def handle(self, *args, **options):
+        scale = dict(seed.SCALES[options['scale']])
+        if options['users']:
+            scale['users'] = options['users']
+        user_ids = seed.seed(random_seed=options['seed'], **scale)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created users bench{user_ids[0]} to bench{user_ids[-1]} with password "{seed.PASSWORD}"'
+        ))
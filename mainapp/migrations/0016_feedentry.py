@@ -0,0 +1,47 @@
+# Generated by Django 3.1.6 on 2026-10-18 09:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('mainapp', '0015_comment_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='myuser',
+            name='isFeedPulled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='myuser',
+            name='feedPullWatermark',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('answer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mainapp.answer')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('owner', 'answer')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['owner', '-timestamp'], name='mainapp_fee_owner_i_d4a554_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['owner', 'author'], name='mainapp_fee_owner_i_ef6cab_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.1.6 on 2026-10-18 11:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('mainapp', '0017_reaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('answers_count', models.IntegerField(default=0)),
+                ('likes_count', models.IntegerField(default=0)),
+                ('friends_count', models.IntegerField(default=0)),
+                ('unanswered_count', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
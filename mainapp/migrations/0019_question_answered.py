@@ -0,0 +1,29 @@
+# Generated by Django 3.1.6 on 2026-10-18 12:03
+
+from django.db import migrations, models
+
+
+def mark_answered_questions(apps, schema_editor):
+    Question = apps.get_model('mainapp', 'Question')
+    Answer = apps.get_model('mainapp', 'Answer')
+    Question.objects.filter(id__in=Answer.objects.values('question_id')).update(answered=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0018_userstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='answered',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_answered_questions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['askedUser', 'answered', '-timestamp'], name='mainapp_que_askedUs_0b8a46_idx'),
+        ),
+    ]
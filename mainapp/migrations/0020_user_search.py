@@ -0,0 +1,65 @@
+# Generated by Django 3.1.6 on 2026-10-18 13:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# copies of mainapp.user_search helpers as they were when this migration was written
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def trigrams(text):
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def index_existing_users(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserSearchIndex = apps.get_model('mainapp', 'UserSearchIndex')
+    UserSearchTrigram = apps.get_model('mainapp', 'UserSearchTrigram')
+
+    for user in User.objects.iterator():
+        username, first_name, last_name = normalize(user.username), normalize(user.first_name), normalize(user.last_name)
+        UserSearchIndex.objects.create(user_id=user.id, username=username, last_name=last_name,
+                                       full_name=normalize(f'{first_name} {last_name}'))
+        UserSearchTrigram.objects.bulk_create([
+            UserSearchTrigram(user_id=user.id, trigram=gram)
+            for gram in trigrams(' '.join((username, first_name, last_name)))
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('mainapp', '0019_question_answered'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchIndex',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_index', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('username', models.CharField(db_index=True, max_length=150)),
+                ('full_name', models.CharField(db_index=True, max_length=301)),
+                ('last_name', models.CharField(db_index=True, max_length=150)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserSearchTrigram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('trigram', 'user')},
+            },
+        ),
+        migrations.RunPython(index_existing_users, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 3.1.6 on 2026-10-18 14:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# statements of mainapp.content_search as they were when this migration was written
+FTS_TABLE = 'mainapp_searchdocument_fts'
+BATCH_SIZE = 500
+
+
+def create_index_sql(vendor):
+    if vendor == 'sqlite':
+        return [
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(text, content='mainapp_searchdocument', content_rowid='id')",
+            f"CREATE TRIGGER mainapp_searchdocument_ai AFTER INSERT ON mainapp_searchdocument BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END",
+            f"CREATE TRIGGER mainapp_searchdocument_ad AFTER DELETE ON mainapp_searchdocument BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); END",
+            f"CREATE TRIGGER mainapp_searchdocument_au AFTER UPDATE OF text ON mainapp_searchdocument BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); "
+            f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END",
+        ]
+    if vendor == 'postgresql':
+        config = getattr(settings, 'CONTENT_SEARCH_CONFIG', 'simple')
+        return [
+            f"CREATE INDEX mainapp_searchdocument_text_gin ON mainapp_searchdocument "
+            f"USING GIN (to_tsvector('{config}', text))",
+        ]
+    return []
+
+
+def drop_index_sql(vendor):
+    if vendor == 'sqlite':
+        return [
+            'DROP TRIGGER IF EXISTS mainapp_searchdocument_ai',
+            'DROP TRIGGER IF EXISTS mainapp_searchdocument_ad',
+            'DROP TRIGGER IF EXISTS mainapp_searchdocument_au',
+            f'DROP TABLE IF EXISTS {FTS_TABLE}',
+        ]
+    if vendor == 'postgresql':
+        return ['DROP INDEX IF EXISTS mainapp_searchdocument_text_gin']
+    return []
+
+
+def create_inverted_index(apps, schema_editor):
+    for statement in create_index_sql(schema_editor.connection.vendor):
+        schema_editor.execute(statement)
+
+
+def drop_inverted_index(apps, schema_editor):
+    for statement in drop_index_sql(schema_editor.connection.vendor):
+        schema_editor.execute(statement)
+
+
+def index_existing_content(apps, schema_editor):
+    MyUser = apps.get_model('mainapp', 'MyUser')
+    Question = apps.get_model('mainapp', 'Question')
+    Answer = apps.get_model('mainapp', 'Answer')
+    Comment = apps.get_model('mainapp', 'Comment')
+    SearchDocument = apps.get_model('mainapp', 'SearchDocument')
+
+    hidden = set(MyUser.objects.filter(isUserAnswersVisibleInFeed=False).values_list('user_id', flat=True))
+
+    def documents():
+        for question in Question.objects.iterator():
+            yield SearchDocument(kind='question', object_id=question.id, owner_id=question.askedUser_id,
+                                 public=False, text=question.question_text, timestamp=question.timestamp)
+        for answer in Answer.objects.select_related('question').iterator():
+            owner_id = answer.question.askedUser_id
+            yield SearchDocument(kind='answer', object_id=answer.id, owner_id=owner_id, answer_id=answer.id,
+                                 public=owner_id not in hidden, timestamp=answer.timestamp,
+                                 text=f'{answer.question.question_text}\n{answer.answer_text}')
+        for comment in Comment.objects.select_related('answer__question').iterator():
+            owner_id = comment.answer.question.askedUser_id
+            yield SearchDocument(kind='comment', object_id=comment.id, owner_id=owner_id,
+                                 answer_id=comment.answer_id, public=owner_id not in hidden,
+                                 text=comment.comment_text, timestamp=comment.timestamp)
+
+    # content tables may be large, documents are written as they are read
+    batch = []
+    for document in documents():
+        batch.append(document)
+        if len(batch) == BATCH_SIZE:
+            SearchDocument.objects.bulk_create(batch)
+            batch = []
+    SearchDocument.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('mainapp', '0020_user_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('question', 'question'), ('answer', 'answer'), ('comment', 'comment')], max_length=8)),
+                ('object_id', models.IntegerField()),
+                ('public', models.BooleanField(default=True)),
+                ('text', models.TextField()),
+                ('timestamp', models.DateTimeField()),
+                ('answer', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mainapp.answer')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_inverted_index, drop_inverted_index),
+        migrations.RunPython(index_existing_content, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0022_friendsuggestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='myuser',
+            name='avatarRenditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='photo_renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
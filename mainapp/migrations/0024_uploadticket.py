@@ -0,0 +1,32 @@
+# Generated by Django 3.1.6 on 2026-10-18 18:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('mainapp', '0023_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadTicket',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('target', models.CharField(choices=[('avatar', 'avatar'), ('answer_photo', 'answer photo')], max_length=12)),
+                ('object_id', models.IntegerField(blank=True, null=True)),
+                ('name', models.CharField(max_length=255)),
+                ('content_type', models.CharField(max_length=32)),
+                ('max_size', models.IntegerField()),
+                ('received', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('uploaded', 'uploaded'), ('done', 'done'), ('failed', 'failed')], default='pending', max_length=8)),
+                ('expires', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_tickets', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.1.6 on 2026-10-18 18:54
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_comments(apps, schema_editor):
+    Answer = apps.get_model('mainapp', 'Answer')
+    Comment = apps.get_model('mainapp', 'Comment')
+    counts = Comment.objects.filter(answer_id=OuterRef('pk')).values('answer_id').annotate(count=Count('id'))
+    Answer.objects.update(comment_count=Coalesce(Subquery(counts.values('count')), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0024_uploadticket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='comment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['answer', '-timestamp', '-id'], name='mainapp_com_answer__81f976_idx'),
+        ),
+    ]
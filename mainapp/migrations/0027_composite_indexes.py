@@ -0,0 +1,24 @@
+# Generated by Django 3.1.6 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('friendship', '0001_initial'),
+        ('mainapp', '0026_changelog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', '-timestamp'], name='mainapp_ans_questio_41a593_idx'),
+        ),
+        # pending requests of FriendRequestsListView, the table belongs to django-friendship
+        migrations.RunSQL(
+            'CREATE INDEX friendship_request_pending_idx '
+            'ON friendship_friendshiprequest (to_user_id, rejected, created)',
+            'DROP INDEX friendship_request_pending_idx',
+        ),
+    ]
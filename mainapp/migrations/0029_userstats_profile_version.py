@@ -0,0 +1,18 @@
+# Generated by Django 3.1.6 on 2026-10-18 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0028_profilingtarget'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='profile_version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
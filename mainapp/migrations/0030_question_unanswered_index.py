@@ -0,0 +1,18 @@
+# Generated by Django 3.1.6 on 2026-10-18 22:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0029_userstats_profile_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(answered=False), fields=['askedUser', '-timestamp'],
+                               name='question_inbox_unanswered_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.6 on 2026-10-18 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0030_question_unanswered_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='myuser',
+            name='suggestionsStaleSince',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
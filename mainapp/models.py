@@ -1,3 +1,4 @@
+import uuid
 from datetime import datetime
 
 from django.contrib.auth.models import User
@@ -5,8 +6,32 @@ from django.db import models
 from django.db.models.signals import post_save
 from django.utils import timezone
 
+from mainapp.signals import answers_visibility_changed
 
-class MyUser(models.Model):
+
+class TrackedFieldsMixin:
+    """
+    Remembers values that were loaded from database, so signal receivers can tell which fields changed
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+
+    def has_changed(self, field_name):
+        loaded_values = getattr(self, '_loaded_values', None)
+        if loaded_values is None or field_name not in loaded_values:
+            return False
+        return loaded_values[field_name] != getattr(self, field_name)
+
+
+class MyUser(TrackedFieldsMixin, models.Model):
     """
     Represents user for authentication and information
     """
@@ -17,6 +42,11 @@ class MyUser(models.Model):
     gender = models.CharField(blank=True, max_length=3, choices=[('ml', 'male'), ('fml', 'female'), ('oth', 'other')])
     isAnonymousQuestionsAllowed = models.BooleanField(default=True)
     isUserAnswersVisibleInFeed = models.BooleanField(default=True)
+    isFeedPulled = models.BooleanField(default=False)
+    feedPullWatermark = models.BigIntegerField(default=0)
+    isSuggestionsStale = models.BooleanField(default=True)
+    suggestionsStaleSince = models.DateTimeField(null=True, blank=True)
+    avatarRenditions = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return self.user.username
@@ -31,22 +61,38 @@ class Question(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     asker = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name='asker')
     askedUser = models.ForeignKey(User, on_delete=models.CASCADE, related_name='askedUser', default=None)
+    answered = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['askedUser', 'answered', '-timestamp']),
+            # inbox, planners don't use the index above to sort questions filtered by NOT answered
+            models.Index(fields=['askedUser', '-timestamp'], condition=models.Q(answered=False),
+                         name='question_inbox_unanswered_idx'),
+        ]
 
     def __str__(self):
         return self.question_text
 
 
-class Answer(models.Model):
+class Answer(TrackedFieldsMixin, models.Model):
     """
     Represents answer that was given to a question
     """
     answer_text = models.TextField()
     photo = models.ImageField(upload_to='static/media/temp', blank=True)
+    photo_renditions = models.JSONField(default=dict, blank=True)
     likes = models.IntegerField(default=0)
     dislikes = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
     question = models.ForeignKey('Question', on_delete=models.CASCADE)
     timestamp = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['question', '-timestamp']),
+        ]
+
     def __str__(self):
         return self.answer_text
 
@@ -57,13 +103,209 @@ class Comment(models.Model):
     answer = models.ForeignKey('Answer', on_delete=models.CASCADE)
     timestamp = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['answer', '-timestamp', '-id']),
+        ]
+
     def __str__(self):
         return self.comment_text
 
 
+class FeedEntry(models.Model):
+    """
+    Represents answer that was delivered to the feed of user's friend
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    answer = models.ForeignKey('Answer', on_delete=models.CASCADE)
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('owner', 'answer')
+        indexes = [
+            models.Index(fields=['owner', '-timestamp']),
+            models.Index(fields=['owner', 'author']),
+        ]
+
+
+class Reaction(models.Model):
+    """
+    Represents like or dislike that user gave to an answer
+    """
+    LIKE = 1
+    DISLIKE = -1
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    answer = models.ForeignKey('Answer', on_delete=models.CASCADE)
+    value = models.SmallIntegerField(choices=[(LIKE, 'like'), (DISLIKE, 'dislike')])
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('user', 'answer')
+
+
+class UserStats(models.Model):
+    """
+    Represents counters shown in user's profile header
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    answers_count = models.IntegerField(default=0)
+    likes_count = models.IntegerField(default=0)
+    friends_count = models.IntegerField(default=0)
+    unanswered_count = models.IntegerField(default=0)
+    # bumped on every change shown in the profile, ETags of cached profile responses are made of it
+    profile_version = models.BigIntegerField(default=0)
+
+
+class UserSearchIndex(models.Model):
+    """
+    Represents lowercased names of user for prefix search
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='search_index')
+    username = models.CharField(max_length=150, db_index=True)
+    full_name = models.CharField(max_length=301, db_index=True)
+    last_name = models.CharField(max_length=150, db_index=True)
+
+
+class UserSearchTrigram(models.Model):
+    """
+    Represents trigram of user's names for typo tolerant search
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        unique_together = ('trigram', 'user')
+
+
+class SearchDocument(models.Model):
+    """
+    Represents text of question, answer or comment in full-text search index
+    """
+    QUESTION = 'question'
+    ANSWER = 'answer'
+    COMMENT = 'comment'
+
+    kind = models.CharField(max_length=8, choices=[(QUESTION, 'question'), (ANSWER, 'answer'), (COMMENT, 'comment')])
+    object_id = models.IntegerField()
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    answer = models.ForeignKey('Answer', on_delete=models.CASCADE, null=True, related_name='+')
+    public = models.BooleanField(default=True)
+    text = models.TextField()
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+
+class FriendSuggestion(models.Model):
+    """
+    Represents user that is suggested to become a friend, computed by a batch job
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='friend_suggestions')
+    suggested = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    mutual_count = models.IntegerField(default=0)
+    interactions = models.IntegerField(default=0)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('user', 'suggested')
+        indexes = [
+            models.Index(fields=['user', '-score']),
+        ]
+
+
+
+class UploadTicket(models.Model):
+    """
+    Represents permission to upload one image directly to storage
+    """
+    AVATAR = 'avatar'
+    ANSWER_PHOTO = 'answer_photo'
+
+    PENDING = 'pending'
+    UPLOADED = 'uploaded'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_tickets')
+    target = models.CharField(max_length=12, choices=[(AVATAR, 'avatar'), (ANSWER_PHOTO, 'answer photo')])
+    object_id = models.IntegerField(null=True, blank=True)
+    name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=32)
+    max_size = models.IntegerField()
+    received = models.IntegerField(default=0)
+    status = models.CharField(max_length=8, default=PENDING, choices=[
+        (PENDING, 'pending'), (UPLOADED, 'uploaded'), (DONE, 'done'), (FAILED, 'failed')])
+    expires = models.DateTimeField()
+
+    def is_expired(self):
+        return self.expires <= timezone.now()
+
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Represents change of an item in one of user's synced collections
+    """
+    INBOX = 'inbox'
+    FEED = 'feed'
+    FRIEND_REQUESTS = 'friend_requests'
+
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    collection = models.CharField(max_length=16, choices=[
+        (INBOX, 'inbox'), (FEED, 'feed'), (FRIEND_REQUESTS, 'friend requests')])
+    object_id = models.IntegerField()
+    op = models.CharField(max_length=6, choices=[(UPSERT, 'upsert'), (DELETE, 'delete')])
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id']),
+            models.Index(fields=['user', 'collection', 'object_id']),
+        ]
+
+
+class ChangeLogHorizon(models.Model):
+    """
+    Represents the newest change log entry removed by compaction, older cursors can't be synced
+    """
+    entry_id = models.BigIntegerField(default=0)
+
+
+class ProfilingTarget(models.Model):
+    """
+    Represents user or view whose API requests are profiled and recorded regardless of their duration
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    view_name = models.CharField(max_length=100, blank=True, help_text='url name, such as wall_answers')
+    is_active = models.BooleanField(default=True)
+    expires = models.DateTimeField(null=True, blank=True)
+    note = models.CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        user = self.user.username if self.user_id else 'any user'
+        return f'{user} on {self.view_name or "any view"}'
+
+
 def create_my_user(sender, instance, created, **kwargs):
     if created:
         MyUser.objects.create(user=instance)
+        UserStats.objects.create(user=instance)
+
+
+def track_answers_visibility(sender, instance, created, **kwargs):
+    if not created and instance.has_changed('isUserAnswersVisibleInFeed'):
+        answers_visibility_changed.send(sender=MyUser, user_id=instance.user_id,
+                                        visible=instance.isUserAnswersVisibleInFeed)
 
 
 post_save.connect(create_my_user, sender=User)
+post_save.connect(track_answers_visibility, sender=MyUser)
@@ -0,0 +1,30 @@
+"""
+Throwaway test database for benchmarks and plan checks.
+"""
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def test_database():
+    """
+    Creates empty test database and destroys it afterwards
+    """
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        # queries of async views and background tasks have to run in this thread to be captured
+        with override_settings(ASYNC_DB_WORKERS=0, BACKGROUND_TASKS_EAGER=True):
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def analyze():
+    with connection.cursor() as cursor:
+        # planners need statistics to choose indexes as they would with real data
+        cursor.execute('ANALYZE')
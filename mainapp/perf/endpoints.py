@@ -0,0 +1,65 @@
+"""
+Endpoints of API v1, with arguments taken from seeded data.
+"""
+from django.db.models import Count
+from django.urls import reverse
+from friendship.models import Friend
+
+from mainapp.models import Answer
+
+
+def pick_subjects(user_ids):
+    """
+    Chooses the most connected seeded user, a friend of that user and the most commented answer of the friend
+    """
+    friends = Friend.objects.filter(to_user_id__in=user_ids).values('to_user_id').annotate(count=Count('id'))
+    user_id = friends.order_by('-count').values_list('to_user_id', flat=True).first() or user_ids[0]
+    friend_ids = list(Friend.objects.filter(to_user_id=user_id).values_list('from_user_id', flat=True))
+    answers = Answer.objects.filter(question__askedUser_id__in=friend_ids or [user_id]).order_by('-comment_count')
+    answer = answers.values('id', 'question__askedUser__username').first()
+    return user_id, answer
+
+
+def get_endpoints(username, other_username, answer_id, search='question'):
+    """
+    Provides (name, path) of every read endpoint
+    """
+    endpoints = [
+        ('wall_answers', reverse('wall_answers')),
+        ('account_info', reverse('account_info')),
+        ('account_info_stats', reverse('account_info_stats')),
+        ('account_answers', reverse('account_answers')),
+        ('user_account_info', reverse('user_account_info', kwargs={'username': other_username})),
+        ('user_info_stats', reverse('user_info_stats', kwargs={'username': other_username})),
+        ('user_account_answers', reverse('user_account_answers', kwargs={'username': other_username})),
+        ('questions', reverse('questions-list')),
+        ('friends_list', reverse('friends_list')),
+        ('friend_requests_list', reverse('friend_requests_list')),
+        ('friend_suggestions', reverse('friend_suggestions')),
+        ('user_search', reverse('user_search') + f'?search={username[:4]}'),
+        ('content_search', reverse('content_search') + f'?q={search}'),
+        ('sync', reverse('sync')),
+    ]
+    if answer_id is not None:
+        endpoints.append(('comments_list', reverse('comments_list', kwargs={'answerId': answer_id})))
+    return endpoints
+
+
+def get_write_endpoints(other_user_id, answer_id):
+    """
+    Provides (name, method, path, data) of write endpoints which can be repeated without running out of data
+    """
+    endpoints = [
+        ('create_question', 'post', reverse('create_question'),
+         {'askedUser': other_user_id, 'question_text': 'Benchmark question?', 'isAnon': False}),
+        ('create_multiple_questions', 'post', reverse('create_multiple_questions'),
+         {'question_text': 'Benchmark question?', 'askAllFriends': True}),
+    ]
+    if answer_id is not None:
+        endpoints += [
+            ('like_answer', 'post', reverse('like_answer', kwargs={'pk': answer_id}), None),
+            ('unlike_answer', 'delete', reverse('like_answer', kwargs={'pk': answer_id}), None),
+            ('create_comment', 'post', reverse('create_comment', kwargs={'answerId': answer_id}),
+             {'comment_text': 'Benchmark comment'}),
+        ]
+    return endpoints
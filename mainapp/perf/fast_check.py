@@ -0,0 +1,74 @@
+"""
+Comparison of fast and model serializers on seeded data.
+"""
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from mainapp.models import Answer, MyUser
+from mainapp.perf import seed
+from mainapp.perf.endpoints import pick_subjects
+
+
+def prepare(users):
+    """
+    Seeds data, provides client of a well connected user and paths of list endpoints with fast serializers
+    """
+    user_ids = seed.seed(users=users)
+    # renditions and avatars exercise storage urls
+    MyUser.objects.filter(user_id__in=user_ids[::2]).update(
+        avatar='profile_images/avatar.jpg', avatarRenditions={'thumbnail': 'profile_images/avatar_160.webp'})
+    Answer.objects.filter(id__in=Answer.objects.order_by('id').values_list('id', flat=True)[::3]).update(
+        photo_renditions={'feed': 'answers/photo_720.webp', 'full': 'answers/photo_1600.webp'})
+
+    user_id, answer = pick_subjects(user_ids)
+    client = APIClient()
+    client.force_authenticate(User.objects.get(id=user_id))
+
+    paths = [
+        reverse('wall_answers'),
+        reverse('wall_answers') + '?comments_preview=3',
+        reverse('account_answers'),
+        reverse('account_answers') + '?comments_preview=5',
+        reverse('friends_list'),
+    ]
+    if answer is not None:
+        paths += [
+            reverse('user_account_answers', kwargs={'username': answer['question__askedUser__username']}),
+            reverse('comments_list', kwargs={'answerId': answer['id']}),
+        ]
+    return client, paths
+
+
+def request(client, path, fast):
+    # profile responses would be served from cache
+    cache.clear()
+    with override_settings(FAST_SERIALIZERS=fast):
+        return client.get(path)
+
+
+def responses(client, paths):
+    """
+    Provides (path, model serializer response, fast serializer response) of paths and of their second pages
+    """
+    paths = list(paths)
+    while paths:
+        path = paths.pop(0)
+        # first request of a feed pulls entries, responses are compared once data settled
+        request(client, path, fast=True)
+        expected = request(client, path, fast=False)
+        actual = request(client, path, fast=True)
+        yield path, expected, actual
+        # follow cursor pagination to the second page
+        data = json.loads(actual.content) if actual.status_code == 200 else None
+        if isinstance(data, dict) and data.get('next') and 'cursor=' not in path:
+            paths.append(data['next'])
+
+
+def first_difference(expected, actual):
+    return next((index for index, (left, right) in enumerate(zip(expected, actual)) if left != right),
+                min(len(expected), len(actual)))
@@ -0,0 +1,88 @@
+"""
+Query plan checks of API endpoints.
+
+Every endpoint is requested once while its queries are captured, then each
+SELECT is explained and plans reading a whole table or sorting rows in a
+temporary structure are reported. SQLite and Postgres plans are supported.
+"""
+import json
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+ORDER_BY = re.compile(r'ORDER BY (.+?)(?: LIMIT| OFFSET|\)|$)', re.IGNORECASE | re.DOTALL)
+
+
+def _sqlite_problems(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        details = [row[-1] for row in cursor.fetchall()]
+    # subqueries in FROM are scanned by name, they are not tables
+    subqueries = {detail.split()[-1] for detail in details if detail.startswith(('CO-ROUTINE', 'MATERIALIZE'))}
+    problems = []
+    for detail in details:
+        words = detail.split()
+        if words[0] == 'SCAN' and 'USING' not in words and words[-1] not in subqueries \
+                and not {'SUBQUERY', 'CONSTANT', 'VIRTUAL'} & set(words):
+            problems.append(('full scan', words[-1]))
+        if 'TEMP B-TREE' in detail:
+            problems.append(('temp sort', detail))
+    return problems
+
+
+def _postgres_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _postgres_nodes(child)
+
+
+def _postgres_problems(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    problems = []
+    for node in _postgres_nodes(plan[0]['Plan']):
+        if node['Node Type'] == 'Seq Scan':
+            problems.append(('full scan', node['Relation Name']))
+        if node['Node Type'] in ('Sort', 'Incremental Sort'):
+            problems.append(('temp sort', ', '.join(node.get('Sort Key', []))))
+    return problems
+
+
+def explain(sql):
+    """
+    Provides (problem, detail) pairs found in the plan of query
+    """
+    if connection.vendor == 'sqlite':
+        return _sqlite_problems(sql)
+    if connection.vendor == 'postgresql':
+        return _postgres_problems(sql)
+    raise NotImplementedError(f'plans of {connection.vendor} are not supported')
+
+
+def check_endpoint(client, path):
+    """
+    Requests endpoint, returns its status, amount of queries and problems of their plans
+    """
+    cache.clear()
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get(path)
+
+    problems = []
+    for query in captured.captured_queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        order_by = ORDER_BY.search(sql)
+        for problem, detail in explain(sql):
+            problems.append({
+                'problem': problem,
+                'detail': detail,
+                'order_by': order_by.group(1).strip() if order_by else None,
+                'sql': sql,
+            })
+    return {'path': path, 'status': response.status_code, 'queries': len(captured), 'problems': problems}
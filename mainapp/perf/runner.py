@@ -0,0 +1,115 @@
+"""
+Endpoint benchmark.
+
+Every v1 endpoint is requested repeatedly in process through the test
+client, so latency is measured without network and server noise and the
+queries of each request can be counted. The cache is cleared before every
+request, so cached profile views are measured doing their queries. Results
+are plain JSON: a run can be saved as baseline and later runs compared
+against it.
+
+Requests are sent in several rounds. A p95 regression is reported only when
+every current round is slower than every baseline round, so a single noisy
+round doesn't fail the comparison.
+"""
+import statistics
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from mainapp.perf.serving import percentile
+
+# rounds with fewer requests have too noisy p95 to be compared
+MIN_ITERATIONS = 20
+
+
+def _send(client, method, path, data):
+    if data is None:
+        return getattr(client, method)(path)
+    return getattr(client, method)(path, data, format='json')
+
+
+def measure(client, method, path, data=None, iterations=50, warmup=3, rounds=3):
+    """
+    Sends the same request `iterations` times in each of `rounds` after `warmup` unmeasured ones
+    """
+    for _ in range(warmup):
+        cache.clear()
+        _send(client, method, path, data)
+
+    latencies, round_p95s, queries, statuses = [], [], [], []
+    elapsed = 0.0
+    for _ in range(rounds):
+        round_latencies = []
+        for _ in range(iterations):
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                sent = time.perf_counter()
+                response = _send(client, method, path, data)
+                round_latencies.append(time.perf_counter() - sent)
+            queries.append(len(captured))
+            statuses.append(response.status_code)
+        elapsed += sum(round_latencies)
+        round_latencies.sort()
+        round_p95s.append(percentile(round_latencies, 0.95) * 1000)
+        latencies += round_latencies
+
+    latencies.sort()
+    return {
+        'method': method.upper(),
+        'path': path,
+        'requests': iterations * rounds,
+        'iterations': iterations,
+        'errors': sum(1 for code in statuses if code >= 400),
+        'statuses': sorted(set(statuses)),
+        'throughput': iterations * rounds / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': statistics.median(round_p95s) if round_p95s else 0.0,
+        'p95_rounds_ms': round_p95s,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'queries': max(queries, default=0),
+    }
+
+
+def run(client, reads, writes=(), iterations=50, rounds=3):
+    """
+    Measures read endpoints given as (name, path) and write endpoints given as (name, method, path, data)
+    """
+    results = {}
+    for name, path in reads:
+        results[name] = measure(client, 'get', path, iterations=iterations, rounds=rounds)
+    for name, method, path, data in writes:
+        results[name] = measure(client, method, path, data, iterations=iterations, rounds=rounds)
+    return results
+
+
+def _is_slower(previous, result, threshold, min_ms):
+    if min(previous.get('iterations', 0), result['iterations']) < MIN_ITERATIONS:
+        return False
+    # results saved before rounds were introduced have their p95 only
+    previous_rounds = previous.get('p95_rounds_ms') or [previous['p95_ms']]
+    return (result['p95_ms'] - previous['p95_ms'] > min_ms
+            and min(result['p95_rounds_ms']) > max(previous_rounds) * (1 + threshold))
+
+
+def compare(baseline, current, threshold=0.2, min_ms=1.0):
+    """
+    Provides regressions of current results against baseline ones.
+    Latency regresses when median p95 of rounds grows by more than `min_ms` and the fastest current round
+    is slower than the slowest baseline round by more than `threshold`, queries and errors regress on any growth
+    """
+    regressions = []
+    for name, result in current.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if _is_slower(previous, result, threshold, min_ms):
+            regressions.append({'name': name, 'metric': 'p95_ms',
+                                'baseline': previous['p95_ms'], 'current': result['p95_ms']})
+        for metric in ('queries', 'errors'):
+            if result[metric] > previous[metric]:
+                regressions.append({'name': name, 'metric': metric,
+                                    'baseline': previous[metric], 'current': result[metric]})
+    return regressions
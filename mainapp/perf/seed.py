@@ -0,0 +1,149 @@
+"""
+Synthetic social graph for benchmarks and query plan checks.
+
+Friendships follow preferential attachment, so a few users have most of the
+friends, like on a real network. Questions asked to a user, comments and
+reactions per answer are drawn from a Pareto distribution, so most users
+are quiet and some are very active. Rows are inserted with bulk_create and
+explicit primary keys; denormalized data (profiles, stats, feeds) is written
+in bulk the same way, without per-row signals. SCALES are presets of
+generator arguments.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from friendship.models import Friend, FriendshipRequest
+
+from mainapp import stats
+from mainapp.models import Answer, Comment, FeedEntry, MyUser, Question, Reaction
+
+PASSWORD = 'benchmark'
+BATCH_SIZE = 1000
+
+SCALES = {
+    'small': {'users': 200, 'friends_per_user': 5, 'questions_per_user': 10, 'reactions_per_answer': 3},
+    'medium': {'users': 2000, 'friends_per_user': 10, 'questions_per_user': 20, 'reactions_per_answer': 5},
+    'large': {'users': 20000, 'friends_per_user': 15, 'questions_per_user': 30, 'reactions_per_answer': 8},
+}
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def _pareto(rng, mean, alpha=1.5):
+    # paretovariate has mean alpha / (alpha - 1), scale it to the wanted mean
+    return int(rng.paretovariate(alpha) * mean * (alpha - 1) / alpha)
+
+
+def _friend_pairs(rng, user_ids, friends_per_user):
+    """
+    Grows graph by preferential attachment, every new user befriends up to `friends_per_user` users
+    """
+    pairs = set()
+    endpoints = []
+    for index, user_id in enumerate(user_ids):
+        if index == 0:
+            continue
+        targets = set()
+        while len(targets) < min(friends_per_user, index):
+            targets.add(rng.choice(endpoints) if endpoints and rng.random() < 0.9 else user_ids[rng.randrange(index)])
+        for target in targets:
+            pairs.add((user_id, target))
+            endpoints += [user_id, target]
+    return pairs
+
+
+def seed(users=200, friends_per_user=5, questions_per_user=10, answer_rate=0.6, comments_per_answer=2,
+         reactions_per_answer=3, like_rate=0.85, pending_requests=1, days=90, random_seed=0):
+    """
+    Creates synthetic users with friends, questions, answers, comments and reactions.
+    Returns ids of created users
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+
+    def moment():
+        return now - timedelta(seconds=rng.randrange(days * 24 * 3600))
+
+    with transaction.atomic():
+        first_user_id = _next_id(User)
+        user_ids = list(range(first_user_id, first_user_id + users))
+        password = make_password(PASSWORD)
+        User.objects.bulk_create([
+            User(id=user_id, username=f'bench{user_id}', first_name=f'First{user_id}', last_name=f'Last{user_id}',
+                 email=f'bench{user_id}@example.com', password=password)
+            for user_id in user_ids
+        ], batch_size=BATCH_SIZE)
+        MyUser.objects.bulk_create([MyUser(user_id=user_id) for user_id in user_ids], batch_size=BATCH_SIZE)
+
+        pairs = _friend_pairs(rng, user_ids, friends_per_user)
+        friends = {user_id: [] for user_id in user_ids}
+        for first, second in pairs:
+            friends[first].append(second)
+            friends[second].append(first)
+        Friend.objects.bulk_create([
+            Friend(to_user_id=user_id, from_user_id=friend_id, created=moment())
+            for user_id, friend_ids in friends.items() for friend_id in friend_ids
+        ], batch_size=BATCH_SIZE)
+
+        requests = set()
+        for user_id in user_ids:
+            for _ in range(pending_requests):
+                sender_id = rng.choice(user_ids)
+                if sender_id != user_id and (sender_id, user_id) not in pairs and (user_id, sender_id) not in pairs:
+                    requests.add((sender_id, user_id))
+        FriendshipRequest.objects.bulk_create([
+            FriendshipRequest(from_user_id=sender_id, to_user_id=user_id, message='', created=moment())
+            for sender_id, user_id in requests
+        ], batch_size=BATCH_SIZE)
+
+        question_id = _next_id(Question)
+        answer_id = _next_id(Answer)
+        comment_id = _next_id(Comment)
+        questions, answers, comments, reactions, entries = [], [], [], [], []
+        for user_id in user_ids:
+            askers = friends[user_id] or user_ids
+            for _ in range(_pareto(rng, questions_per_user)):
+                asked_at = moment()
+                answered = rng.random() < answer_rate
+                questions.append(Question(
+                    id=question_id, askedUser_id=user_id, asker_id=rng.choice(askers) if rng.random() < 0.8 else None,
+                    question_text=f'Question {question_id}?', timestamp=asked_at, answered=answered,
+                ))
+                if answered:
+                    answered_at = min(now, asked_at + timedelta(seconds=rng.randrange(3 * 24 * 3600)))
+                    comment_count = _pareto(rng, comments_per_answer)
+                    reactors = rng.sample(askers, min(len(askers), _pareto(rng, reactions_per_answer)))
+                    values = [Reaction.LIKE if rng.random() < like_rate else Reaction.DISLIKE for _ in reactors]
+                    reactions += [Reaction(user_id=reactor_id, answer_id=answer_id, value=value, timestamp=answered_at)
+                                  for reactor_id, value in zip(reactors, values)]
+                    answers.append(Answer(id=answer_id, question_id=question_id, answer_text=f'Answer {answer_id}',
+                                          timestamp=answered_at, comment_count=comment_count,
+                                          likes=values.count(Reaction.LIKE), dislikes=values.count(Reaction.DISLIKE)))
+                    for _ in range(comment_count):
+                        comments.append(Comment(id=comment_id, answer_id=answer_id, commented_user_id=rng.choice(askers),
+                                                comment_text=f'Comment {comment_id}', timestamp=moment()))
+                        comment_id += 1
+                    entries += [FeedEntry(owner_id=friend_id, author_id=user_id, answer_id=answer_id,
+                                          timestamp=answered_at) for friend_id in friends[user_id]]
+                    answer_id += 1
+                question_id += 1
+
+        asked_at = [question.timestamp for question in questions]
+        Question.objects.bulk_create(questions, batch_size=BATCH_SIZE)
+        # auto_now_add replaced timestamps on insert
+        for question, timestamp in zip(questions, asked_at):
+            question.timestamp = timestamp
+        Question.objects.bulk_update(questions, ['timestamp'], batch_size=BATCH_SIZE)
+        Answer.objects.bulk_create(answers, batch_size=BATCH_SIZE)
+        Comment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+        Reaction.objects.bulk_create(reactions, batch_size=BATCH_SIZE)
+        FeedEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+        stats.recompute(user_ids)
+    return user_ids
@@ -0,0 +1,102 @@
+"""
+Serving mode benchmark.
+
+Starts the project under gunicorn in WSGI mode (sync workers, sync views)
+and in ASGI mode (uvicorn workers, async read views), sends the same
+concurrent load of hot GET requests to both and reports throughput and
+latency percentiles.
+"""
+import http.client
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MODES = {
+    'wsgi': {
+        'command': ['gunicorn', 'askme.wsgi:application', '--worker-class', 'sync'],
+        'env': {'ASYNC_READ_VIEWS': '0'},
+    },
+    'asgi': {
+        'command': ['gunicorn', 'askme.asgi:application', '--worker-class', 'uvicorn.workers.UvicornWorker'],
+        'env': {'ASYNC_READ_VIEWS': '1'},
+    },
+}
+
+
+def percentile(values, fraction):
+    """
+    Provides value below which `fraction` of sorted values lie
+    """
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+def start_server(mode, port, workers):
+    env = dict(os.environ, **MODES[mode]['env'])
+    command = [sys.executable, '-m', *MODES[mode]['command'], '--bind', f'127.0.0.1:{port}',
+               '--workers', str(workers)]
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start in {timeout} seconds')
+
+
+def _get(port, path, headers):
+    started = time.perf_counter()
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return time.perf_counter() - started, response.status < 400
+    except OSError:
+        return time.perf_counter() - started, False
+    finally:
+        connection.close()
+
+
+def load(port, paths, headers, concurrency, total):
+    """
+    Sends `total` requests over paths round-robin with `concurrency` clients
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda i: _get(port, paths[i % len(paths)], headers), range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, ok in results)
+    return {
+        'requests': total,
+        'errors': sum(1 for latency, ok in results if not ok),
+        'throughput': total / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def benchmark(mode, paths, token, concurrency=50, total=2000, workers=2, port=8765):
+    server = start_server(mode, port, workers)
+    try:
+        wait_until_ready(port)
+        headers = {'Authorization': f'Token {token}'}
+        # warm up connections and caches of workers
+        load(port, paths, headers, concurrency, min(total, concurrency * 2))
+        return load(port, paths, headers, concurrency, total)
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,157 @@
+"""
+Versioned cache of public profile responses.
+
+Every user has a content version in UserStats, which is bumped in the
+database when the profile, answers, likes, questions or friendships of the
+user change, so every worker sees it. Responses of profile views are cached
+under a key made of the version and the request, the same key is sent as a
+strong ETag, so a client which already has the current version gets 304
+after a single query. The response cache itself may be local to a process,
+a stale version is never served under a newer key. Users of public profile
+urls are found by username in the same query as their version, so renamed
+and deleted users are never served from a mapping of another process.
+"""
+from hashlib import sha1
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from friendship.signals import friendship_request_accepted, friendship_removed
+from rest_framework import status
+from rest_framework.response import Response
+
+from mainapp.models import Answer, Comment, MyUser, Question, UserStats
+from mainapp.signals import answer_reactions_changed, questions_bulk_created
+
+
+def timeout():
+    return getattr(settings, 'PROFILE_CACHE_TIMEOUT', 300)
+
+
+def version(user_id):
+    """
+    Provides content version of user, None until the user has statistics
+    """
+    return UserStats.objects.filter(user_id=user_id).values_list('profile_version', flat=True).first()
+
+
+def bump(*user_ids):
+    if user_ids:
+        UserStats.objects.filter(user_id__in=user_ids).update(profile_version=F('profile_version') + 1)
+
+
+def user_version(username):
+    """
+    Provides (user id, content version) of user with username, None if there is none with statistics
+    """
+    return UserStats.objects.filter(user__username=username).values_list('user_id', 'profile_version').first()
+
+
+def _set_headers(response, etag, is_public):
+    response['ETag'] = etag
+    if is_public:
+        response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    else:
+        # the same url serves different users depending on token
+        response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+        response['Vary'] = 'Authorization'
+    return response
+
+
+def cached_profile_response(request, view_name, username, produce):
+    """
+    Serves response of profile view from cache, `produce` is called on cache miss
+    """
+    if username is not None:
+        found = user_version(username)
+    elif request.user.is_authenticated:
+        current = version(request.user.id)
+        found = (request.user.id, current) if current is not None else None
+    else:
+        found = None
+    if found is None:
+        return produce()
+    user_id, current = found
+
+    key = f'{view_name}:{user_id}:{current}:{request.get_host()}:{request.get_full_path()}'
+    etag = f'"{sha1(key.encode()).hexdigest()}"'
+    is_public = username is not None
+
+    if etag in [tag.strip() for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+        return _set_headers(Response(status=status.HTTP_304_NOT_MODIFIED), etag, is_public)
+
+    data = cache.get(f'profile-response:{etag}')
+    if data is not None:
+        return _set_headers(Response(data, status=status.HTTP_200_OK), etag, is_public)
+
+    response = produce()
+    if response.status_code != status.HTTP_200_OK:
+        return response
+    cache.set(f'profile-response:{etag}', response.data, timeout())
+    return _set_headers(response, etag, is_public)
+
+
+class ProfileCacheMixin:
+    """
+    Serves GET of profile view through the versioned cache
+    """
+
+    def get(self, request, *args, **kwargs):
+        return cached_profile_response(
+            request, type(self).__name__, kwargs.get('username'),
+            lambda: super(ProfileCacheMixin, self).get(request, *args, **kwargs),
+        )
+
+
+def on_user_saved(sender, instance, **kwargs):
+    bump(instance.id)
+
+
+def on_profile_saved(sender, instance, **kwargs):
+    bump(instance.user_id)
+
+
+def on_question_changed(sender, instance, **kwargs):
+    bump(instance.askedUser_id)
+
+
+def on_questions_bulk_created(sender, questions, **kwargs):
+    bump(*{question.askedUser_id for question in questions})
+
+
+def on_answer_changed(sender, instance, **kwargs):
+    owner_id = Question.objects.filter(id=instance.question_id).values_list('askedUser_id', flat=True).first()
+    if owner_id is not None:
+        bump(owner_id)
+
+
+def on_comment_changed(sender, instance, **kwargs):
+    owner_id = Answer.objects.filter(id=instance.answer_id).values_list('question__askedUser_id', flat=True).first()
+    if owner_id is not None:
+        bump(owner_id)
+
+
+def on_reactions_changed(sender, answer_id, **kwargs):
+    owner_id = Answer.objects.filter(id=answer_id).values_list('question__askedUser_id', flat=True).first()
+    if owner_id is not None:
+        bump(owner_id)
+
+
+def on_friendship_changed(sender, from_user, to_user, **kwargs):
+    bump(from_user.id, to_user.id)
+
+
+post_save.connect(on_user_saved, sender=User)
+post_save.connect(on_profile_saved, sender=MyUser)
+post_save.connect(on_question_changed, sender=Question)
+post_delete.connect(on_question_changed, sender=Question)
+questions_bulk_created.connect(on_questions_bulk_created)
+post_save.connect(on_answer_changed, sender=Answer)
+post_delete.connect(on_answer_changed, sender=Answer)
+post_save.connect(on_comment_changed, sender=Comment)
+post_delete.connect(on_comment_changed, sender=Comment)
+answer_reactions_changed.connect(on_reactions_changed)
+friendship_request_accepted.connect(on_friendship_changed)
+friendship_removed.connect(on_friendship_changed)
@@ -0,0 +1,203 @@
+"""
+Publish/subscribe of events between request handlers and push streams.
+
+Publishers call `publish(channel, message)` or `publish_many(pairs)` from
+any thread, subscribers are coroutines of the ASGI event stream reading a
+Subscription. The broker
+class is set by PUBSUB_BROKER. InProcessBroker delivers messages inside one
+process, which is enough for tests and a single-process deployment.
+PostgresBroker passes messages between processes with LISTEN/NOTIFY of the
+default database, and is used unless PUBSUB_BROKER says otherwise when that
+database is PostgreSQL, so workers of one server see events of each other.
+Messages published together are packed into as few notifications as fit
+under the payload limit and sent with a single query.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads must be shorter than 8000 bytes
+MAX_PAYLOAD = 7999
+
+
+class Subscription:
+    """
+    Messages of channel for one subscriber, buffered up to `max_pending`
+    """
+
+    def __init__(self, broker, channel, loop, max_pending):
+        self.broker = broker
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def deliver(self, message):
+        # called in the loop of subscriber
+        if self.queue.full():
+            # subscriber is too slow, it has to reload instead of following events
+            self.overflowed = True
+            return
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """
+        Waits for next message, returns None on timeout
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, asyncio.get_event_loop(), self.max_pending)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+        return len(subscriptions)
+
+    def publish_many(self, pairs):
+        """
+        Publishes (channel, message) pairs
+        """
+        return sum(self.publish(channel, message) for channel, message in pairs)
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    Sends messages through NOTIFY, a listener thread of every process hands them to own subscribers
+    """
+
+    def __init__(self, max_pending=100, pg_channel='askme_events', alias='default'):
+        super().__init__(max_pending)
+        self.pg_channel = pg_channel
+        self.alias = alias
+        self._listener = None
+
+    def subscribe(self, channel):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='askme-pubsub', daemon=True)
+                self._listener.start()
+        return super().subscribe(channel)
+
+    def publish(self, channel, message):
+        payload = json.dumps({'channel': channel, 'message': message})
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.pg_channel, payload])
+
+    def publish_many(self, pairs):
+        payloads = _pack([json.dumps({'channel': channel, 'message': message}) for channel, message in pairs])
+        if not payloads:
+            return
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload',
+                           [self.pg_channel, payloads])
+
+    def _listen(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        while True:
+            connection = None
+            try:
+                connection = psycopg2.connect(**connections[self.alias].get_connection_params())
+                connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.pg_channel}')
+                while True:
+                    if select.select([connection], [], [], 5) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        data = json.loads(connection.notifies.pop(0).payload)
+                        # messages published together come as a list
+                        for item in data if isinstance(data, list) else [data]:
+                            super().publish(item['channel'], item['message'])
+            except Exception:
+                logger.exception('pubsub listener failed, reconnecting')
+                if connection is not None:
+                    connection.close()
+                time.sleep(1)
+
+
+def _pack(items):
+    """
+    Joins JSON items into JSON lists no longer than MAX_PAYLOAD, an item too long on its own goes alone
+    """
+    payloads, batch, size = [], [], 1
+    for item in items:
+        if batch and size + len(item) + 1 > MAX_PAYLOAD:
+            payloads.append('[' + ','.join(batch) + ']')
+            batch, size = [], 1
+        batch.append(item)
+        size += len(item) + 1
+    if batch:
+        payloads.append('[' + ','.join(batch) + ']')
+    return payloads
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def default_broker():
+    if connections['default'].vendor == 'postgresql':
+        return 'mainapp.pubsub.PostgresBroker'
+    return 'mainapp.pubsub.InProcessBroker'
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_class = import_string(getattr(settings, 'PUBSUB_BROKER', None) or default_broker())
+                _broker = broker_class(**getattr(settings, 'PUBSUB_BROKER_OPTIONS', {}))
+    return _broker
+
+
+def publish(channel, message):
+    return get_broker().publish(channel, message)
+
+
+def publish_many(pairs):
+    return get_broker().publish_many(pairs)
+
+
+def subscribe(channel):
+    return get_broker().subscribe(channel)
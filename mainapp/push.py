@@ -0,0 +1,186 @@
+"""
+Push of new inbox questions, comments and friend requests.
+
+Events are published to the channel of the receiving user once the
+transaction commits. `events_app` is an ASGI application which streams
+events of the signed in user as Server-Sent Events, so clients are told
+when to reload instead of polling lists. Events carry only ids.
+
+EventSource can't send the token in a header, and a token in the url ends
+up in logs, so browsers open the stream with a signed ticket which expires
+after PUSH_TICKET_MAX_AGE seconds.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+from friendship.signals import friendship_request_accepted, friendship_request_created
+from rest_framework.exceptions import AuthenticationFailed
+
+from mainapp import pubsub
+from mainapp.models import Answer, Comment, Question
+from mainapp.signals import questions_bulk_created
+from mainapp.utils import CachedTokenAuthentication
+
+QUESTION = 'question'
+COMMENT = 'comment'
+FRIEND_REQUEST = 'friend_request'
+FRIENDSHIP = 'friendship'
+
+TICKET_SALT = 'mainapp.push.ticket'
+
+
+def heartbeat():
+    return getattr(settings, 'PUSH_HEARTBEAT', 15)
+
+
+def ticket_max_age():
+    return getattr(settings, 'PUSH_TICKET_MAX_AGE', 60)
+
+
+def issue_ticket(user):
+    return signing.dumps(user.id, salt=TICKET_SALT)
+
+
+def channel(user_id):
+    return f'user:{user_id}'
+
+
+def notify(user_id, event, **data):
+    """
+    Publishes event to user after the current transaction is committed
+    """
+    message = dict(data, type=event)
+    transaction.on_commit(lambda: pubsub.publish(channel(user_id), message))
+
+
+def notify_many(events):
+    """
+    Publishes (user_id, event, data) events together after the current transaction is committed
+    """
+    pairs = [(channel(user_id), dict(data, type=event)) for user_id, event, data in events]
+    if pairs:
+        transaction.on_commit(lambda: pubsub.publish_many(pairs))
+
+
+def on_question_saved(sender, instance, created, **kwargs):
+    if created:
+        notify(instance.askedUser_id, QUESTION, id=instance.id)
+
+
+def on_questions_bulk_created(sender, questions, **kwargs):
+    notify_many([(question.askedUser_id, QUESTION, {'id': question.id}) for question in questions])
+
+
+def on_comment_saved(sender, instance, created, **kwargs):
+    if not created:
+        return
+    owner_id = Answer.objects.filter(id=instance.answer_id).values_list('question__askedUser_id', flat=True).first()
+    if owner_id is not None and owner_id != instance.commented_user_id:
+        notify(owner_id, COMMENT, id=instance.id, answer_id=instance.answer_id)
+
+
+def on_friendship_request_created(sender, **kwargs):
+    notify(sender.to_user_id, FRIEND_REQUEST, id=sender.id, from_user=sender.from_user_id)
+
+
+def on_friendship_request_accepted(sender, from_user, to_user, **kwargs):
+    notify(from_user.id, FRIENDSHIP, user=to_user.id)
+
+
+def _token(scope):
+    for name, value in scope.get('headers', []):
+        if name == b'authorization' and value.lower().startswith(b'token '):
+            return value[6:].decode('latin-1').strip()
+    return None
+
+
+def _ticket(scope):
+    for pair in scope.get('query_string', b'').decode('latin-1').split('&'):
+        name, _sep, value = pair.partition('=')
+        if name == 'ticket' and value:
+            return value
+    return None
+
+
+def _authenticate(scope):
+    """
+    Provides user of token in header or of ticket in query string, None if neither is valid
+    """
+    key, ticket = _token(scope), _ticket(scope)
+    if key is None and ticket is None:
+        return None
+    close_old_connections()
+    try:
+        if key is not None:
+            user, token = CachedTokenAuthentication().authenticate_credentials(key)
+            return user
+        user_id = signing.loads(ticket, salt=TICKET_SALT, max_age=ticket_max_age())
+        return User.objects.filter(id=user_id, is_active=True).first()
+    except (AuthenticationFailed, signing.BadSignature):
+        return None
+    finally:
+        close_old_connections()
+
+
+async def _send_body(send, body):
+    await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def events_app(scope, receive, send):
+    """
+    Streams events of the signed in user
+    """
+    user = await sync_to_async(_authenticate)(scope)
+    if user is None:
+        await send({'type': 'http.response.start', 'status': 401,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': b'{"detail": "Invalid token or ticket."}'})
+        return
+
+    subscription = pubsub.subscribe(channel(user.id))
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        await _send_body(send, b'retry: 5000\n\n')
+        while True:
+            getter = asyncio.ensure_future(subscription.get(timeout=heartbeat()))
+            await asyncio.wait([getter, disconnected], return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                getter.cancel()
+                return
+            if subscription.overflowed:
+                # events were lost, client has to reload everything
+                await send({'type': 'http.response.body', 'body': b'event: reset\ndata: {}\n\n'})
+                return
+            message = getter.result()
+            if message is None:
+                await _send_body(send, b': heartbeat\n\n')
+            else:
+                await _send_body(send, f'event: {message["type"]}\ndata: {json.dumps(message)}\n\n'.encode())
+    finally:
+        disconnected.cancel()
+        subscription.close()
+
+
+post_save.connect(on_question_saved, sender=Question)
+questions_bulk_created.connect(on_questions_bulk_created)
+post_save.connect(on_comment_saved, sender=Comment)
+friendship_request_created.connect(on_friendship_request_created)
+friendship_request_accepted.connect(on_friendship_request_accepted)
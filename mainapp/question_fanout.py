@@ -0,0 +1,75 @@
+"""
+Asking the same question to many users.
+
+Recipients are checked in one query and questions are inserted with batched
+bulk_create. bulk_create sends no post_save, so questions_bulk_created is sent
+instead and receivers of denormalized data handle the whole batch at once.
+Audiences larger than QUESTION_FANOUT_SYNC_LIMIT are asked in background.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from mainapp import friend_graph, tasks
+from mainapp.models import MyUser, Question
+from mainapp.signals import questions_bulk_created
+
+
+def sync_limit():
+    return getattr(settings, 'QUESTION_FANOUT_SYNC_LIMIT', 100)
+
+
+def batch_size():
+    return getattr(settings, 'QUESTION_FANOUT_BATCH_SIZE', 500)
+
+
+def recipients(user_ids, is_anonymous):
+    """
+    Provides ids of existing users that accept the question
+    """
+    accepting = []
+    for chunk in friend_graph.chunks(set(user_ids)):
+        profiles = MyUser.objects.filter(user_id__in=chunk).values_list('user_id', 'isAnonymousQuestionsAllowed')
+        accepting += [user_id for user_id, allows_anonymous in profiles if allows_anonymous or not is_anonymous]
+    return sorted(accepting)
+
+
+def ask(asker_id, question_text, user_ids, is_anonymous=False):
+    """
+    Asks question to users which accept it, returns created questions
+    """
+    questions = [
+        Question(askedUser_id=user_id, asker_id=None if is_anonymous else asker_id, question_text=question_text)
+        for user_id in recipients(user_ids, is_anonymous)
+    ]
+    if not questions:
+        return []
+
+    with transaction.atomic():
+        last_id = Question.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        Question.objects.bulk_create(questions, batch_size=batch_size())
+        if questions[0].pk is None:
+            # only some databases return primary keys of inserted rows
+            created = Question.objects.filter(
+                id__gt=last_id, asker_id=questions[0].asker_id, question_text=question_text,
+                askedUser_id__in=[question.askedUser_id for question in questions],
+            ).values_list('askedUser_id', 'id')
+            ids = dict(created)
+            for question in questions:
+                question.pk = ids[question.askedUser_id]
+        questions_bulk_created.send(sender=Question, questions=questions)
+    return questions
+
+
+def ask_many(asker_id, question_text, user_ids, is_anonymous=False):
+    """
+    Asks question now or in background if there are too many users.
+    Returns created questions or None if they are created in background
+    """
+    if len(user_ids) > sync_limit():
+        tasks.submit(ask, asker_id, question_text, list(user_ids), is_anonymous)
+        return None
+    return ask(asker_id, question_text, user_ids, is_anonymous)
+
+
+def ask_friends(asker_id, question_text, is_anonymous=False):
+    return ask_many(asker_id, question_text, list(friend_graph.friend_ids(asker_id)), is_anonymous)
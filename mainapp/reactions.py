@@ -0,0 +1,181 @@
+"""
+Likes and dislikes of answers.
+
+Every user has at most one Reaction per answer, and Answer.likes/dislikes are
+changed only with in-database increments, so concurrent reactions never
+overwrite each other. With REACTION_WRITE_BEHIND enabled counter increments are
+collected in process memory and written in batches, by the request that fills
+the batch or by a flusher thread once the oldest increment waited for
+REACTION_WRITE_BEHIND_MAX_DELAY seconds.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+
+from mainapp.models import Answer, Reaction
+from mainapp.signals import answer_reactions_changed
+
+logger = logging.getLogger(__name__)
+
+
+def _apply(deltas):
+    """
+    Writes counter deltas, which is {answer_id: [likes, dislikes]}
+    """
+    with transaction.atomic():
+        for answer_id, (likes, dislikes) in deltas.items():
+            if likes or dislikes:
+                Answer.objects.filter(pk=answer_id).update(likes=F('likes') + likes, dislikes=F('dislikes') + dislikes)
+
+    for answer_id, (likes, dislikes) in deltas.items():
+        if likes or dislikes:
+            answer_reactions_changed.send(sender=Answer, answer_id=answer_id, likes=likes, dislikes=dislikes)
+
+
+class ReactionBuffer:
+    """
+    Collects counter deltas and writes them when there are too many of them
+    or the oldest one is waiting for too long, even if no other delta comes
+    """
+
+    def __init__(self, max_pending, max_delay):
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._deltas = {}
+        self._since = None
+        self._waiting = threading.Event()
+        self._thread = None
+
+    def add(self, answer_id, likes, dislikes):
+        with self._lock:
+            delta = self._deltas.setdefault(answer_id, [0, 0])
+            delta[0] += likes
+            delta[1] += dislikes
+            if self._since is None:
+                self._since = time.monotonic()
+                self._waiting.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='askme-reactions', daemon=True)
+                self._thread.start()
+            is_due = len(self._deltas) >= self.max_pending or time.monotonic() - self._since >= self.max_delay
+
+        if is_due:
+            self.flush()
+
+    def pending(self, answer_id):
+        with self._lock:
+            return tuple(self._deltas.get(answer_id, (0, 0)))
+
+    def flush(self):
+        with self._lock:
+            deltas, self._deltas, self._since = self._deltas, {}, None
+            self._waiting.clear()
+        if deltas:
+            _apply(deltas)
+
+    def _overdue(self):
+        # seconds the oldest delta is waiting beyond max_delay, negative before that, None without deltas
+        with self._lock:
+            return None if self._since is None else time.monotonic() - self._since - self.max_delay
+
+    def _run(self):
+        while True:
+            self._waiting.wait()
+            overdue = self._overdue()
+            if overdue is not None and overdue < 0:
+                time.sleep(-overdue)
+                overdue = self._overdue()
+            if overdue is None or overdue < 0:
+                continue
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('failed to write reaction counters')
+            finally:
+                # the thread keeps its connection only as long as CONN_MAX_AGE allows
+                close_old_connections()
+
+
+_buffer = None
+
+
+def get_buffer():
+    """
+    Provides process-wide buffer if write-behind is enabled, None otherwise
+    """
+    global _buffer
+    if not getattr(settings, 'REACTION_WRITE_BEHIND', False):
+        return None
+    if _buffer is None:
+        _buffer = ReactionBuffer(
+            max_pending=getattr(settings, 'REACTION_WRITE_BEHIND_MAX_PENDING', 100),
+            max_delay=getattr(settings, 'REACTION_WRITE_BEHIND_MAX_DELAY', 2.0),
+        )
+        atexit.register(_buffer.flush)
+    return _buffer
+
+
+def counts(answer_id):
+    """
+    Provides current like and dislike amounts, including not yet written ones
+    """
+    likes, dislikes = Answer.objects.filter(pk=answer_id).values_list('likes', 'dislikes').get()
+    buffer = get_buffer()
+    if buffer is not None:
+        pending_likes, pending_dislikes = buffer.pending(answer_id)
+        likes, dislikes = likes + pending_likes, dislikes + pending_dislikes
+    return {'likes': likes, 'dislikes': dislikes}
+
+
+def _change_counters(answer_id, likes, dislikes):
+    buffer = get_buffer()
+    if buffer is None:
+        _apply({answer_id: [likes, dislikes]})
+    else:
+        transaction.on_commit(lambda: buffer.add(answer_id, likes, dislikes))
+
+
+def react(user, answer_id, value, replaces=None):
+    """
+    Sets reaction of user to answer. Value None removes reaction,
+    only if it is equal to `replaces` when that is given.
+    Returns new like and dislike amounts of answer
+    """
+    with transaction.atomic():
+        reaction = Reaction.objects.select_for_update().filter(user_id=user.id, answer_id=answer_id).first()
+        previous = reaction.value if reaction is not None else None
+        if previous == value or (replaces is not None and previous != replaces):
+            return counts(answer_id)
+
+        if value is None:
+            reaction.delete()
+        elif reaction is not None:
+            reaction.value = value
+            reaction.save(update_fields=['value'])
+        else:
+            try:
+                with transaction.atomic():
+                    Reaction.objects.create(user_id=user.id, answer_id=answer_id, value=value)
+            except IntegrityError:
+                # a concurrent request created the reaction first, this one came later and replaces its value
+                reaction = Reaction.objects.select_for_update().filter(user_id=user.id, answer_id=answer_id).first()
+                previous = reaction.value if reaction is not None else None
+                if previous == value:
+                    return counts(answer_id)
+                if reaction is None:
+                    Reaction.objects.create(user_id=user.id, answer_id=answer_id, value=value)
+                else:
+                    reaction.value = value
+                    reaction.save(update_fields=['value'])
+
+        likes = (value == Reaction.LIKE) - (previous == Reaction.LIKE)
+        dislikes = (value == Reaction.DISLIKE) - (previous == Reaction.DISLIKE)
+        _change_counters(answer_id, likes, dislikes)
+
+    return counts(answer_id)
@@ -0,0 +1,13 @@
+from django.dispatch import Signal
+
+# sent when user hides or shows own answers in friends' feeds
+# providing_args=['user_id', 'visible']
+answers_visibility_changed = Signal()
+
+# sent when like and dislike counters of answer were changed
+# providing_args=['answer_id', 'likes', 'dislikes']
+answer_reactions_changed = Signal()
+
+# sent when questions were inserted with bulk_create, which sends no post_save
+# providing_args=['questions']
+questions_bulk_created = Signal()
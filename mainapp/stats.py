@@ -0,0 +1,179 @@
+"""
+Denormalized profile counters.
+
+UserStats rows are changed with in-database increments on answer, question,
+reaction and friendship events, so profile header costs one lookup.
+`recompute` rebuilds them from source tables and repairs drift.
+"""
+from collections import Counter, defaultdict
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete, post_save
+from friendship.models import Friend
+from friendship.signals import friendship_request_accepted, friendship_removed
+
+from askme import db_router
+from mainapp import deletion
+from mainapp.models import Answer, Question, UserStats
+from mainapp.signals import answer_reactions_changed, questions_bulk_created
+
+FIELDS = ('answers_count', 'likes_count', 'friends_count', 'unanswered_count')
+
+
+def adjust(user_id, **deltas):
+    """
+    Changes counters of user by given deltas
+    """
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not changes:
+        return
+    if not UserStats.objects.filter(user_id=user_id).update(**changes):
+        recompute([user_id])
+
+
+def adjust_many(user_ids, **deltas):
+    """
+    Changes counters of every user by the same deltas
+    """
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    user_ids = set(user_ids)
+    if not changes or not user_ids:
+        return
+    if UserStats.objects.filter(user_id__in=user_ids).update(**changes) < len(user_ids):
+        existing = set(UserStats.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        recompute(list(user_ids - existing))
+
+
+def _collect(user_ids=None):
+    """
+    Counts statistics from source tables, returns {user_id: {field: value}}
+    """
+    users = User.objects.all()
+    answers = Answer.objects.values('question__askedUser_id')
+    friends = Friend.objects.values('to_user_id')
+    unanswered = Question.objects.filter(answered=False).values('askedUser_id')
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+        answers = answers.filter(question__askedUser_id__in=user_ids)
+        friends = friends.filter(to_user_id__in=user_ids)
+        unanswered = unanswered.filter(askedUser_id__in=user_ids)
+
+    result = {user_id: dict.fromkeys(FIELDS, 0) for user_id in users.values_list('id', flat=True)}
+    for row in answers.annotate(count=Count('id'), likes=Sum('likes')).order_by():
+        if row['question__askedUser_id'] in result:
+            result[row['question__askedUser_id']].update(answers_count=row['count'], likes_count=row['likes'] or 0)
+    for row in friends.annotate(count=Count('id')).order_by():
+        if row['to_user_id'] in result:
+            result[row['to_user_id']]['friends_count'] = row['count']
+    for row in unanswered.annotate(count=Count('id')).order_by():
+        if row['askedUser_id'] in result:
+            result[row['askedUser_id']]['unanswered_count'] = row['count']
+    return result
+
+
+def recompute(user_ids=None, batch_size=500):
+    """
+    Rewrites statistics which differ from source tables.
+    Returns amount of repaired rows
+    """
+    # counts read from a lagging replica would be written over newer ones
+    db_router.use_primary()
+    expected = _collect(user_ids)
+    existing = UserStats.objects.all()
+    if user_ids is not None:
+        existing = existing.filter(user_id__in=user_ids)
+
+    drifted = []
+    for stats in existing.iterator():
+        values = expected.pop(stats.user_id, None)
+        if values is None:
+            continue
+        if any(getattr(stats, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(stats, field, value)
+            drifted.append(stats)
+
+    missing = [UserStats(user_id=user_id, **values) for user_id, values in expected.items()]
+    with transaction.atomic():
+        UserStats.objects.bulk_update(drifted, FIELDS, batch_size=batch_size)
+        UserStats.objects.bulk_create(missing, batch_size=batch_size, ignore_conflicts=True)
+    return len(drifted) + len(missing)
+
+
+def get(user_id):
+    stats = UserStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        recompute([user_id])
+        stats = UserStats.objects.get(user_id=user_id)
+    return stats
+
+
+def on_answer_saved(sender, instance, created, **kwargs):
+    if not created:
+        return
+    question = instance.question
+    is_first_answer = not Answer.objects.filter(question_id=question.id).exclude(id=instance.id).exists()
+    adjust(question.askedUser_id, answers_count=1, unanswered_count=-1 if is_first_answer else 0)
+
+
+def on_answer_deleted(sender, instance, **kwargs):
+    question = Question.objects.filter(id=instance.question_id).values('askedUser_id').first()
+    if question is None or deletion.is_deleting(User, question['askedUser_id']):
+        return
+    # question stays in the inbox if its last answer was removed, unless it is removed itself
+    returns_to_inbox = (not deletion.is_deleting(Question, instance.question_id)
+                        and not Answer.objects.filter(question_id=instance.question_id).exists())
+    adjust(question['askedUser_id'], answers_count=-1, likes_count=-instance.likes,
+           unanswered_count=1 if returns_to_inbox else 0)
+
+
+def on_question_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust(instance.askedUser_id, unanswered_count=1)
+
+
+def on_questions_bulk_created(sender, questions, **kwargs):
+    by_count = defaultdict(list)
+    for user_id, count in Counter(question.askedUser_id for question in questions).items():
+        by_count[count].append(user_id)
+    with transaction.atomic():
+        for count, user_ids in by_count.items():
+            adjust_many(user_ids, unanswered_count=count)
+
+
+def on_question_deleted(sender, instance, **kwargs):
+    if deletion.is_deleting(User, instance.askedUser_id):
+        return
+    # answers deleted with the question don't return it to the inbox, it only leaves the inbox if it was there
+    if not instance.answered:
+        adjust(instance.askedUser_id, unanswered_count=-1)
+
+
+def on_reactions_changed(sender, answer_id, likes, dislikes, **kwargs):
+    owner_id = Answer.objects.filter(id=answer_id).values_list('question__askedUser_id', flat=True).first()
+    if owner_id is not None:
+        adjust(owner_id, likes_count=likes)
+
+
+def on_friendship_accepted(sender, from_user, to_user, **kwargs):
+    with transaction.atomic():
+        adjust(from_user.id, friends_count=1)
+        adjust(to_user.id, friends_count=1)
+
+
+def on_friendship_removed(sender, from_user, to_user, **kwargs):
+    with transaction.atomic():
+        adjust(from_user.id, friends_count=-1)
+        adjust(to_user.id, friends_count=-1)
+
+
+post_save.connect(on_answer_saved, sender=Answer)
+post_delete.connect(on_answer_deleted, sender=Answer)
+post_save.connect(on_question_saved, sender=Question)
+post_delete.connect(on_question_deleted, sender=Question)
+questions_bulk_created.connect(on_questions_bulk_created)
+answer_reactions_changed.connect(on_reactions_changed)
+friendship_request_accepted.connect(on_friendship_accepted)
+friendship_removed.connect(on_friendship_removed)
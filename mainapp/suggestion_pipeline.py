@@ -0,0 +1,138 @@
+"""
+Batch computation of friend suggestions.
+
+The friendship graph is loaded as a sparse adjacency matrix A, so A @ A
+gives mutual friend counts of every pair of users at once. Questions asked
+to each other and comments on each other's answers form an interaction
+matrix which is added with INTERACTION_WEIGHT. Self and existing friends
+are removed and top suggestions of every user are written to
+FriendSuggestion. Users are marked fresh only when they were not marked
+stale again after the run started.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from friendship.models import Friend
+from scipy import sparse
+
+from mainapp.friend_graph import chunks
+from mainapp.models import Comment, FriendSuggestion, MyUser, Question
+
+INTERACTION_WEIGHT = 0.5
+
+
+class SocialGraph:
+    """
+    Friendship and interaction matrices indexed by position of user id in `user_ids`
+    """
+
+    def __init__(self, user_ids, friends, interactions):
+        self.user_ids = user_ids
+        self.friends = friends
+        self.interactions = interactions
+
+
+def _pairs(queryset):
+    rows = np.fromiter((value for pair in queryset.iterator() for value in pair), dtype=np.int64)
+    return rows.reshape(-1, 2)
+
+
+def load_graph():
+    user_ids = np.fromiter(MyUser.objects.order_by('user_id').values_list('user_id', flat=True).iterator(), dtype=np.int64)
+    size = len(user_ids)
+
+    def matrix(pairs):
+        pairs = pairs[np.isin(pairs, user_ids).all(axis=1)]
+        rows, cols = np.searchsorted(user_ids, pairs[:, 0]), np.searchsorted(user_ids, pairs[:, 1])
+        return sparse.csr_matrix((np.ones(len(pairs), dtype=np.float32), (rows, cols)), shape=(size, size))
+
+    friends = matrix(_pairs(Friend.objects.values_list('to_user_id', 'from_user_id')))
+    friends.data[:] = 1
+
+    asked = _pairs(Question.objects.filter(asker__isnull=False).values_list('asker_id', 'askedUser_id'))
+    commented = _pairs(Comment.objects.values_list('commented_user_id', 'answer__question__askedUser_id'))
+    interactions = matrix(np.concatenate([asked, commented]))
+    interactions = interactions + interactions.T
+
+    return SocialGraph(user_ids, friends, interactions.tocsr())
+
+
+def _top(row_scores, row_mutual, row_interactions, top_n):
+    if row_scores.nnz == 0:
+        return []
+    order = np.argsort(-row_scores.data, kind='stable')[:top_n]
+    cols = row_scores.indices[order]
+    return [
+        (col, float(row_scores.data[index]), int(row_mutual[0, col]), int(row_interactions[0, col]))
+        for col, index in zip(cols, order)
+    ]
+
+
+def compute(graph, positions, top_n=50):
+    """
+    Provides {user_id: [(suggested_id, score, mutual_count, interactions)]} for users at positions
+    """
+    friends = graph.friends[positions]
+    mutual = (friends @ graph.friends).tocsr()
+    interactions = graph.interactions[positions]
+    scores = (mutual + interactions * INTERACTION_WEIGHT).tolil()
+
+    # existing friends and users themselves are not suggested
+    excluded = (friends + sparse.csr_matrix(
+        (np.ones(len(positions)), (np.arange(len(positions)), positions)), shape=friends.shape)).tocoo()
+    scores[excluded.row, excluded.col] = 0
+    scores = scores.tocsr()
+    scores.eliminate_zeros()
+
+    result = {}
+    for row, position in enumerate(positions):
+        suggestions = _top(scores[row], mutual[row], interactions[row], top_n)
+        result[int(graph.user_ids[position])] = [
+            (int(graph.user_ids[col]), score, mutual_count, interaction_count)
+            for col, score, mutual_count, interaction_count in suggestions
+        ]
+    return result
+
+
+def store(suggestions, started_at):
+    """
+    Replaces suggestions of users, computed from the graph loaded after `started_at`
+    """
+    computed_at = timezone.now()
+    with transaction.atomic():
+        for user_ids in chunks(suggestions):
+            FriendSuggestion.objects.filter(user_id__in=user_ids).delete()
+        FriendSuggestion.objects.bulk_create([
+            FriendSuggestion(user_id=user_id, suggested_id=suggested_id, score=score,
+                             mutual_count=mutual_count, interactions=interactions, computed_at=computed_at)
+            for user_id, rows in suggestions.items()
+            for suggested_id, score, mutual_count, interactions in rows
+        ], batch_size=1000)
+        for user_ids in chunks(suggestions):
+            MyUser.objects.filter(user_id__in=user_ids).filter(
+                Q(suggestionsStaleSince__isnull=True) | Q(suggestionsStaleSince__lt=started_at),
+            ).update(isSuggestionsStale=False)
+
+
+def stale_positions(graph):
+    """
+    Provides positions of stale users and of their friends, whose friends of friends changed too
+    """
+    stale_ids = np.fromiter(
+        MyUser.objects.filter(isSuggestionsStale=True).values_list('user_id', flat=True).iterator(), dtype=np.int64)
+    stale = np.searchsorted(graph.user_ids, stale_ids[np.isin(stale_ids, graph.user_ids)])
+    affected = graph.friends[stale].indices
+    return np.unique(np.concatenate([stale, affected])).astype(np.int64)
+
+
+def run(full=False, top_n=50, chunk_size=1000):
+    """
+    Recomputes suggestions of all users or only stale ones. Returns amount of processed users
+    """
+    started_at = timezone.now()
+    graph = load_graph()
+    positions = np.arange(len(graph.user_ids)) if full else stale_positions(graph)
+    for start in range(0, len(positions), chunk_size):
+        store(compute(graph, positions[start:start + chunk_size], top_n=top_n), started_at)
+    return len(positions)
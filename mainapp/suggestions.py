@@ -0,0 +1,36 @@
+"""
+"People you may know" suggestions.
+
+Suggestions are computed offline by mainapp.suggestion_pipeline and stored
+in FriendSuggestion. Friendship changes mark both users stale, so the next
+incremental run recomputes them and their friends. The time of marking is
+kept, so a run which started before it doesn't clear the mark.
+"""
+from django.db import transaction
+from django.utils import timezone
+from friendship.models import Friend
+from friendship.signals import friendship_request_accepted, friendship_removed
+
+from mainapp.models import FriendSuggestion, MyUser
+
+
+def for_user(user):
+    """
+    Provides suggestions for user, best first, without the ones that became friends since computation
+    """
+    friends = Friend.objects.filter(to_user_id=user.id).values('from_user_id')
+    return FriendSuggestion.objects.filter(user_id=user.id).exclude(suggested_id__in=friends).order_by('-score')
+
+
+def mark_stale(*user_ids):
+    MyUser.objects.filter(user_id__in=user_ids).update(isSuggestionsStale=True, suggestionsStaleSince=timezone.now())
+
+
+def on_friendship_changed(sender, from_user, to_user, **kwargs):
+    # marked once committed, a run started after the mark sees the friendship
+    user_ids = (from_user.id, to_user.id)
+    transaction.on_commit(lambda: mark_stale(*user_ids))
+
+
+friendship_request_accepted.connect(on_friendship_changed)
+friendship_removed.connect(on_friendship_changed)
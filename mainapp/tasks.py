@@ -0,0 +1,47 @@
+"""
+Background work outside of the request cycle.
+
+Tasks are submitted after the current transaction commits and run in a
+process-wide thread pool of BACKGROUND_WORKERS threads. With
+BACKGROUND_TASKS_EAGER they run synchronously, which management commands
+and tests use.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+                                       thread_name_prefix='askme-background')
+    return _executor
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception('background task %s failed', func.__name__)
+        raise
+    finally:
+        # connections of worker threads are not reused by requests
+        connections.close_all()
+
+
+def submit(func, *args, **kwargs):
+    """
+    Runs func(*args, **kwargs) in background once the current transaction is committed
+    """
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        transaction.on_commit(lambda: func(*args, **kwargs))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(_run, func, args, kwargs))
@@ -0,0 +1,78 @@
+"""
+Test helpers for query budgets.
+
+List views declare how many queries they may issue with `query_budget`, and
+the budget must hold no matter how many rows are on a page:
+
+    class FeedTests(QueryBudgetTestCase):
+        def test_feed(self):
+            self.client.force_authenticate(self.user)
+            self.assertWithinQueryBudget(reverse('wall_answers'))
+"""
+from urllib.parse import urlsplit
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, resolve
+from rest_framework.test import APITestCase
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def view_class(view):
+    """
+    Provides class of class based or @api_view view function
+    """
+    return getattr(view, 'view_class', None) or getattr(view, 'cls', None)
+
+
+def declared_budget(path):
+    # paths may carry a query string, links of next pages are absolute urls
+    view = view_class(resolve(urlsplit(path).path).func)
+    return getattr(view, 'query_budget', None)
+
+
+def views_without_budget(urlconf='mainapp.api.v1.urls'):
+    """
+    Provides names of list views in urlconf which do not declare query budget
+    """
+    missing = []
+    for pattern in get_resolver(urlconf).url_patterns:
+        view = view_class(pattern.callback)
+        if view is None or getattr(view, 'query_budget', None) is not None:
+            continue
+        if 'list' in getattr(pattern.callback, 'actions', {}).values() or hasattr(view, 'list'):
+            missing.append(pattern.name or view.__name__)
+    return missing
+
+
+class query_budget(CaptureQueriesContext):
+    """
+    Context manager failing when more than `budget` queries were executed
+    """
+
+    def __init__(self, budget, using=DEFAULT_DB_ALIAS):
+        super().__init__(connections[using])
+        self.budget = budget
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is None and len(self) > self.budget:
+            queries = '\n'.join(f'{index}. {query["sql"]}' for index, query in enumerate(self.captured_queries, 1))
+            raise QueryBudgetExceeded(f'{len(self)} queries executed, budget is {self.budget}:\n{queries}')
+
+
+class QueryBudgetTestCase(APITestCase):
+
+    def assertWithinQueryBudget(self, path, budget=None, method='get', **kwargs):
+        if budget is None:
+            budget = declared_budget(path)
+        if budget is None:
+            self.fail(f'{path} does not declare query_budget')
+
+        with query_budget(budget):
+            response = getattr(self.client, method)(path, **kwargs)
+        self.assertLess(response.status_code, 400, getattr(response, 'data', response.content))
+        return response
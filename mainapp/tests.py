@@ -1,3 +1,486 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from friendship.models import Friend
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from askme.storage_backends import LocalMediaStorage
+from mainapp import feed, images, pubsub, suggestion_pipeline, suggestions, uploads
+from mainapp.models import Answer, Comment, FeedEntry, MyUser, Question, UploadTicket
+from mainapp.perf import fast_check, seed
+from mainapp.perf.endpoints import pick_subjects
+from mainapp.testing import QueryBudgetTestCase, views_without_budget
+from mainapp.utils import TokenCache
+
+
+def jpeg_bytes(size, exif_orientation=None):
+    output = io.BytesIO()
+    image = Image.new('RGB', size, (40, 120, 200))
+    exif = Image.Exif()
+    if exif_orientation is not None:
+        exif[0x0112] = exif_orientation
+    image.save(output, 'JPEG', exif=exif.tobytes())
+    return output.getvalue()
+
+
+def png_bytes(size=(64, 48)):
+    # noise doesn't compress, so the image takes several chunks
+    output = io.BytesIO()
+    Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3)).save(output, 'PNG')
+    return output.getvalue()
+
+
+class TemporaryMediaMixin:
+    """
+    Keeps media of the test case in a temporary directory on local filesystem
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_settings = override_settings(
+            DEFAULT_FILE_STORAGE='askme.storage_backends.LocalMediaStorage', MEDIA_ROOT=cls.media_root,
+            MEDIA_URL='/media/')
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+
+@override_settings(ASYNC_DB_WORKERS=0, BACKGROUND_TASKS_EAGER=True)
+class FastSerializersTests(TestCase):
+
+    def test_fast_serializers_match_model_serializers(self):
+        client, paths = fast_check.prepare(users=40)
+        for path, expected, actual in fast_check.responses(client, paths):
+            with self.subTest(path=path):
+                self.assertEqual(expected.status_code, 200)
+                self.assertEqual(actual.status_code, 200)
+                offset = fast_check.first_difference(expected.content, actual.content)
+                self.assertEqual(expected.content, actual.content, f'responses differ at byte {offset}')
+
+
+@override_settings(ASYNC_DB_WORKERS=0, BACKGROUND_TASKS_EAGER=True)
+class QueryBudgetTests(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user_ids = seed.seed(users=40)
+        user_id, cls.answer = pick_subjects(user_ids)
+        cls.user = User.objects.get(id=user_id)
+
+    def setUp(self):
+        # profile responses would be served from cache without queries
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def assertPagesWithinQueryBudget(self, path):
+        """
+        Checks the first page and the page after it, if there is one
+        """
+        response = self.assertWithinQueryBudget(path)
+        next_page = response.data.get('next') if isinstance(response.data, dict) else None
+        if next_page:
+            self.assertWithinQueryBudget(next_page)
+
+    def test_list_views_declare_budget(self):
+        self.assertEqual(views_without_budget(), [])
+
+    def test_feed(self):
+        self.assertPagesWithinQueryBudget(reverse('wall_answers'))
+        self.assertPagesWithinQueryBudget(reverse('wall_answers') + '?comments_preview=3')
+
+    def test_account_answers(self):
+        self.assertPagesWithinQueryBudget(reverse('account_answers'))
+        self.assertPagesWithinQueryBudget(reverse('account_answers') + '?comments_preview=5')
+
+    def test_user_account_answers(self):
+        username = self.answer['question__askedUser__username']
+        self.assertPagesWithinQueryBudget(reverse('user_account_answers', kwargs={'username': username}))
+
+    def test_comments(self):
+        self.assertPagesWithinQueryBudget(reverse('comments_list', kwargs={'answerId': self.answer['id']}))
+
+    def test_inbox(self):
+        self.assertPagesWithinQueryBudget(reverse('questions-list'))
+
+    def test_friends(self):
+        self.assertPagesWithinQueryBudget(reverse('friends_list'))
+
+    def test_friend_requests(self):
+        self.assertPagesWithinQueryBudget(reverse('friend_requests_list'))
+
+    def test_friend_suggestions(self):
+        self.assertPagesWithinQueryBudget(reverse('friend_suggestions'))
+
+    def test_user_search(self):
+        self.assertPagesWithinQueryBudget(reverse('user_search') + '?search=bench')
+
+    def test_content_search(self):
+        self.assertPagesWithinQueryBudget(reverse('content_search') + '?q=question')
+
+    def test_sync(self):
+        response = self.assertWithinQueryBudget(reverse('sync'))
+        self.assertWithinQueryBudget(reverse('sync') + f'?cursor={response.data["cursor"]}')
+
+
+class LocalMediaStorageTests(TestCase):
+
+    def setUp(self):
+        self.storage = LocalMediaStorage(location=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.storage.location, ignore_errors=True)
+
+    def test_chunks_are_appended_in_pieces(self):
+        written = self.storage.append_chunk('images/a.png', io.BytesIO(b'abcdef'), 0, 6, 4)
+        self.assertEqual(written, 6)
+        written = self.storage.append_chunk('images/a.png', io.BytesIO(b'ghi'), 6, 3, 4)
+        self.assertEqual(written, 3)
+        self.storage.finish_upload('images/a.png')
+        with self.storage.open('images/a.png', 'rb') as uploaded:
+            self.assertEqual(uploaded.read(), b'abcdefghi')
+
+    def test_short_stream_stops_chunk(self):
+        written = self.storage.append_chunk('images/a.png', io.BytesIO(b'abc'), 0, 10, 4)
+        self.assertEqual(written, 3)
+
+    def test_interrupted_chunk_is_dropped_on_retry(self):
+        self.storage.append_chunk('images/a.png', io.BytesIO(b'abcdef'), 0, 6, 4)
+        self.storage.append_chunk('images/a.png', io.BytesIO(b'xyz'), 3, 3, 4)
+        self.storage.finish_upload('images/a.png')
+        with self.storage.open('images/a.png', 'rb') as uploaded:
+            self.assertEqual(uploaded.read(), b'abcxyz')
+
+
+@override_settings(ASYNC_DB_WORKERS=0, UPLOAD_MAX_REQUEST_SIZE=256)
+class ChunkUploadTests(TemporaryMediaMixin, APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('uploader', password='secret')
+        self.client.force_authenticate(self.user)
+        self.image = png_bytes()
+
+    def create_ticket(self, size=None):
+        response = self.client.post(reverse('upload_tickets'), {
+            'target': UploadTicket.AVATAR, 'content_type': 'image/png', 'size': size or len(self.image),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def put(self, ticket, data, offset):
+        return self.client.put(reverse('upload_ticket', kwargs={'pk': ticket['id']}), data,
+                               content_type='image/png', HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_image_is_uploaded_in_chunks_and_attached(self):
+        ticket = self.create_ticket()
+        self.assertEqual(ticket['upload']['method'], 'PUT')
+        self.assertEqual(ticket['upload']['chunk_size'], 256)
+
+        offset = 0
+        while offset < len(self.image):
+            response = self.put(ticket, self.image[offset:offset + 256], offset)
+            self.assertEqual(response.status_code, 200)
+            offset = response.data['received']
+        self.assertEqual(offset, len(self.image))
+
+        response = self.client.post(reverse('upload_complete', kwargs={'pk': ticket['id']}))
+        self.assertEqual(response.status_code, 202)
+        # attached in background once committed, test transactions are not
+        uploads.attach(ticket['id'])
+        profile = MyUser.objects.get(user=self.user)
+        with profile.avatar.open('rb') as avatar:
+            self.assertEqual(avatar.read(), self.image)
+        self.assertEqual(UploadTicket.objects.get(pk=ticket['id']).status, UploadTicket.DONE)
+
+    def test_unexpected_offset_is_refused(self):
+        ticket = self.create_ticket()
+        response = self.put(ticket, self.image[:100], 100)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['received'], 0)
+
+    def test_chunk_larger_than_request_size_is_refused(self):
+        ticket = self.create_ticket()
+        response = self.put(ticket, self.image[:257], 0)
+        self.assertEqual(response.status_code, 413)
+
+    def test_image_larger_than_declared_is_refused(self):
+        ticket = self.create_ticket(size=100)
+        response = self.put(ticket, self.image[:200], 0)
+        self.assertEqual(response.status_code, 413)
+
+    def test_invalid_image_fails(self):
+        ticket = self.create_ticket(size=100)
+        self.put(ticket, b'not an image', 0)
+        self.client.post(reverse('upload_complete', kwargs={'pk': ticket['id']}))
+        uploads.attach(ticket['id'])
+        self.assertEqual(UploadTicket.objects.get(pk=ticket['id']).status, UploadTicket.FAILED)
+        self.assertFalse(MyUser.objects.get(user=self.user).avatar)
+
+    def test_large_chunks_are_refused_before_body_is_read(self):
+        path = reverse('upload_ticket', kwargs={'pk': self.create_ticket()['id']})
+
+        def scope(method, headers):
+            return {'type': 'http', 'method': method, 'path': path, 'headers': headers}
+
+        self.assertTrue(uploads.is_large_chunk(scope('PUT', [(b'content-length', b'257')])))
+        self.assertTrue(uploads.is_large_chunk(scope('PUT', [(b'transfer-encoding', b'chunked')])))
+        self.assertFalse(uploads.is_large_chunk(scope('PUT', [(b'content-length', b'256')])))
+        self.assertFalse(uploads.is_large_chunk(scope('GET', [])))
+
+
+# renditions are rendered on commit, test transactions would never run them
+@override_settings(ASYNC_DB_WORKERS=0, BACKGROUND_TASKS_EAGER=True)
+class RenditionTests(TemporaryMediaMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('photographer', password='secret')
+        self.profile = MyUser.objects.get(user=self.user)
+
+    def assertRenditions(self, renditions, original_size):
+        self.assertEqual(set(renditions), {name for name, size in images.RENDITIONS})
+        storage = self.profile.avatar.storage
+        for name, size in images.RENDITIONS:
+            with self.subTest(rendition=name):
+                with storage.open(renditions[name], 'rb') as stored:
+                    rendition = Image.open(stored)
+                    rendition.load()
+                self.assertEqual(rendition.format, images.image_format())
+                self.assertLessEqual(max(rendition.size), size)
+                self.assertLessEqual(max(rendition.size), max(original_size))
+                self.assertNotIn('exif', rendition.info)
+
+    def test_avatar_renditions(self):
+        self.profile.avatar.save('avatar.jpg', ContentFile(jpeg_bytes((2000, 1000))))
+        self.profile.refresh_from_db()
+        self.assertRenditions(self.profile.avatarRenditions, (2000, 1000))
+        with self.profile.avatar.storage.open(self.profile.avatarRenditions['thumbnail'], 'rb') as stored:
+            self.assertEqual(Image.open(stored).size, (160, 80))
+
+    def test_small_image_is_not_enlarged(self):
+        self.profile.avatar.save('avatar.jpg', ContentFile(jpeg_bytes((100, 50))))
+        self.profile.refresh_from_db()
+        self.assertRenditions(self.profile.avatarRenditions, (100, 50))
+
+    def test_exif_orientation_is_applied(self):
+        # orientation 6 is rotated by 90 degrees
+        self.profile.avatar.save('avatar.jpg', ContentFile(jpeg_bytes((400, 200), exif_orientation=6)))
+        self.profile.refresh_from_db()
+        with self.profile.avatar.storage.open(self.profile.avatarRenditions['thumbnail'], 'rb') as stored:
+            self.assertEqual(Image.open(stored).size, (80, 160))
+
+    def test_replaced_avatar_drops_old_renditions(self):
+        self.profile.avatar.save('first.jpg', ContentFile(jpeg_bytes((300, 300))))
+        self.profile.refresh_from_db()
+        first = self.profile.avatarRenditions
+        self.profile.avatar.save('second.jpg', ContentFile(jpeg_bytes((300, 300))))
+        self.profile.refresh_from_db()
+        storage = self.profile.avatar.storage
+        for name in first.values():
+            self.assertFalse(storage.exists(name))
+        for name in self.profile.avatarRenditions.values():
+            self.assertTrue(storage.exists(name))
+
+    def test_removed_avatar_drops_renditions(self):
+        self.profile.avatar.save('avatar.jpg', ContentFile(jpeg_bytes((300, 300))))
+        self.profile.refresh_from_db()
+        renditions = self.profile.avatarRenditions
+        self.profile.avatar = ''
+        self.profile.save()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.avatarRenditions, {})
+        for name in renditions.values():
+            self.assertFalse(self.profile.avatar.storage.exists(name))
+
+    def test_answer_photo_renditions(self):
+        question = Question.objects.create(question_text='Where?', askedUser=self.user)
+        answer = Answer(question=question, answer_text='Here')
+        answer.photo.save('photo.jpg', ContentFile(jpeg_bytes((1000, 2000))))
+        answer.refresh_from_db()
+        self.assertRenditions(answer.photo_renditions, (1000, 2000))
+
+
+@override_settings(ASYNC_DB_WORKERS=0)
+class CommentsPaginationTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('commenter', password='secret')
+        question = Question.objects.create(question_text='Why?', askedUser=cls.user)
+        cls.answer = Answer.objects.create(question=question, answer_text='Because')
+        # more comments of one timestamp than fit a page
+        now = timezone.now()
+        Comment.objects.bulk_create([
+            Comment(comment_text=f'Comment {number}', commented_user=cls.user, answer=cls.answer,
+                    timestamp=now if number < 25 else now - timedelta(seconds=number))
+            for number in range(30)
+        ])
+        cls.expected = list(Comment.objects.filter(answer=cls.answer).order_by('-timestamp', '-id')
+                            .values_list('id', flat=True))
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def pages(self):
+        path = reverse('comments_list', kwargs={'answerId': self.answer.id}) + '?page_size=10'
+        pages = []
+        while path:
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            path = response.data['next']
+        return pages
+
+    def assertPagesCoverComments(self):
+        pages = self.pages()
+        self.assertEqual([comment['id'] for page in pages for comment in page['results']], self.expected)
+        self.assertIsNone(pages[0]['previous'])
+        previous = self.client.get(pages[2]['previous']).data
+        self.assertEqual(previous['results'], pages[1]['results'])
+
+    def test_fast_path(self):
+        self.assertPagesCoverComments()
+
+    @override_settings(FAST_SERIALIZERS=False)
+    def test_model_serializers(self):
+        self.assertPagesCoverComments()
+
+    def test_fast_path_is_timed(self):
+        response = self.client.get(reverse('comments_list', kwargs={'answerId': self.answer.id}))
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+
+    def test_invalid_cursor(self):
+        path = reverse('comments_list', kwargs={'answerId': self.answer.id})
+        self.assertEqual(self.client.get(path + '?cursor=cD1nYXJiYWdl').status_code, 404)
+
+
+@override_settings(ASYNC_DB_WORKERS=0)
+class MultipleQuestionsTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.asker, cls.first, cls.second = [User.objects.create_user(f'user{number}', password='secret')
+                                            for number in range(3)]
+
+    def setUp(self):
+        self.client.force_authenticate(self.asker)
+
+    def ask(self, user_ids):
+        return self.client.post(reverse('create_multiple_questions'), {
+            'question_text': 'How are you?', 'askedUsers': user_ids,
+        }, format='json')
+
+    def test_questions_are_created(self):
+        response = self.ask([self.first.id, self.second.id])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(question['askedUser'] for question in response.data),
+                         [self.first.id, self.second.id])
+
+    def test_unknown_users_are_refused(self):
+        unknown = self.second.id + 100
+        response = self.ask([self.first.id, unknown])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(unknown), str(response.data['askedUsers']))
+        self.assertFalse(Question.objects.exists())
+
+
+class SuggestionPipelineTests(TestCase):
+
+    def test_users_marked_stale_during_run_stay_stale(self):
+        first, second = [User.objects.create_user(f'user{number}', password='secret') for number in range(2)]
+        suggestions.mark_stale(first.id)
+        started_at = timezone.now()
+        suggestions.mark_stale(second.id)
+
+        suggestion_pipeline.store({first.id: [], second.id: []}, started_at)
+        stale = dict(MyUser.objects.values_list('user_id', 'isSuggestionsStale'))
+        self.assertEqual(stale, {first.id: False, second.id: True})
+
+
+@override_settings(FEED_BACKFILL_SIZE=3)
+class FeedPullTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user('reader', password='secret')
+        cls.author = User.objects.create_user('author', password='secret')
+        MyUser.objects.filter(user=cls.author).update(isFeedPulled=True)
+        Friend.objects.create(to_user=cls.reader, from_user=cls.author)
+        Friend.objects.create(to_user=cls.author, from_user=cls.reader)
+        cls.question = Question.objects.create(question_text='What?', askedUser=cls.author)
+
+    def answer(self, count):
+        return [Answer.objects.create(question=self.question, answer_text='That').id for _ in range(count)]
+
+    def feed_ids(self):
+        return sorted(FeedEntry.objects.filter(owner=self.reader).values_list('answer_id', flat=True))
+
+    def test_first_pull_copies_latest_answers(self):
+        answer_ids = self.answer(5)
+        feed.pull(self.reader)
+        self.assertEqual(self.feed_ids(), answer_ids[-3:])
+
+    def test_no_answer_is_skipped_after_many_new_ones(self):
+        pulled = self.answer(1)
+        feed.pull(self.reader)
+        answer_ids = self.answer(8)
+        feed.pull(self.reader)
+        self.assertEqual(self.feed_ids(), pulled + answer_ids)
+        self.assertEqual(MyUser.objects.get(user=self.reader).feedPullWatermark, answer_ids[-1])
+
+    def test_restored_answers_are_pulled_again(self):
+        answer_ids = self.answer(2)
+        feed.pull(self.reader)
+        profile = MyUser.objects.get(user=self.author)
+        profile.isUserAnswersVisibleInFeed = False
+        profile.save()
+        self.assertEqual(self.feed_ids(), [])
+
+        profile.isUserAnswersVisibleInFeed = True
+        profile.save()
+        feed.pull(self.reader)
+        self.assertEqual(self.feed_ids(), answer_ids)
+
+
+class PubSubTests(TestCase):
+
+    def test_messages_are_packed_under_payload_limit(self):
+        items = [json.dumps({'channel': f'user:{number}', 'message': {'type': 'question', 'id': number}})
+                 for number in range(1000)]
+        payloads = pubsub._pack(items)
+        self.assertGreater(len(payloads), 1)
+        self.assertTrue(all(len(payload) <= pubsub.MAX_PAYLOAD for payload in payloads))
+        self.assertEqual([item for payload in payloads for item in json.loads(payload)],
+                         [json.loads(item) for item in items])
+
+
+class TokenCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('holder', password='secret')
+        self.token = Token.objects.create(user=self.user)
+        self.other = Token.objects.create(user=User.objects.create_user('other', password='secret'))
+        self.cache = TokenCache(ttl=60, max_size=10, check_interval=0)
+        for token in (self.token, self.other):
+            self.cache.set(token.key, token.user, token, self.cache.revision(token.key))
+
+    def test_revocation_drops_only_revoked_tokens(self):
+        # another process revokes the token of user
+        TokenCache(ttl=60, max_size=10).invalidate_user(self.user.id)
+        self.assertIsNone(self.cache.get(self.token.key))
+        self.assertIsNotNone(self.cache.get(self.other.key))
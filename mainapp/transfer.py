@@ -0,0 +1,349 @@
+"""
+Streaming export and import of user data as JSONL.
+
+Export writes one JSON object per line: a header with id ranges first, then
+users, profiles, questions, answers, comments, reactions, friends and
+friendship requests, parents before children. Rows are read with values()
+and iterator(), which uses server-side cursors on Postgres, so memory does
+not grow with the amount of data. Users are referenced by username, other
+rows by their ids.
+
+Import reads the same lines in batches and writes them with bulk_create, so
+no per-row signals run (create_my_user among them) and profiles come from
+the file. Existing usernames are reused. Questions, answers and comments get
+ids shifted by an offset reserved from the header ranges, which remaps
+foreign keys without keeping a map of ids; the import is meant to run while
+nothing else writes these tables. Denormalized data (stats, feeds, search)
+is rebuilt by `Importer.rebuild` afterwards. Media files are referenced by
+name and are not copied.
+"""
+import json
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Max, Min, Q
+from django.utils.dateparse import parse_date, parse_datetime
+from friendship.models import Friend, FriendshipRequest
+
+from mainapp import content_search, feed, friend_graph, profile_cache, stats, suggestions, user_search
+from mainapp.models import Answer, Comment, MyUser, Question, Reaction
+
+FORMAT_VERSION = 1
+
+USER_FIELDS = ('username', 'first_name', 'last_name', 'email', 'password', 'is_active', 'date_joined', 'last_login')
+PROFILE_FIELDS = ('selfDescription', 'DateOfBirth', 'gender', 'isAnonymousQuestionsAllowed',
+                  'isUserAnswersVisibleInFeed', 'avatar', 'avatarRenditions')
+
+# models whose ids are referenced by other lines
+REMAPPED = {'question': Question, 'answer': Answer, 'comment': Comment}
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def _chunks(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _querysets(usernames=None, since=None, until=None):
+    """
+    Provides querysets of exported rows by line type. Questions are filtered by time, their answers,
+    comments and reactions follow them, so parents of every exported row are exported too
+    """
+    users = User.objects.all()
+    questions = Question.objects.all()
+    friends = Friend.objects.all()
+    requests = FriendshipRequest.objects.all()
+    if usernames is not None:
+        users = users.filter(username__in=usernames)
+        questions = questions.filter(askedUser__username__in=usernames)
+        friends = friends.filter(Q(to_user__username__in=usernames) | Q(from_user__username__in=usernames))
+        requests = requests.filter(Q(to_user__username__in=usernames) | Q(from_user__username__in=usernames))
+    if since is not None:
+        questions = questions.filter(timestamp__gte=since)
+        friends = friends.filter(created__gte=since)
+        requests = requests.filter(created__gte=since)
+    if until is not None:
+        questions = questions.filter(timestamp__lt=until)
+        friends = friends.filter(created__lt=until)
+        requests = requests.filter(created__lt=until)
+
+    question_ids = questions.values('id')
+    return {
+        'user': users.values(*USER_FIELDS),
+        'profile': MyUser.objects.filter(user__in=users).values('user__username', *PROFILE_FIELDS),
+        'question': questions.values('id', 'question_text', 'timestamp', 'answered', 'asker__username',
+                                     'askedUser__username'),
+        'answer': Answer.objects.filter(question_id__in=question_ids).values(
+            'id', 'question_id', 'answer_text', 'photo', 'photo_renditions', 'likes', 'dislikes', 'comment_count',
+            'timestamp'),
+        'comment': Comment.objects.filter(answer__question_id__in=question_ids).values(
+            'id', 'answer_id', 'commented_user__username', 'comment_text', 'timestamp'),
+        'reaction': Reaction.objects.filter(answer__question_id__in=question_ids).values(
+            'answer_id', 'user__username', 'value', 'timestamp'),
+        'friend': friends.values('from_user__username', 'to_user__username', 'created'),
+        'friendship_request': requests.values('from_user__username', 'to_user__username', 'message', 'created',
+                                              'rejected', 'viewed'),
+    }
+
+
+def export(output, usernames=None, since=None, until=None, passwords=True, chunk_size=2000):
+    """
+    Writes JSONL lines of data of given users, or of everyone, into text stream.
+    Returns amounts of written rows by type
+    """
+    querysets = _querysets(usernames, since, until)
+    ranges = {}
+    for kind in REMAPPED:
+        bounds = querysets[kind].order_by().aggregate(first=Min('id'), last=Max('id'))
+        ranges[kind] = [bounds['first'], bounds['last']]
+    output.write(json.dumps({'type': 'header', 'version': FORMAT_VERSION, 'ranges': ranges}) + '\n')
+
+    counts = Counter()
+    for kind, queryset in querysets.items():
+        for row in queryset.order_by('pk').iterator(chunk_size=chunk_size):
+            if kind == 'user' and not passwords:
+                row['password'] = None
+            row['type'] = kind
+            output.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+            counts[kind] += 1
+    return counts
+
+
+def _datetime(value):
+    return parse_datetime(value) if value else None
+
+
+class Importer:
+    """
+    Loads exported lines in batches, see module description
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.offsets = {}
+        self.user_ids = {}
+        self.created_user_ids = set()
+        self.touched_user_ids = set()
+        # source ids of rows that were not imported, their children are skipped too
+        self.skipped_ids = {kind: set() for kind in REMAPPED}
+        self.counts = Counter()
+        self.skipped = Counter()
+        self.next_user_id = None
+
+    def load(self, lines):
+        """
+        Imports lines of export in one transaction
+        """
+        kind, batch = None, []
+        with transaction.atomic():
+            for line in lines:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                record_kind = record.pop('type')
+                if record_kind == 'header':
+                    self.start(record)
+                    continue
+                if self.next_user_id is None:
+                    raise ValueError('export has no header line')
+                if record_kind != kind or len(batch) >= self.batch_size:
+                    self.flush(kind, batch)
+                    kind, batch = record_kind, []
+                batch.append(record)
+            self.flush(kind, batch)
+            self.reset_sequences()
+        return self.counts
+
+    def start(self, header):
+        if header['version'] != FORMAT_VERSION:
+            raise ValueError(f'export format {header["version"]} is not supported')
+        for kind, model in REMAPPED.items():
+            first = header['ranges'][kind][0]
+            if first is not None:
+                self.offsets[kind] = _next_id(model) - first
+        self.next_user_id = _next_id(User)
+
+    def flush(self, kind, batch):
+        if not batch:
+            return
+        loader = getattr(self, f'load_{kind}', None)
+        if loader is None:
+            raise ValueError(f'unknown line type {kind}')
+        loader(batch)
+
+    def resolve(self, usernames):
+        """
+        Fills ids of users with given usernames, unknown usernames get None
+        """
+        unknown = {username for username in usernames if username is not None} - self.user_ids.keys()
+        for chunk in _chunks(unknown, self.batch_size):
+            self.user_ids.update(dict.fromkeys(chunk))
+            self.user_ids.update(User.objects.filter(username__in=chunk).values_list('username', 'id'))
+
+    def remap(self, kind, source_id):
+        if source_id in self.skipped_ids[kind]:
+            return None
+        return source_id + self.offsets[kind]
+
+    def load_user(self, records):
+        self.resolve(record['username'] for record in records)
+        users = []
+        for record in records:
+            if self.user_ids[record['username']] is not None:
+                self.skipped['user'] += 1
+                continue
+            user = User(id=self.next_user_id, **record)
+            user.date_joined = _datetime(record['date_joined'])
+            user.last_login = _datetime(record['last_login'])
+            if user.password is None:
+                user.password = make_password(None)
+            users.append(user)
+            self.user_ids[user.username] = user.id
+            self.created_user_ids.add(user.id)
+            self.next_user_id += 1
+        User.objects.bulk_create(users)
+        self.counts['user'] += len(users)
+
+    def load_profile(self, records):
+        profiles = []
+        for record in records:
+            user_id = self.user_ids.get(record.pop('user__username'))
+            # profiles of users that already existed are kept
+            if user_id not in self.created_user_ids:
+                continue
+            profile = MyUser(user_id=user_id, **record)
+            profile.DateOfBirth = parse_date(record['DateOfBirth'])
+            profiles.append(profile)
+        MyUser.objects.bulk_create(profiles)
+        self.counts['profile'] += len(profiles)
+
+    def load_question(self, records):
+        self.resolve(record[field] for record in records for field in ('asker__username', 'askedUser__username'))
+        questions = []
+        for record in records:
+            asked_user_id = self.user_ids[record['askedUser__username']]
+            if asked_user_id is None:
+                self.skipped_ids['question'].add(record['id'])
+                self.skipped['question'] += 1
+                continue
+            questions.append(Question(
+                id=self.remap('question', record['id']), askedUser_id=asked_user_id,
+                asker_id=self.user_ids.get(record['asker__username']), question_text=record['question_text'],
+                timestamp=_datetime(record['timestamp']), answered=record['answered'],
+            ))
+            self.touched_user_ids.add(asked_user_id)
+        timestamps = [question.timestamp for question in questions]
+        Question.objects.bulk_create(questions)
+        # auto_now_add replaced timestamps on insert
+        for question, timestamp in zip(questions, timestamps):
+            question.timestamp = timestamp
+        Question.objects.bulk_update(questions, ['timestamp'])
+        self.counts['question'] += len(questions)
+
+    def load_answer(self, records):
+        answers = []
+        for record in records:
+            question_id = self.remap('question', record.pop('question_id'))
+            if question_id is None:
+                self.skipped_ids['answer'].add(record['id'])
+                self.skipped['answer'] += 1
+                continue
+            answer = Answer(question_id=question_id, **record)
+            answer.id = self.remap('answer', record['id'])
+            answer.timestamp = _datetime(record['timestamp'])
+            answers.append(answer)
+        Answer.objects.bulk_create(answers)
+        self.counts['answer'] += len(answers)
+
+    def load_comment(self, records):
+        self.resolve(record['commented_user__username'] for record in records)
+        comments = []
+        for record in records:
+            answer_id = self.remap('answer', record['answer_id'])
+            user_id = self.user_ids[record['commented_user__username']]
+            if answer_id is None or user_id is None:
+                self.skipped_ids['comment'].add(record['id'])
+                self.skipped['comment'] += 1
+                continue
+            comments.append(Comment(id=self.remap('comment', record['id']), answer_id=answer_id,
+                                    commented_user_id=user_id, comment_text=record['comment_text'],
+                                    timestamp=_datetime(record['timestamp'])))
+        Comment.objects.bulk_create(comments)
+        self.counts['comment'] += len(comments)
+
+    def load_reaction(self, records):
+        self.resolve(record['user__username'] for record in records)
+        reactions = []
+        for record in records:
+            answer_id = self.remap('answer', record['answer_id'])
+            user_id = self.user_ids[record['user__username']]
+            if answer_id is None or user_id is None:
+                self.skipped['reaction'] += 1
+                continue
+            reactions.append(Reaction(answer_id=answer_id, user_id=user_id, value=record['value'],
+                                      timestamp=_datetime(record['timestamp'])))
+        Reaction.objects.bulk_create(reactions, ignore_conflicts=True)
+        self.counts['reaction'] += len(reactions)
+
+    def _pairs(self, kind, records):
+        self.resolve(record[field] for record in records for field in ('from_user__username', 'to_user__username'))
+        for record in records:
+            from_user_id = self.user_ids[record.pop('from_user__username')]
+            to_user_id = self.user_ids[record.pop('to_user__username')]
+            if from_user_id is None or to_user_id is None:
+                self.skipped[kind] += 1
+                continue
+            self.touched_user_ids.update((from_user_id, to_user_id))
+            record['created'] = _datetime(record['created'])
+            yield from_user_id, to_user_id, record
+
+    def load_friend(self, records):
+        friends = [Friend(from_user_id=from_user_id, to_user_id=to_user_id, created=record['created'])
+                   for from_user_id, to_user_id, record in self._pairs('friend', records)]
+        # users that already were friends keep their rows
+        Friend.objects.bulk_create(friends, ignore_conflicts=True)
+        self.counts['friend'] += len(friends)
+
+    def load_friendship_request(self, records):
+        requests = []
+        for from_user_id, to_user_id, record in self._pairs('friendship_request', records):
+            request = FriendshipRequest(from_user_id=from_user_id, to_user_id=to_user_id, **record)
+            request.rejected = _datetime(record['rejected'])
+            request.viewed = _datetime(record['viewed'])
+            requests.append(request)
+        FriendshipRequest.objects.bulk_create(requests, ignore_conflicts=True)
+        self.counts['friendship_request'] += len(requests)
+
+    def reset_sequences(self):
+        # rows were inserted with explicit ids, sequences of Postgres have to catch up
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User, Question, Answer, Comment]):
+                cursor.execute(sql)
+
+    def rebuild(self):
+        """
+        Recomputes data derived from imported rows: search indexes, stats and feeds
+        """
+        for chunk in _chunks(self.created_user_ids, self.batch_size):
+            for user in User.objects.filter(id__in=chunk).iterator():
+                user_search.index_user(user)
+
+        affected = self.created_user_ids | self.touched_user_ids
+        readers = set(affected)
+        friend_graph.graph.clear()
+        for chunk in _chunks(affected, self.batch_size):
+            content_search.rebuild(chunk)
+            stats.recompute(chunk)
+            suggestions.mark_stale(*chunk)
+            profile_cache.bump(*chunk)
+            readers.update(Friend.objects.filter(from_user_id__in=chunk).values_list('to_user_id', flat=True))
+        for user_id in readers:
+            feed.rebuild(user_id)
@@ -0,0 +1,172 @@
+"""
+Direct uploads of images.
+
+Instead of posting an image to a form handled by a web worker, the client
+asks for an UploadTicket and sends the image straight to storage: to the
+bucket by presigned POST, or to the chunk endpoint when media is kept on
+local filesystem. The chunk endpoint copies the request stream to disk in
+UPLOAD_CHUNK_SIZE pieces. Under ASGI Django reads the whole body of a request
+before the view runs, so a single PUT carries at most UPLOAD_MAX_REQUEST_SIZE
+bytes: clients send larger images in several PUTs, and larger requests are
+refused by `refuse_large_chunk` in asgi.py before their body is read.
+Completed tickets are attached to the profile or answer in background.
+"""
+import posixpath
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from PIL import Image
+
+from mainapp import tasks
+from mainapp.models import Answer, MyUser, UploadTicket
+
+CONTENT_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/gif': '.gif',
+}
+
+
+def max_size():
+    return getattr(settings, 'UPLOAD_MAX_SIZE', 10 * 1024 * 1024)
+
+
+def ticket_ttl():
+    return getattr(settings, 'UPLOAD_TICKET_TTL', 900)
+
+
+def chunk_size():
+    return getattr(settings, 'UPLOAD_CHUNK_SIZE', 64 * 1024)
+
+
+def max_request_size():
+    return getattr(settings, 'UPLOAD_MAX_REQUEST_SIZE', 1024 * 1024)
+
+
+def _field(target):
+    if target == UploadTicket.AVATAR:
+        return MyUser._meta.get_field('avatar')
+    return Answer._meta.get_field('photo')
+
+
+def issue(user, target, content_type, size, answer_id=None):
+    """
+    Creates ticket for upload of one image of at most `size` bytes
+    """
+    name = posixpath.join(_field(target).upload_to, f'{uuid.uuid4().hex}{CONTENT_TYPES[content_type]}')
+    return UploadTicket.objects.create(
+        user=user,
+        target=target,
+        object_id=answer_id,
+        name=name,
+        content_type=content_type,
+        max_size=size,
+        expires=timezone.now() + timedelta(seconds=ticket_ttl()),
+    )
+
+
+def accepts_chunks():
+    return hasattr(default_storage, 'append_chunk')
+
+
+def upload_target(ticket, chunk_url):
+    """
+    Tells client where to send the image: {'method', 'url', 'fields'},
+    and the most bytes of one request as 'chunk_size' for PUT
+    """
+    if hasattr(default_storage, 'upload_target'):
+        return default_storage.upload_target(ticket.name, ticket.content_type, ticket.max_size, ticket_ttl())
+    return {'method': 'PUT', 'url': chunk_url, 'fields': {}, 'chunk_size': max_request_size()}
+
+
+def is_large_chunk(scope):
+    """
+    Tells whether ASGI scope is a PUT to the chunk endpoint with a body larger than
+    UPLOAD_MAX_REQUEST_SIZE or of unknown length
+    """
+    if scope['type'] != 'http' or scope['method'] != 'PUT':
+        return False
+    try:
+        match = resolve(scope['path'])
+    except Resolver404:
+        return False
+    if match.url_name != 'upload_ticket':
+        return False
+    try:
+        length = int(dict(scope['headers']).get(b'content-length', b''))
+    except ValueError:
+        return True
+    return length > max_request_size()
+
+
+async def refuse_large_chunk(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 413,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': b'{"message": "Chunk is too large"}'})
+
+
+def write_chunk(ticket, stream, offset, length):
+    """
+    Appends `length` bytes of stream to the image at `offset`.
+    Returns the number of bytes received so far
+    """
+    written = default_storage.append_chunk(ticket.name, stream, offset, length, chunk_size())
+    if not UploadTicket.objects.filter(pk=ticket.pk, received=offset).update(received=offset + written):
+        raise ValueError('upload offset changed')
+    ticket.received = offset + written
+    return ticket.received
+
+
+def complete(ticket):
+    """
+    Marks image as uploaded and attaches it in background
+    """
+    if ticket.received:
+        default_storage.finish_upload(ticket.name)
+    UploadTicket.objects.filter(pk=ticket.pk).update(status=UploadTicket.UPLOADED)
+    ticket.status = UploadTicket.UPLOADED
+    tasks.submit(attach, ticket.pk)
+
+
+def _is_valid_image(ticket):
+    if not default_storage.exists(ticket.name) or default_storage.size(ticket.name) > ticket.max_size:
+        return False
+    try:
+        with default_storage.open(ticket.name, 'rb') as uploaded:
+            Image.open(uploaded).verify()
+    except Exception:
+        return False
+    return True
+
+
+def _fail(ticket):
+    default_storage.delete(ticket.name)
+    UploadTicket.objects.filter(pk=ticket.pk).update(status=UploadTicket.FAILED)
+
+
+def attach(ticket_id):
+    ticket = UploadTicket.objects.filter(pk=ticket_id, status=UploadTicket.UPLOADED).first()
+    if ticket is None:
+        return
+    if not _is_valid_image(ticket):
+        _fail(ticket)
+        return
+
+    # saving the field starts rendering of renditions, see images.py
+    if ticket.target == UploadTicket.AVATAR:
+        instance = MyUser.objects.get(user_id=ticket.user_id)
+        instance.avatar = ticket.name
+        instance.save(update_fields=['avatar'])
+    else:
+        instance = Answer.objects.filter(pk=ticket.object_id).first()
+        if instance is None:
+            _fail(ticket)
+            return
+        instance.photo = ticket.name
+        instance.save(update_fields=['photo'])
+    UploadTicket.objects.filter(pk=ticket.pk).update(status=UploadTicket.DONE)
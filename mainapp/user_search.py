@@ -0,0 +1,119 @@
+"""
+People search.
+
+Names of every user are kept lowercased in UserSearchIndex for prefix
+matching and split into trigrams in UserSearchTrigram for typo tolerant
+matching. Both are plain indexed columns, so search works the same way
+on SQLite and Postgres.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save
+from friendship.models import Friend
+
+from mainapp.models import UserSearchIndex, UserSearchTrigram
+
+# part of query trigrams that user's names must contain to be found by typo
+MIN_SIMILARITY = 0.4
+
+EXACT_USERNAME_SCORE = 1000
+USERNAME_PREFIX_SCORE = 300
+NAME_PREFIX_SCORE = 200
+FRIEND_SCORE = 150
+TRIGRAM_SCORE = 100
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def trigrams(text):
+    """
+    Splits text into trigrams the same way as pg_trgm does
+    """
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def index_user(user):
+    """
+    Stores searchable names of user
+    """
+    username = normalize(user.username)
+    first_name = normalize(user.first_name)
+    last_name = normalize(user.last_name)
+    grams = trigrams(' '.join((username, first_name, last_name)))
+
+    with transaction.atomic():
+        UserSearchIndex.objects.update_or_create(user_id=user.id, defaults={
+            'username': username,
+            'full_name': normalize(f'{first_name} {last_name}'),
+            'last_name': last_name,
+        })
+        UserSearchTrigram.objects.filter(user_id=user.id).exclude(trigram__in=grams).delete()
+        UserSearchTrigram.objects.bulk_create(
+            [UserSearchTrigram(user_id=user.id, trigram=gram) for gram in grams],
+            ignore_conflicts=True,
+        )
+
+
+def _prefix(field, query):
+    # range over an ordinary index is a prefix scan on any database
+    return Q(**{f'search_index__{field}__gte': query, f'search_index__{field}__lt': query + '\uffff'})
+
+
+def _prefix_ids(field, query):
+    ids = UserSearchIndex.objects.filter(**{f'{field}__gte': query, f'{field}__lt': query + '\uffff'})
+    return ids.values('user_id')
+
+
+def search(query, user=None):
+    """
+    Provides users matching query, best matches first
+    """
+    query = normalize(query)
+    if not query:
+        return User.objects.none()
+
+    grams = trigrams(query)
+    min_hits = max(1, int(len(grams) * MIN_SIMILARITY))
+    similar = (UserSearchTrigram.objects.filter(trigram__in=grams)
+               .values('user_id').annotate(hits=Count('id')).filter(hits__gte=min_hits).values('user_id'))
+    hits = (UserSearchTrigram.objects.filter(user_id=OuterRef('pk'), trigram__in=grams)
+            .values('user_id').annotate(hits=Count('id')).values('hits'))
+
+    username_prefix = _prefix('username', query)
+    name_prefix = _prefix('full_name', query) | _prefix('last_name', query)
+
+    def score(condition, points):
+        return Case(When(condition, then=Value(points)), default=Value(0), output_field=IntegerField())
+
+    rank = (
+        score(Q(search_index__username=query), EXACT_USERNAME_SCORE)
+        + score(username_prefix, USERNAME_PREFIX_SCORE)
+        + score(name_prefix, NAME_PREFIX_SCORE)
+        + Coalesce(Subquery(hits, output_field=IntegerField()), Value(0)) * TRIGRAM_SCORE / len(grams)
+    )
+    if user is not None and user.is_authenticated:
+        friends = Friend.objects.filter(to_user_id=user.id).values('from_user_id')
+        rank = rank + score(Q(id__in=friends), FRIEND_SCORE)
+
+    # OR of conditions on different tables can't use their indexes, every part of a UNION uses its own
+    candidates = _prefix_ids('username', query).union(
+        _prefix_ids('full_name', query), _prefix_ids('last_name', query), similar, all=True)
+    users = User.objects.filter(id__in=candidates)
+    return users.annotate(rank=rank).order_by('-rank', 'username')
+
+
+def on_user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not {'username', 'first_name', 'last_name'} & set(update_fields):
+        return
+    index_user(instance)
+
+
+post_save.connect(on_user_saved, sender=User)
@@ -1,12 +1,129 @@
 
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.middleware.csrf import CsrfViewMiddleware
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import AnonymousUser
 
 from rest_framework import authentication, HTTP_HEADER_ENCODING, exceptions
+from rest_framework.authtoken.models import Token
+
+from askme import instrumentation
+
+
+def _shared_cache():
+    return caches['shared'] if 'shared' in settings.CACHES else caches['default']
+
+
+def _revision_key(key):
+    return f'token-cache:revision:{key}'
+
+
+class TokenCache:
+    """
+    Bounded cache of authenticated (user, token) pairs by token key.
+    Entries live for `ttl` seconds, least recently used ones are evicted first.
+    Invalidating a token changes its revision in the shared cache, and other
+    processes compare revision of an entry at most every `check_interval` seconds
+    """
+
+    def __init__(self, ttl, max_size, check_interval=5.0):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def revision(self, key):
+        """
+        Provides revision of token, to be read before the token is loaded
+        """
+        return _shared_cache().get(_revision_key(key))
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, checked_at, revision, user, token = entry
+            if expires < now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+
+        if now - checked_at >= self.check_interval:
+            if self.revision(key) != revision:
+                self.invalidate_local(key)
+                return None
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._entries[key] = (expires, now, revision, user, token)
+        # every request gets own user instance, as views may change it
+        return copy.copy(user), token
+
+    def set(self, key, user, token, revision=None):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, now, revision, user, token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_local(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self, *keys):
+        for key in keys:
+            self.invalidate_local(key)
+        # entries older than ttl are gone anyway, a random revision never matches an earlier one
+        _shared_cache().set_many({_revision_key(key): uuid.uuid4().hex for key in keys}, self.ttl * 2)
 
-class TokenAllowAnyAuthentication(authentication.TokenAuthentication):
+    def invalidate_user(self, user_id):
+        self.invalidate(*Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 60),
+    max_size=getattr(settings, 'TOKEN_CACHE_SIZE', 10000),
+    check_interval=getattr(settings, 'TOKEN_CACHE_CHECK_INTERVAL', 5.0),
+)
+
+
+class CachedTokenAuthentication(authentication.TokenAuthentication):
+    """
+    Token authentication which remembers recently authenticated tokens,
+    so most requests don't query token and user
+    """
+
+    def authenticate_credentials(self, key):
+        with instrumentation.timed('auth'):
+            cached = token_cache.get(key)
+            if cached is not None:
+                return cached
+
+            # an invalidation after the token is loaded changes the revision, and the entry is dropped
+            revision = token_cache.revision(key)
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, token, revision)
+            return user, token
+
+
+class TokenAllowAnyAuthentication(CachedTokenAuthentication):
     """
     Allows any requests, but when token is provided,
     uses token authentication
@@ -33,3 +150,23 @@ class TokenAllowAnyAuthentication(authentication.TokenAuthentication):
             raise exceptions.AuthenticationFailed(msg)
 
         return self.authenticate_credentials(token)
+
+
+def forget_token(sender, instance, **kwargs):
+    # token is deleted on logout, once it is committed other processes can't load it again
+    key = instance.key
+    transaction.on_commit(lambda: token_cache.invalidate(key))
+
+
+def forget_user_tokens(sender, instance, created=False, update_fields=None, **kwargs):
+    # new users have no cached token, logins save last_login only, which authentication doesn't depend on
+    if created or (update_fields is not None and set(update_fields) == {'last_login'}):
+        return
+    # user may be deactivated or changed
+    user_id = instance.pk
+    transaction.on_commit(lambda: token_cache.invalidate_user(user_id))
+
+
+post_delete.connect(forget_token, sender=Token)
+post_save.connect(forget_user_tokens, sender=get_user_model())
+post_delete.connect(forget_user_tokens, sender=get_user_model())